@@ -1,390 +1,240 @@
-import time
-import pandas as pd
+import argparse
+import json
 import logging
 from datetime import datetime, timedelta, timezone
 
 import config
 from delta_exchange import DeltaExchange
 import indicators
+import profiling
+import strategy_utils
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
-def run_backtest():
-    # Backtest Configuration
-    SYMBOL = "ETHUSD"
-    
-    # Define Date Range (Single Day: 17/12/2025)
-    end_date_str = "17/12/2025"
-    start_date_str = "17/12/2025"
-    
-    # Naive datetimes for calculation
-    end_dt_ist = datetime.strptime(end_date_str, "%d/%m/%Y").replace(hour=23, minute=59, second=59)
-    start_dt_ist = datetime.strptime(start_date_str, "%d/%m/%Y").replace(hour=0, minute=0, second=0)
-    
-    ist_offset = timedelta(hours=5, minutes=30)
-    
-    start_dt_utc = start_dt_ist - ist_offset
-    end_dt_utc = end_dt_ist - ist_offset
-    
-    # Warmup: Add enough time for indicators (need ~100 candles)
-    # 15m * 100 = 1500 minutes. Safe buffer: 2000 minutes.
-    warmup_minutes = 2000
-    fetch_start_utc = start_dt_utc - timedelta(minutes=warmup_minutes)
-    
-    # Convert to timestamp (Assume naive UTC is UTC)
+IST_OFFSET = timedelta(hours=5, minutes=30)
+
+# Warmup: Add enough time for indicators (need ~100 candles)
+# 15m * 100 = 1500 minutes. Safe buffer: 2000 minutes.
+WARMUP_MINUTES = 2000
+
+def parse_ist_date(value, end_of_day=False):
+    """
+    dd/mm/yyyy (IST) -> naive UTC datetime at the start (or end) of that day.
+    """
+    dt = datetime.strptime(value, "%d/%m/%Y")
+    if end_of_day:
+        dt = dt.replace(hour=23, minute=59, second=59)
+    return dt - IST_OFFSET
+
+def load_frame(exchange, symbol, start_utc, end_utc):
+    """
+    Candles for [start_utc - warmup, end_utc] with indicators, and the index of the
+    first candle inside the backtest period. Returns (None, 0) if no data.
+    """
+    fetch_start_utc = start_utc - timedelta(minutes=WARMUP_MINUTES)
     start_ts = int(fetch_start_utc.replace(tzinfo=timezone.utc).timestamp())
-    end_ts = int(end_dt_utc.replace(tzinfo=timezone.utc).timestamp())
-    
-    logger.info(f"Backtest: {SYMBOL}")
-    logger.info(f"Target Period (IST): {start_dt_ist} to {end_dt_ist}")
-    logger.info(f"Fetch Range (UTC): {fetch_start_utc} to {end_dt_utc}")
-    
-    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL)
-    
-    # Fetch Data in chunks (Delta limit is usually 1000-2000, let's play safe with smaller chunks if helper doesn't auto-paginate)
-    # Our simple helper gets 'limit' latest. We need to implement range fetching or just ask for a large limit if supported.
-    # checking delta_exchange.py: get_history uses 'start', 'end'. 
-    # Delta API /v2/history/candles supports start/end.
-    
-    logger.info("Fetching Market Data...")
-    
-    # Delta might have limit on candles per req.
-    # We need approx 24*60 + 200 = 1640 candles.
-    # We will try to fetch in one go, if truncated we might need loop.
-    # Assuming 2000 limit is standard for time-range endpoints.
-    
-    # Update exchange.get_history to support custom time params fully if needed.
-    # The current impl in delta_exchange.py calculates start from limit if not provided, 
-    # but since I am calling API directly or via modified logic here?
-    # I should use the method available.
-    # The existing get_history method logic:
-    # params = { "resolution": resolution, "symbol": symbol, "start": start_time, "end": end_time }
-    # So I can just bypass the method wrapper or assume it works if I hacked it?
-    # Actually, the method was: start_time = end_time - limit*...
-    # I need to modify get_history to accept explicit start_time if I want to use the method, 
-    # or just call _request directly here. I will call _request directly to avoid changing library code unnecessarily.
-    
-    params = {
-        "resolution": config.TIMEFRAME,
-        "symbol": SYMBOL,
-        "start": start_ts,
-        "end": end_ts
+    end_ts = int(end_utc.replace(tzinfo=timezone.utc).timestamp())
+
+    # Long ranges are split into per-request candle limit windows and downloaded in parallel
+    # Served from the local candle cache, so re-running a backtest needs no network
+    df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=start_ts, end=end_ts)
+    if df is None or df.empty:
+        return None, 0
+
+    sym_config = config.SYMBOL_CONFIG.get(symbol, {})
+    slope_scaling = sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING)
+    df = indicators.calculate_supertrend(df, period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
+    df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
+    df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=slope_scaling)
+
+    # Candles before the period only warm up the indicators and the trend age
+    in_period = df['time'] >= start_utc
+    if not in_period.any():
+        logger.warning(f"{symbol}: Data does not cover start time.")
+        return df, len(df)
+    return df, int(in_period.idxmax())
+
+def summarize(trades):
+    """
+    Total PnL, trade count, win rate (%) and max drawdown of the closed-trade equity curve.
+    """
+    closed = [t for t in trades if t['status'] == 'CLOSED']
+    equity = 0.0
+    peak = 0.0
+    max_drawdown = 0.0
+    for t in closed:
+        equity += t['pnl']
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, peak - equity)
+    wins = sum(1 for t in closed if t['pnl'] > 0)
+    return {
+        "total_pnl": round(sum(t['pnl'] for t in trades), 2),
+        "realized_pnl": round(equity, 2),
+        "trades": len(trades),
+        "closed_trades": len(closed),
+        "win_rate": round(wins / len(closed) * 100, 2) if closed else 0.0,
+        "max_drawdown": round(max_drawdown, 2)
     }
-    
-    data = exchange._request("GET", "/v2/history/candles", params, auth=False)
-    
-    if not data or not data.get("success"):
-        logger.error("Failed to fetch data.")
-        return
 
-    candles = data["result"]
-    logger.info(f"Fetched {len(candles)} candles.")
-    
-    df = pd.DataFrame(candles)
-    cols = ['open', 'high', 'low', 'close', 'volume']
-    for col in cols:
-        df[col] = pd.to_numeric(df[col])
-        
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df = df.sort_values('time').reset_index(drop=True)
-    # -------------------------------------------------------------------------
-    # 4. Calculate Indicators (Updated to Series assignment)
-    # -------------------------------------------------------------------------
-    print("Calculating Indicators...")
-    try:
-        # Get Symbol Config
-        sym_config = config.SYMBOL_CONFIG.get(SYMBOL, {})
-        slope_scaling = sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING)
-        
-        df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
-        df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=slope_scaling)
-        df = indicators.calculate_supertrend(df, period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
-    except Exception as e:
-        print(f"Indicator Error: {e}")
-        return
-    
-    # -------------------------------------------------------------------------
-    logger.info("\nStarting Simulation...")
-    # NOTE: Iterate from index 'warmup_minutes' to skip unstable indicator part
-    # But checking if we have enough data
-    start_idx = 0
-    # Find index where time >= start_dt_utc (the actual start of the day)
-    # Using tz-naive comparison (UTC to UTC)
-    start_idx_mask = df['time'] >= start_dt_utc
-    if start_idx_mask.any():
-        start_idx = start_idx_mask.idxmax()
-    else:
-        logger.warning("Data does not cover start time.")
-    
-    # Initialize Variables
-    trade_count = 0
-    trade_peak_price = 0 # Track max favorable excursion
-    cumulative_pnl = 0
-    in_position = 0
-    entry_price = 0
-    TAKE_PROFIT = 30
-    trend_start_idx = 0 # Track when the current trend started
-    last_pnl = 0
-    
-    current_pnl = 0
-    trades = [] # Ensure trades list is init
-    
-    # Create Markdown Report
-    report_file = "backtest_report.md"
-    
-    with open(report_file, "w", encoding="utf-8") as f:
-        # Header
-        f.write("# Backtest Report: ETHUSD (17 Dec - 15m)\n\n")
-        f.write(f"**Period**: {start_date_str} to {end_date_str}\n")
-        f.write(f"**Settings**: Supertrend({config.SUPERTREND_PERIOD}, {config.SUPERTREND_MULTIPLIER}), HMA({config.HMA_PERIOD})\n\n")
-        f.write("| Time (IST) | Action | Entry Price | Exit Price | PnL | Max Run Up (%) |\n")
-        f.write("| :--- | :--- | :--- | :--- | :--- | :--- |\n")
-        
-        # Console Header
-        print(f"{'TIME (IST)':<25} {'ACTION':<15} {'ENTRY':<10} {'EXIT':<10} {'PNL':<10} {'RUN UP %':<10}")
-        print("-" * 90)
+def portfolio_summary(trades):
+    """
+    summarize() of all symbols traded together (config.QUANTITIES, closed trades in exit
+    order) in USD (config.CONTRACT_VALUES) plus the peak number of open positions, the
+    peak margin they tie up (entry notional / LEVERAGE) and the total PnL as a return on
+    that margin. If a symbol has no contract value, PnL stays in points and no margin
+    is reported.
+    """
+    values = {t['symbol']: config.CONTRACT_VALUES.get(t['symbol']) for t in trades}
+    in_usd = None not in values.values()
+    if in_usd:
+        trades = [dict(t, pnl=t['pnl'] * values[t['symbol']]) for t in trades]
+    closed = sorted((t for t in trades if t['status'] == 'CLOSED'), key=lambda t: t['exit_time'])
+    summary = summarize(closed + [t for t in trades if t['status'] == 'OPEN'])
+    summary["pnl_unit"] = "USD" if in_usd else "points"
 
-        for i in range(start_idx, len(df)):
-            # We look at *closed* candle at i. 
-            # In live bot, we act on 'close' of candle i (which is -2 in list of forming + closed)
-            # Here i is the candle that just closed.
-            
-            row = df.iloc[i]
-            curr_price = row['close']
-            time_ist = row['time'] + ist_offset
-            
-            trend = row['SupertrendTrend']
-            slope = row['HMA_Slope']
-            
-            # Signal Generation
-            # Get Symbol Config
-            sym_config = config.SYMBOL_CONFIG.get(SYMBOL, {})
-            slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
+    # +margin at entry, -margin at exit; exits sort before entries on the same candle
+    events = []
+    for t in trades:
+        qty = config.QUANTITIES.get(t['symbol'], config.DEFAULT_QUANTITY)
+        margin = t['entry_price'] * qty * values[t['symbol']] / config.LEVERAGE if in_usd else 0.0
+        events.append((t['entry_time'], 1, margin))
+        if t['status'] == 'CLOSED':
+            events.append((t['exit_time'], 0, -margin))
+    events.sort(key=lambda e: (e[0], e[1]))
 
-            signal = 0
-            if trend == 1 and slope >= slope_threshold:
-                signal = 1
-            elif trend == -1 and slope <= -slope_threshold:
-                signal = -1
-            
-        # Execution Logic
-        action = None
-        
-        if signal == 1:
-            if in_position == 0:
-                action = "BUY"
-                in_position = 1
-                entry_price = curr_price
-            elif in_position == -1:
-                # Close Short, Open Long
-                pnl = entry_price - curr_price
-                trades.append({'Time': time_ist, 'Type': 'CLOSE SHORT', 'Price': curr_price, 'PnL': pnl})
-                current_pnl += pnl
-                
-                action = "BUY (Reverse)"
-                in_position = 1
-                entry_price = curr_price
-                
-        elif signal == -1:
-            if in_position == 0:
-                action = "SELL"
-                in_position = -1
-                entry_price = curr_price
-            elif in_position == 1:
-                # Close Long, Open Short
-                pnl = curr_price - entry_price
-                trades.append({'Time': time_ist, 'Type': 'CLOSE LONG', 'Price': curr_price, 'PnL': pnl})
-                current_pnl += pnl
-                
-                action = "SELL (Reverse)"
-                in_position = -1
-                entry_price = curr_price
-                
-        # Trailing Logic (Exit only if trend changes? User said "trail both trades with supertrend line")
-        # Usually trailing means "Exit if price hits supertrend".
-        # Supertrend indicator ALREADY flips trend when price hits it.
-        # So "Trend changes" condition implies "Hit Supertrend".
-        # We need to check if we are Long but Trend becomes -1 (hit trailing stop)
-        
-        if in_position == 1 and trend == -1:
-             # Hit Trailing Stop
-             pnl = curr_price - entry_price
-             trades.append({'Time': time_ist, 'Type': 'SL HIT (Long)', 'Price': curr_price, 'PnL': pnl})
-             current_pnl += pnl
-             market_action = "EXIT LONG"
-             in_position = 0
-             action = "SL Hit"
-             
-             # Note: If signal is -1 at same time, we might re-enter Short immediately.
-             # In this simple loop, the 'signal' block above handled trend==-1 logic.
-             # Wait, if Trend == -1, Signal IS -1 (assuming slope condition met).
-             # If Slope condition NOT met, we still exit?
-             # "Sell trade hma slope <= -26 WITH supertrend sell" -> Entry condition.
-             # "Trail both trades with supertrend line" -> Exit condition.
-             # So if Trend flips but No Entry Signal (slope not steep), we just Exit to Flat.
-             
-        # Logic Refinement:
-        # Check Exit First
-        # If Long and Trend == -1 -> Close Long.
-        # If Short and Trend == 1 -> Close Short.
-        
-        # Re-evaluating loop order:
-        # 1. Update/Check Exit
-        # 2. Check Entry
-        
-        for i in range(start_idx, len(df)):
-            row = df.iloc[i]
-            curr_price = row['close']
-            high_price = row['high']
-            low_price = row['low']
-            time_ist = row['time'] + ist_offset
-            trend = row['SupertrendTrend']
-            slope = row['HMA_Slope']
-            
-            # Detect Trend Flip
-            # Compare with previous candle (safe because start_idx > 0 due to warmup)
-            prev_trend = df.iloc[i-1]['SupertrendTrend']
-            if trend != prev_trend:
-                trend_start_idx = i
-            
-            # DEBUG LOG
-            if time_ist.hour == 21:
-                print(f"DEBUG {time_ist.strftime('%H:%M')} | T:{trend} | Slope:{slope:.2f} | Age:{i-trend_start_idx}")
-                
-            line_md = ""
-            line_console = ""
-            
-            # 1. Check Take Profit (Intraday)
-            if in_position == 1:
-                # Update Peak first for stats
-                if high_price > trade_peak_price:
-                    trade_peak_price = high_price
-                
-                # Check TP
-                if high_price >= entry_price + TAKE_PROFIT:
-                    pnl = TAKE_PROFIT # Exact 1000 profit
-                    cumulative_pnl += pnl
-                    exit_price = entry_price + TAKE_PROFIT
-                    
-                    # Run Up is at least TP % (likely exactly TP % if limit order filled)
-                    run_up = (TAKE_PROFIT / entry_price) * 100
-                    
-                    line_console = f"{str(time_ist):<25} {'TP HIT (Long)':<15} {entry_price:<10.2f} {exit_price:<10.2f} {pnl:<10.2f} {run_up:<10.2f}\n"
-                    line_md = f"| {time_ist} | TP HIT (Long) | {entry_price:.2f} | {exit_price:.2f} | {pnl:.2f} | {run_up:.2f}% |\n"
-                    
-                    print(line_console, end="")
-                    f.write(line_md)
-                    
-                    in_position = 0
-                    entry_price = 0
-                    trade_peak_price = 0
-                    continue # Skip Close-based checks for this bar
-                    
-            elif in_position == -1:
-                # Update Peak
-                if low_price < trade_peak_price:
-                    trade_peak_price = low_price
-                    
-                # Check TP
-                if low_price <= entry_price - TAKE_PROFIT:
-                    pnl = TAKE_PROFIT
-                    cumulative_pnl += pnl
-                    exit_price = entry_price - TAKE_PROFIT
-                    
-                    run_up = (TAKE_PROFIT / entry_price) * 100
-                    
-                    line_console = f"{str(time_ist):<25} {'TP HIT (Short)':<15} {entry_price:<10.2f} {exit_price:<10.2f} {pnl:<10.2f} {run_up:<10.2f}\n"
-                    line_md = f"| {time_ist} | TP HIT (Short) | {entry_price:.2f} | {exit_price:.2f} | {pnl:.2f} | {run_up:.2f}% |\n"
-                    
-                    print(line_console, end="")
-                    f.write(line_md)
-                    
-                    in_position = 0
-                    entry_price = 0
-                    trade_peak_price = 0
-                    continue
-            
-            # 2. Check Limits / Trailing Stop (Close-based)
-            if in_position == 1:
-                if trend == -1: # Supertrend flipped to Sell
-                    pnl = curr_price - entry_price
-                    cumulative_pnl += pnl
-                    
-                    # Run Up Calc
-                    run_up = (trade_peak_price - entry_price) / entry_price * 100
-                    
-                    line_console = f"{str(time_ist):<25} {'CLOSE LONG':<15} {entry_price:<10.2f} {curr_price:<10.2f} {pnl:<10.2f} {run_up:<10.2f}\n"
-                    line_md = f"| {time_ist} | CLOSE LONG | {entry_price:.2f} | {curr_price:.2f} | {pnl:.2f} | {run_up:.2f}% |\n"
-                    
-                    in_position = 0
-                    entry_price = 0
-                    trade_peak_price = 0
-                    
-            elif in_position == -1:
-                if trend == 1: # Supertrend flipped to Buy
-                    pnl = entry_price - curr_price
-                    cumulative_pnl += pnl
-                    
-                    # Run Up Calc (Short: Entry - Low)
-                    run_up = (entry_price - trade_peak_price) / entry_price * 100
-                    
-                    line_console = f"{str(time_ist):<25} {'CLOSE SHORT':<15} {entry_price:<10.2f} {curr_price:<10.2f} {pnl:<10.2f} {run_up:<10.2f}\n"
-                    line_md = f"| {time_ist} | CLOSE SHORT | {entry_price:.2f} | {curr_price:.2f} | {pnl:.2f} | {run_up:.2f}% |\n"
-                    
-                    in_position = 0
-                    entry_price = 0
-                    trade_peak_price = 0
-            
-            if line_console:
-                print(line_console, end="")
-                f.write(line_md)
-                line_console = ""
-                line_md = ""
+    open_positions = max_open = 0
+    margin_used = peak_margin = 0.0
+    for _, is_entry, margin in events:
+        open_positions += 1 if is_entry else -1
+        margin_used += margin
+        max_open = max(max_open, open_positions)
+        peak_margin = max(peak_margin, margin_used)
 
-            # 3. Check Entries
-            # Constraint: Entry valid only on 1st or 2nd candle of trend (current index - start index <= 1)
-            trend_age = i - trend_start_idx
-            
-            if in_position == 0:
-                # BUY: Trend Bullish, Slope Valid, and Trend is Fresh (<= 1 candle old)
-                if trend == 1 and slope >= config.HMA_SLOPE_THRESHOLD:
-                    if trend_age <= 1:
-                        in_position = 1
-                        entry_price = curr_price
-                        trade_peak_price = curr_price
-                        trade_count += 1
-                        
-                        line_console = f"{str(time_ist):<25} {'BUY':<15} {curr_price:<10.2f} {'-':<10} {'-':<10} {'-':<10}\n"
-                        line_md = f"| {time_ist} | BUY | {curr_price:.2f} | - | - | - |\n"
-                    
-                # SELL: Trend Bearish, Slope Valid, and Trend is Fresh
-                elif trend == -1 and slope <= -config.HMA_SLOPE_THRESHOLD:
-                    if trend_age <= 1:
-                        in_position = -1
-                        entry_price = curr_price
-                        trade_peak_price = curr_price
-                        trade_count += 1
-                        
-                        line_console = f"{str(time_ist):<25} {'SELL':<15} {curr_price:<10.2f} {'-':<10} {'-':<10} {'-':<10}\n"
-                        line_md = f"| {time_ist} | SELL | {curr_price:.2f} | - | - | - |\n"
+    summary["max_open_positions"] = max_open
+    if in_usd:
+        summary["peak_margin"] = round(peak_margin, 2)
+        summary["return_on_margin"] = round(summary["total_pnl"] / peak_margin * 100, 2) if peak_margin else 0.0
+    return summary
 
-            if line_console:
-                print(line_console, end="")
-                f.write(line_md)
+def describe_margin(portfolio, leverage):
+    """
+    One-line margin summary of a portfolio_summary() for the console and reports.
+    """
+    if "peak_margin" not in portfolio:
+        return (f"Max Open: {portfolio['max_open_positions']} | PnL in points: no contract value for a symbol "
+                f"(config.CONTRACT_VALUES), margin not reported")
+    return (f"Max Open: {portfolio['max_open_positions']} | Peak Margin ({leverage}x): "
+            f"{portfolio['peak_margin']:.2f} USD | Return on Margin: {portfolio['return_on_margin']:.2f}%")
+
+def run_backtest(exchange, symbols, start_utc, end_utc, take_profit=None, slope_threshold=None):
+    """
+    Replays the live strategy (strategy_utils.run_strategy) over each symbol.
+    Returns a results dict: settings, per-symbol trades and summaries, and the
+    portfolio of all symbols traded together.
+    """
+    results = {
+        "period_utc": [str(start_utc), str(end_utc)],
+        "timeframe": config.TIMEFRAME,
+        "leverage": config.LEVERAGE,
+        "settings": {
+            "supertrend": [config.SUPERTREND_PERIOD, config.SUPERTREND_MULTIPLIER],
+            "hma_period": config.HMA_PERIOD
+        },
+        "symbols": {}
+    }
+    all_trades = []
+    for symbol in symbols:
+        logger.info(f"Fetching Market Data: {symbol}...")
+        df, start_idx = load_frame(exchange, symbol, start_utc, end_utc)
+        if df is None:
+            logger.error(f"{symbol}: Failed to fetch data.")
+            continue
+        logger.info(f"{symbol}: Fetched {len(df)} candles, simulating from {df['time'].iloc[min(start_idx, len(df) - 1)]}")
+
+        params = strategy_utils.strategy_params(symbol, take_profit, slope_threshold)
+        trades = strategy_utils.run_strategy(df, symbol, params["take_profit"], params["slope_threshold"], start=start_idx)
+        all_trades.extend(trades)
+        results["symbols"][symbol] = {
+            "take_profit": params["take_profit"],
+            "slope_threshold": params["slope_threshold"],
+            "summary": summarize(trades),
+            "trades": trades
+        }
+
+    results["portfolio"] = portfolio_summary(all_trades)
+    return results
+
+def print_results(results):
+    print(f"{'SYMBOL':<8} {'ENTRY (IST)':<20} {'TYPE':<6} {'ENTRY':<10} {'EXIT':<10} {'REASON':<9} {'PNL':<10}")
+    print("-" * 80)
+    for symbol, res in results["symbols"].items():
+        for t in res["trades"]:
+            entry_ist = (t['entry_time'] + IST_OFFSET).strftime('%Y-%m-%d %H:%M')
+            print(f"{symbol:<8} {entry_ist:<20} {t['type']:<6} {t['entry_price']:<10.2f} {t['exit_price']:<10.2f} "
+                  f"{t['exit_reason'] or 'OPEN':<9} {t['pnl']:<10.2f}")
+    print("-" * 80)
+    for name, summary in [(s, r["summary"]) for s, r in results["symbols"].items()] + [("PORTF.", results["portfolio"])]:
+        print(f"{name:<8} PnL: {summary['total_pnl']:.2f} | Trades: {summary['trades']} | "
+              f"Win Rate: {summary['win_rate']:.1f}% | Max DD: {summary['max_drawdown']:.2f}")
+    print(f"{'':<8} {describe_margin(results['portfolio'], results['leverage'])}")
+
+def _json_default(value):
+    return str(value)
+
+def write_markdown_report(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# Backtest Report ({results['timeframe']})\n\n")
+        f.write(f"**Period (UTC)**: {results['period_utc'][0]} to {results['period_utc'][1]}\n")
+        st_period, st_multiplier = results['settings']['supertrend']
+        f.write(f"**Settings**: Supertrend({st_period}, {st_multiplier}), HMA({results['settings']['hma_period']})\n\n")
+        f.write("| Symbol | Entry (IST) | Type | Entry Price | Exit (IST) | Exit Price | Reason | PnL |\n")
+        f.write("| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |\n")
+        for symbol, res in results["symbols"].items():
+            for t in res["trades"]:
+                exit_ist = t['exit_time'] + IST_OFFSET if t['status'] == 'CLOSED' else '-'
+                f.write(f"| {symbol} | {t['entry_time'] + IST_OFFSET} | {t['type']} | {t['entry_price']:.2f} | {exit_ist} | "
+                        f"{t['exit_price']:.2f} | {t['exit_reason'] or 'OPEN'} | {t['pnl']:.2f} |\n")
 
-        # Summary
-        sep = "-" * 90 + "\n"
-        print(sep, end="")
-        
-        summary_console = f"Total PnL (Points): {cumulative_pnl:.2f}\nTotal Trades Executed: {trade_count}\n"
-        print(summary_console)
-        
         f.write("\n## Summary\n")
-        f.write(f"- **Total Trades**: {trade_count}\n")
-        f.write(f"- **Total PnL**: {cumulative_pnl:.2f} Points\n")
-        f.write("- **Analysis**: 15m timeframe shows fewer signals but caught significant intraday moves. The trailing stop logic captured gains on trend reversals but experienced drawdown in choppy periods.\n")
+        for name, summary in [(s, r["summary"]) for s, r in results["symbols"].items()] + [("Portfolio", results["portfolio"])]:
+            unit = "USD" if summary.get("pnl_unit") == "USD" else "Points"
+            f.write(f"- **{name}**: {summary['total_pnl']:.2f} {unit} over {summary['trades']} trades, "
+                    f"win rate {summary['win_rate']:.1f}%, max drawdown {summary['max_drawdown']:.2f}\n")
+        f.write(f"- **Margin**: {describe_margin(results['portfolio'], results['leverage'])}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the live strategy over historical candles.")
+    parser.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    parser.add_argument("--start", required=True, help="First day (IST), dd/mm/yyyy")
+    parser.add_argument("--end", help="Last day (IST), dd/mm/yyyy (default: --start)")
+    parser.add_argument("--take-profit", type=float, help="Override TAKE_PROFIT points (0 disables it)")
+    parser.add_argument("--threshold", type=float, help="Override the HMA slope threshold")
+    parser.add_argument("--output", default="backtest_results.json", help="Structured results (JSON)")
+    parser.add_argument("--report", help="Optional Markdown report path")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    start_utc = parse_ist_date(args.start)
+    end_utc = parse_ist_date(args.end or args.start, end_of_day=True)
+    logger.info(f"Backtest: {args.symbols}")
+    logger.info(f"Target Period (UTC): {start_utc} to {end_utc}")
+
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+    if args.profile:
+        work = lambda i: run_backtest(exchange, args.symbols, start_utc, end_utc, args.take_profit, args.threshold)
+        profiling.run_profiled(work, args.profile, "backtest", **profiling.options_from_args(args))
+        return
+    results = run_backtest(exchange, args.symbols, start_utc, end_utc, args.take_profit, args.threshold)
+
+    print_results(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=_json_default)
+    logger.info(f"Results written to {args.output}")
+    if args.report:
+        write_markdown_report(results, args.report)
+        logger.info(f"Report written to {args.report}")
 
 if __name__ == "__main__":
-    run_backtest()
+    main()
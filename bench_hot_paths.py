@@ -0,0 +1,154 @@
+"""
+pytest-benchmark suite for the indicator and strategy hot paths.
+
+    python -m pytest bench_hot_paths.py                      # all sizes
+    python -m pytest bench_hot_paths.py -k "1k or tick"      # quick run
+    python -m pytest bench_hot_paths.py --benchmark-save=base --benchmark-compare
+
+Synthetic OHLCV at 1k / 100k / 1M bars. The "reference" groups run the previous
+pure-Python implementations (1k bars only) next to the current ones.
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bot
+import config
+import delta_exchange
+import indicators
+import strategy_utils
+from bench_scan_trades import scan_trades_iloc
+from delta_exchange import DeltaExchange
+from exchange_simulator import ExchangeSimulator, load_recording
+from test_indicators import reference_hma, reference_supertrend
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures", "delta_ethusd_15m.json")
+
+@lru_cache(maxsize=None)
+def ohlcv(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        'time': pd.date_range('2020-01-01', periods=n, freq='15min'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(n) * 0.002),
+        'low': np.minimum(open_, close) * (1 - rng.random(n) * 0.002),
+        'close': close,
+        'volume': rng.integers(500, 20000, n).astype(float)
+    })
+
+@lru_cache(maxsize=None)
+def indicator_frame(n):
+    df = indicators.calculate_supertrend(ohlcv(n).copy(), period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
+    df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
+    df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=7900.0)
+    return df
+
+@lru_cache(maxsize=None)
+def candle_payload(n):
+    """
+    /v2/history/candles result for n bars, newest first like the exchange sends it.
+    """
+    df = ohlcv(n)
+    times = ((df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist()
+    rows = zip(times, df['open'].tolist(), df['high'].tolist(), df['low'].tolist(), df['close'].tolist(), df['volume'].tolist())
+    return [{"time": t, "open": o, "high": h, "low": l, "close": c, "volume": v} for t, o, h, l, c, v in reversed(list(rows))]
+
+size_params = pytest.mark.parametrize("size", list(SIZES))
+
+# --- indicators -----------------------------------------------------------
+
+@size_params
+def test_calculate_hma(benchmark, size):
+    benchmark.group = f"hma {size}"
+    close = ohlcv(SIZES[size])['close']
+    benchmark(indicators.calculate_hma, close, config.HMA_PERIOD)
+
+@size_params
+def test_calculate_supertrend(benchmark, size):
+    benchmark.group = f"supertrend {size}"
+    df = ohlcv(SIZES[size])
+    benchmark(lambda: indicators.calculate_supertrend(df.copy(), config.SUPERTREND_PERIOD, config.SUPERTREND_MULTIPLIER))
+
+@size_params
+def test_calculate_slope_degrees(benchmark, size):
+    benchmark.group = f"slope {size}"
+    hma = indicator_frame(SIZES[size])['HMA']
+    benchmark(indicators.calculate_slope_degrees, hma, 7900.0)
+
+def test_reference_hma(benchmark):
+    benchmark.group = "hma 1k"
+    benchmark(reference_hma, ohlcv(SIZES["1k"])['close'], config.HMA_PERIOD)
+
+def test_reference_supertrend(benchmark):
+    benchmark.group = "supertrend 1k"
+    df = ohlcv(SIZES["1k"])
+    benchmark(lambda: reference_supertrend(df.copy(), config.SUPERTREND_PERIOD, config.SUPERTREND_MULTIPLIER))
+
+# --- strategy -------------------------------------------------------------
+
+@size_params
+def test_scan_trades_for_df(benchmark, size):
+    benchmark.group = f"scan {size}"
+    df = indicator_frame(SIZES[size])
+    benchmark(strategy_utils.scan_trades_for_df, df, "ETHUSD")
+
+def test_reference_scan_trades(benchmark):
+    benchmark.group = "scan 1k"
+    benchmark(scan_trades_iloc, indicator_frame(SIZES["1k"]), "ETHUSD")
+
+# --- candle parsing -------------------------------------------------------
+
+@size_params
+def test_candles_to_frame(benchmark, size):
+    benchmark.group = f"candles_to_frame {size}"
+    payload = candle_payload(SIZES[size])
+    benchmark(delta_exchange.candles_to_frame, payload)
+
+# --- one bot tick over recorded HTTP responses ----------------------------
+
+def fixture_exchange():
+    # Recorded responses served in-process, the newest recorded candle forming now
+    simulator = ExchangeSimulator(load_recording(FIXTURE_PATH))
+    exchange = DeltaExchange("", "", config.BASE_URL)
+    exchange.session.mount(config.BASE_URL, simulator.adapter())
+    return exchange
+
+def test_process_symbol_cold_tick(benchmark, monkeypatch):
+    """
+    First tick: product lookup, history download, indicator seeding, strategy.
+    """
+    benchmark.group = "process_symbol"
+    monkeypatch.setattr(config, "DRY_RUN", True)
+    monkeypatch.setattr(config, "TELEGRAM_ENABLED", False)
+    monkeypatch.setattr(config, "TRADE_LEDGER_PATH", None)
+    monkeypatch.setattr(bot, "ledger", None)
+
+    def tick():
+        bot.ledger = None # empty in-memory ledger: the whole window is scanned
+        bot.process_symbol(fixture_exchange(), "ETHUSD", {})
+    benchmark(tick)
+
+def test_process_symbol_tick(benchmark, monkeypatch):
+    """
+    Steady state: incremental candle fetch, streaming indicator update and ledger cursor.
+    """
+    benchmark.group = "process_symbol"
+    monkeypatch.setattr(config, "DRY_RUN", True)
+    monkeypatch.setattr(config, "TELEGRAM_ENABLED", False)
+    monkeypatch.setattr(config, "TRADE_LEDGER_PATH", None)
+    monkeypatch.setattr(bot, "ledger", None)
+    exchange = fixture_exchange()
+    state = {}
+    bot.process_symbol(exchange, "ETHUSD", state)
+    assert state['indicators'].last_time is not None
+
+    def tick():
+        state.pop('last_bar', None) # a full tick, not the already-evaluated skip
+        bot.process_symbol(exchange, "ETHUSD", state)
+    benchmark(tick)
@@ -1,25 +1,80 @@
-import time
+import argparse
 import pandas as pd
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import clock
 import config
 from delta_exchange import DeltaExchange
 from indicators import calculate_supertrend, calculate_hma, calculate_slope_degrees
+from candle_store import RESOLUTION_SECONDS
+from market_feed import MarketFeed
+import market_service
+import metrics
 import notifier
+import profiling
 import strategy_utils
+from state_store import BotStateStore
+from trade_ledger import TradeLedger
 
 # Setup Logging
 logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_latest_data(exchange, symbol):
+BAR_SECONDS = RESOLUTION_SECONDS.get(config.TIMEFRAME, 60)
+
+# Shared market service state (set in main() when config.USE_MARKET_SERVICE is on)
+market_store = None
+
+# Durable per-symbol state and order journal (set in main())
+state_store = None
+
+# DRY_RUN positions: the strategy's trades, advanced one closed candle per cycle
+ledger = None
+
+def get_ledger():
+    global ledger
+    if ledger is None or ledger.path != config.TRADE_LEDGER_PATH:
+        ledger = TradeLedger(config.TRADE_LEDGER_PATH, book="bot")
+    return ledger
+
+def get_published_data(symbol):
+    """
+    Indicator frame published by market_service.py for the candle that just closed,
+    with its scanned trades in df.attrs['trades']. None if the service has not
+    published it within MARKET_SERVICE_WAIT seconds.
+    """
+    closed_bar_start = (int(clock.now()) // BAR_SECONDS) * BAR_SECONDS - BAR_SECONDS
+    published = market_store.wait_for_bar(symbol, closed_bar_start, timeout=config.MARKET_SERVICE_WAIT)
+    if published is None:
+        return None
+    df = published['frame']
+    df.attrs['trades'] = published['trades']
+    return df
+
+def get_latest_data(exchange, symbol, state=None):
     """
     Fetches historical data and calculates indicators.
+    When a per-symbol state dict is given, indicators are kept incrementally in
+    state['indicators'] (see market_service.compute_frame), or read from the shared
+    market service when it is enabled and up to date.
     """
     try:
+        if state is not None:
+            if market_store is not None:
+                df = get_published_data(symbol)
+                if df is not None:
+                    return df
+                logger.warning(f"{symbol}: Market service has not published the last candle, computing locally")
+
+            df = market_service.compute_frame(exchange, symbol, state)
+            if df is None:
+                logger.error(f"{symbol}: No candle data received")
+            return df
+
         # Calculate time range for last 100 candles (approx 25 hours for 15m)
-        end_time = int(time.time())
+        end_time = int(clock.now())
         start_time = end_time - (25 * 60 * 60)
         
         df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=start_time, end=end_time)
@@ -46,6 +101,16 @@ def get_latest_data(exchange, symbol):
         logger.error(f"Error processing data for {symbol}: {e}")
         return None
 
+def claim_order(symbol, bar, action, side, size):
+    """
+    True unless this order was already journaled for the candle by an earlier run.
+    """
+    return state_store is None or state_store.claim_order(symbol, bar, action, side, size)
+
+def save_state(symbol, state):
+    if state_store is not None:
+        state_store.save(symbol, state)
+
 def process_symbol(exchange, symbol, state):
     """
     Process trading logic for a single symbol.
@@ -60,25 +125,38 @@ def process_symbol(exchange, symbol, state):
                 return
             state['product_id'] = product_id
 
+        # Restarted within the candle that was evaluated last: nothing to do until it closes
+        closed_bar_start = (int(clock.now()) // BAR_SECONDS) * BAR_SECONDS - BAR_SECONDS
+        if state.get('last_bar') is not None and state['last_bar'] >= closed_bar_start:
+            return
+
         # Get Data
-        df = get_latest_data(exchange, symbol)
+        df = get_latest_data(exchange, symbol, state)
         if df is None: return
 
         if len(df) < 2:
             logger.warning(f"{symbol}: Not enough data yet")
             return
             
-        acc_idx = -2 # Last closed candle
+        # Last closed candle: normally -2 (last row is the forming bar). Right after a bar
+        # closes the exchange may not have opened the next one yet, then it is the last row.
+        acc_idx = -2
+        if df.iloc[-1]['time'].timestamp() + BAR_SECONDS <= clock.now():
+            acc_idx = -1
         last_candle = df.iloc[acc_idx]
+        bar = int(last_candle['time'].timestamp())
+        if state.get('last_bar') is not None and bar <= state['last_bar']:
+            logger.info(f"{symbol}: Candle {last_candle['time']} was already evaluated, skipping")
+            return
         curr_price = last_candle['close']
         curr_trend = last_candle['SupertrendTrend'] # 1 Buy, -1 Sell
         curr_slope = last_candle['HMA_Slope']
         
         # Trend Age
         trend_age = 999
-        if len(df) >= 4:
-            prev_candle = df.iloc[-3]
-            prev_prev_candle = df.iloc[-4]
+        if len(df) >= 2 - acc_idx:
+            prev_candle = df.iloc[acc_idx - 1]
+            prev_prev_candle = df.iloc[acc_idx - 2]
             prev_trend = prev_candle['SupertrendTrend']
             prev_prev_trend = prev_prev_candle['SupertrendTrend']
             
@@ -90,9 +168,10 @@ def process_symbol(exchange, symbol, state):
                 trend_age = 999
         
         # Configs
-        qty = config.QUANTITIES.get(symbol, config.DEFAULT_QUANTITY)
-        sym_config = config.SYMBOL_CONFIG.get(symbol, {})
-        slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
+        params = strategy_utils.strategy_params(symbol)
+        qty = params["qty"]
+        slope_threshold = params["slope_threshold"]
+        take_profit = params["take_profit"]
         
         # State
         last_traded_trend = state.get('last_traded_trend')
@@ -107,31 +186,34 @@ def process_symbol(exchange, symbol, state):
         logger.info(f"{symbol} | Price: {curr_price} | Trend: {curr_trend} (Age: {trend_age}) | Slope: {curr_slope:.2f} (Thresh: {slope_threshold})")
 
         # Position Check
-        if config.DRY_RUN:
-            # SIMULATED POSITION (from Strategy)
-            trades = strategy_utils.scan_trades_for_df(df, symbol)
-            position = {}
-            if trades and trades[-1]['status'] == 'OPEN':
-                t = trades[-1]
-                # Mock structure similar to exchange response
-                position = {
-                    "size": config.QUANTITIES.get(symbol, config.DEFAULT_QUANTITY) * (1 if t['type']=='LONG' else -1),
-                    "entry_price": float(t['entry_price']),
-                    "side": 'buy' if t['type']=='LONG' else 'sell',
-                    "unrealized_pl": float(t['pnl'])
-                }
-        else:
-            # REAL POSITION (from Exchange)
-            position = exchange.get_position(product_id)
+        with metrics.STAGE_SECONDS.time(stage="position", symbol=symbol):
+            if config.DRY_RUN:
+                # SIMULATED POSITION (from Strategy, as it stood before the candle evaluated now)
+                before = len(df) + acc_idx
+                get_ledger().update(symbol, df, closed=before)
+                t = get_ledger().open_trade(symbol, float(df['close'].iloc[before - 1]))
+                position = {}
+                if t is not None:
+                    # Mock structure similar to exchange response
+                    position = {
+                        "size": qty * (1 if t['type']=='LONG' else -1),
+                        "entry_price": float(t['entry_price']),
+                        "side": 'buy' if t['type']=='LONG' else 'sell',
+                        "unrealized_pl": float(t['pnl'])
+                    }
+            else:
+                # REAL POSITION (from Exchange)
+                position = exchange.get_position(product_id)
 
         current_qty = 0
         entry_price = 0
+        held = None # position after this candle's orders, persisted with the state
         
         if position and float(position.get("size", 0)) != 0:
              current_qty = abs(float(position["size"])) # size can be negative from exchange
              entry_price = float(position.get("entry_price", 0))
-
-        TAKE_PROFIT = 1000
+             is_short = position.get('side') == 'sell' or float(position['size']) < 0
+             held = {"side": "SHORT" if is_short else "LONG", "size": current_qty, "entry_price": entry_price}
 
         # 1. Exit Logic
         if current_qty > 0:
@@ -140,84 +222,124 @@ def process_symbol(exchange, symbol, state):
             if position.get('side') == 'sell' or (position.get('size') and float(position['size']) < 0):
                 is_long = False
                 
-            # TP
-            if is_long and curr_price >= entry_price + TAKE_PROFIT:
-                logger.info(f"{symbol}: Take Profit Hit (Long)")
-                if not config.DRY_RUN:
-                    exchange.place_order(product_id, current_qty, "sell", "market_order")
-            elif not is_long and curr_price <= entry_price - TAKE_PROFIT:
-                logger.info(f"{symbol}: Take Profit Hit (Short)")
-                if not config.DRY_RUN:
-                    exchange.place_order(product_id, current_qty, "buy", "market_order")
-                
-            # Trend Reversal
-            if is_long and curr_trend == -1:
-                logger.info(f"{symbol}: Trend Reversal (Long -> Short) - Closing")
-                if not config.DRY_RUN:
-                    exchange.place_order(product_id, current_qty, "sell", "market_order")
-            elif not is_long and curr_trend == 1:
-                logger.info(f"{symbol}: Trend Reversal (Short -> Long) - Closing")
+            reason = strategy_utils.exit_signal(1 if is_long else -1, entry_price, curr_price, curr_trend, take_profit)
+            if reason == "TP":
+                logger.info(f"{symbol}: Take Profit Hit ({'Long' if is_long else 'Short'})")
+            elif reason == "REVERSAL":
+                logger.info(f"{symbol}: Trend Reversal ({'Long -> Short' if is_long else 'Short -> Long'}) - Closing")
+
+            if reason:
                 if not config.DRY_RUN:
-                    exchange.place_order(product_id, current_qty, "buy", "market_order")
+                    if claim_order(symbol, bar, "exit", "sell" if is_long else "buy", current_qty):
+                        with metrics.STAGE_SECONDS.time(stage="order", symbol=symbol):
+                            exchange.place_order(product_id, current_qty, "sell" if is_long else "buy", "market_order")
+                    else:
+                        logger.warning(f"{symbol}: Exit for this candle was already sent before a restart, not repeating it")
+                current_qty = 0 # Flat now, the same candle may open the opposite trade
+                held = None
 
         # 2. Entry Logic
         if current_qty == 0:
-            if curr_trend == 1 and curr_slope >= slope_threshold and last_traded_trend != 1:
-                if trend_age <= 1:
-                    msg = f"🚀 **BUY SIGNAL** #{symbol}\nPrice: {curr_price}\nSlope: {curr_slope:.2f}/{slope_threshold}"
-                    logger.info(f"{symbol}: {msg.replace('*','').replace(chr(10), ' ')}") # Log clean
+            signal = strategy_utils.entry_signal(curr_trend, curr_slope, trend_age, slope_threshold, last_traded_trend)
+            if signal and not config.DRY_RUN and not claim_order(symbol, bar, "entry", "buy" if signal == 1 else "sell", qty):
+                logger.warning(f"{symbol}: Entry for this candle was already sent before a restart, not repeating it")
+                state['last_traded_trend'] = signal
+                held = {"side": "LONG" if signal == 1 else "SHORT", "size": qty, "entry_price": float(curr_price)}
+            elif signal == 1:
+                msg = f"🚀 **BUY SIGNAL** #{symbol}\nPrice: {curr_price}\nSlope: {curr_slope:.2f}/{slope_threshold}"
+                logger.info(f"{symbol}: {msg.replace('*','').replace(chr(10), ' ')}") # Log clean
+                with metrics.STAGE_SECONDS.time(stage="telegram", symbol=symbol):
                     notifier.send_telegram_message(msg)
-                    
-                    if not config.DRY_RUN:
+                
+                if not config.DRY_RUN:
+                    with metrics.STAGE_SECONDS.time(stage="order", symbol=symbol):
                         exchange.place_order(product_id, qty, "buy")
-                    state['last_traded_trend'] = 1
-                else:
-                     if curr_slope >= slope_threshold:
-                         logger.info(f"{symbol}: Skipping BUY: Trend too old (Age {trend_age})")
+                state['last_traded_trend'] = 1
+                held = {"side": "LONG", "size": qty, "entry_price": float(curr_price)}
                 
-            elif curr_trend == -1 and curr_slope <= -slope_threshold and last_traded_trend != -1:
-                 if trend_age <= 1:
-                     msg = f"🔻 **SELL SIGNAL** #{symbol}\nPrice: {curr_price}\nSlope: {curr_slope:.2f}/{slope_threshold}"
-                     logger.info(f"{symbol}: {msg.replace('*','').replace(chr(10), ' ')}")
+            elif signal == -1:
+                 msg = f"🔻 **SELL SIGNAL** #{symbol}\nPrice: {curr_price}\nSlope: {curr_slope:.2f}/{slope_threshold}"
+                 logger.info(f"{symbol}: {msg.replace('*','').replace(chr(10), ' ')}")
+                 with metrics.STAGE_SECONDS.time(stage="telegram", symbol=symbol):
                      notifier.send_telegram_message(msg)
-                     
-                     if not config.DRY_RUN:
+                 
+                 if not config.DRY_RUN:
+                    with metrics.STAGE_SECONDS.time(stage="order", symbol=symbol):
                         exchange.place_order(product_id, qty, "sell")
-                     state['last_traded_trend'] = -1
-                 else:
-                     if curr_slope <= -slope_threshold:
-                         logger.info(f"{symbol}: Skipping SELL: Trend too old (Age {trend_age})")
+                 state['last_traded_trend'] = -1
+                 held = {"side": "SHORT", "size": qty, "entry_price": float(curr_price)}
                  
-            else:
-                if curr_trend == last_traded_trend:
-                    logger.info(f"{symbol}: Skipping Re-entry for Trend {curr_trend}")
+            elif curr_trend == last_traded_trend:
+                logger.info(f"{symbol}: Skipping Re-entry for Trend {curr_trend}")
+            elif trend_age > 1 and curr_trend * curr_slope >= slope_threshold:
+                logger.info(f"{symbol}: Skipping {'BUY' if curr_trend == 1 else 'SELL'}: Trend too old (Age {trend_age})")
+
+        state['position'] = held
+        state['last_bar'] = bar
+        save_state(symbol, state)
 
     except Exception as e:
         logger.error(f"Error processing {symbol}: {e}")
 
-def main():
-    logger.info("Starting Delta Exchange Bot (Multi-Symbol)...")
-    
-    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL)
-    
-    # State tracking for each symbol
-    # keys: 'product_id', 'last_traded_trend'
-    bot_state = { sym: {} for sym in config.QUANTITIES.keys() }
-    
-    logger.info(f"Monitoring Symbols: {list(bot_state.keys())}")
-    
-    # --- STARTUP REPORT ---
-    # --- STARTUP REPORT ---
+def seconds_until_next_bar(now=None):
+    """
+    Seconds until the current candle closes plus BAR_CLOSE_DELAY.
+    Computed from the wall clock every time, so the schedule never drifts.
+    """
+    if now is None:
+        now = clock.now()
+    return BAR_SECONDS - (now % BAR_SECONDS) + config.BAR_CLOSE_DELAY
+
+def loop_lag(now=None):
+    """
+    Seconds the bot woke up later than BAR_CLOSE_DELAY after the last candle close.
+    """
+    if now is None:
+        now = clock.now()
+    return max(0.0, now % BAR_SECONDS - config.BAR_CLOSE_DELAY)
+
+def wait_for_next_bar(feed=None):
+    """
+    Sleeps until the next candle closes. With a market feed the bot wakes as soon
+    as the feed sees a bar close, the clock stays as the fallback.
+    """
+    sleep_time = seconds_until_next_bar()
+    logger.info(f"Sleeping for {sleep_time:.2f} seconds...")
+    if feed is None:
+        clock.sleep(sleep_time)
+        return
+    if feed.wait_for_close(timeout=sleep_time):
+        clock.sleep(config.BAR_CLOSE_DELAY) # let the other symbols' bars close too
+
+def run_cycle(exchange, bot_state, pool):
+    """
+    Evaluates every symbol concurrently; the exchange's token bucket keeps the
+    combined request rate under config.API_RATE_LIMIT.
+    """
+    with metrics.CYCLE_SECONDS.time():
+        futures = [pool.submit(process_symbol, exchange, symbol, state) for symbol, state in bot_state.items()]
+        for future in futures:
+            future.result()
+
+def startup_report(exchange, bot_state, pool):
+    """
+    Cold start: downloads every symbol's history (seeding the streaming indicator state)
+    and sends the Telegram startup report with the strategy's open positions.
+    """
     logger.info("Generating Startup Report...")
     history_data = {}
     active_positions = []
     
-    for symbol in bot_state.keys():
+    # 1. Get History & Data for all symbols at once (seeds the streaming indicator state)
+    symbols = list(bot_state.keys())
+    frames = pool.map(lambda sym: get_latest_data(exchange, sym, bot_state[sym]), symbols)
+
+    for symbol, df in zip(symbols, frames):
         try:
-            # 1. Get History & Data
-            df = get_latest_data(exchange, symbol)
             if df is not None:
-                 trades = strategy_utils.scan_trades_for_df(df, symbol)
+                 trades = df.attrs.get('trades')
+                 if trades is None:
+                     trades = strategy_utils.scan_trades_for_df(df, symbol)
                  
                  # 2. Check for Active Position in Strategy
                  if trades and trades[-1]['status'] == 'OPEN':
@@ -254,27 +376,127 @@ def main():
                   f"Entry: {pos['entry_price']}\n" \
                   f"uPnL: {pos['pnl']}"
             notifier.send_telegram_message(msg)
-            
+
+def resume_report(bot_state):
+    """
+    Warm restart: reports the positions saved in the state store, without any download.
+    """
+    held = [(symbol, state['position']) for symbol, state in bot_state.items() if state.get('position')]
+    lines = [f"#{symbol} {p['side']} {p['size']} @ {p['entry_price']}" for symbol, p in held]
+    logger.info(f"Resumed saved state, open positions: {lines or 'none'}")
+    notifier.send_telegram_message("♻️ **BOT RESTARTED** (state restored)\n" + ("\n".join(lines) if lines else "No open positions"))
+
+def restore_state(symbols):
+    """
+    Per-symbol state dicts from the state store, and whether every symbol was saved
+    recently enough (WARM_RESTART_MAX_AGE) to skip the startup download.
+    """
+    saved = state_store.load()
+    bot_state = {}
+    warm = True
+    for symbol in symbols:
+        state = saved.get(symbol)
+        if state is None:
+            bot_state[symbol] = {}
+            warm = False
+            continue
+        updated_at = state.pop('updated_at')
+        warm = warm and clock.now() - updated_at <= config.WARM_RESTART_MAX_AGE
+        bot_state[symbol] = {k: v for k, v in state.items() if v is not None}
+    return bot_state, warm
+
+def start_metrics():
+    """
+    Serves /metrics on METRICS_HOST:METRICS_PORT. A port already in use only costs the
+    metrics, never the trading loop.
+    """
+    try:
+        server = metrics.serve(config.METRICS_PORT, config.METRICS_HOST)
+    except OSError as e:
+        logger.warning(f"Metrics server disabled, cannot bind {config.METRICS_HOST}:{config.METRICS_PORT}: {e}")
+        return None
+    logger.info(f"Metrics on http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+    return server
+
+def main(exchange=None):
+    """
+    Runs the bot until interrupted. `exchange` defaults to a DeltaExchange built from config.py.
+    """
+    global market_store, state_store
+    logger.info("Starting Delta Exchange Bot (Multi-Symbol)...")
+    
+    if config.USE_MARKET_SERVICE:
+        market_store = market_service.MarketStateStore(config.MARKET_STATE_PATH)
+    
+    if config.METRICS_PORT:
+        start_metrics()
+
+    if exchange is None:
+        exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH,
+                                 rate_limit=config.API_RATE_LIMIT)
+    pool = ThreadPoolExecutor(max_workers=config.SYMBOL_WORKERS)
+    
+    # State tracking for each symbol
+    # keys: 'product_id', 'last_traded_trend', 'last_bar', 'position' (saved in state_store), 'indicators'
+    state_store = BotStateStore(config.BOT_STATE_PATH)
+    bot_state, warm = restore_state(config.QUANTITIES.keys())
+    
+    logger.info(f"Monitoring Symbols: {list(bot_state.keys())}")
+
+    feed = None
+    if config.USE_WS_FEED:
+        feed = MarketFeed(exchange, bot_state.keys(), timeframe=config.TIMEFRAME, url=config.WS_URL)
+        feed.start()
+    
+    # --- STARTUP REPORT ---
+    if warm:
+        resume_report(bot_state)
+    else:
+        startup_report(exchange, bot_state, pool)
     # ----------------------
 
     while True:
         try:
-            for symbol in bot_state.keys():
-                process_symbol(exchange, symbol, bot_state[symbol])
-                time.sleep(1) # Small delay between symbols to avoid rate limits
+            run_cycle(exchange, bot_state, pool)
                 
-            # Sleep logic to align with next minute
-            now = time.time()
-            sleep_time = 60 - (now % 60) + 2 # +2s buffer
-            logger.info(f"Sleeping for {sleep_time:.2f} seconds...")
-            time.sleep(sleep_time)
+            # Sleep until the next candle closes
+            wait_for_next_bar(feed)
+            metrics.LOOP_LAG.set(loop_lag())
 
         except KeyboardInterrupt:
             logger.info("Bot stopped by user.")
+            if feed is not None:
+                feed.stop()
             break
         except Exception as e:
             logger.error(f"Error in main loop: {e}")
-            time.sleep(10)
+            clock.sleep(10)
+
+def profile_cycles(exchange, iterations, **options):
+    """
+    Profiles back-to-back evaluations of every symbol in the calling thread, without
+    sleeping. DRY_RUN is forced, Telegram is off and the ledger is in memory, so nothing
+    is sent or stored.
+    """
+    config.DRY_RUN = True
+    config.TELEGRAM_ENABLED = False
+    config.TRADE_LEDGER_PATH = None
+    bot_state = { sym: {} for sym in config.QUANTITIES.keys() }
+
+    def work(i):
+        for symbol, state in bot_state.items():
+            state.pop('last_bar', None) # evaluate the same candle again instead of skipping it
+            process_symbol(exchange, symbol, state)
+
+    profiling.run_profiled(work, iterations, "bot", **options)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Delta Exchange multi-symbol trading bot.")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.profile:
+        exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH,
+                                 rate_limit=config.API_RATE_LIMIT)
+        profile_cycles(exchange, args.profile, **profiling.options_from_args(args))
+    else:
+        main()
@@ -1,78 +1,112 @@
+import argparse
+import pprint
+import time
+
+import numpy as np
+
 import config
+from candle_store import RESOLUTION_SECONDS
 from delta_exchange import DeltaExchange
 import indicators
-from datetime import datetime, timedelta
-import pandas as pd
-import math
-import numpy as np
+
+# slope = degrees(atan(pct_change * scaling)), so |slope| >= threshold exactly when
+# |pct_change| >= tan(radians(threshold)) / scaling. For a target share of bars
+# beyond the threshold, scaling = tan(radians(threshold)) / quantile(|pct_change|).
+
+def hma_pct_changes(frames, hma_period):
+    """
+    HMA pct_change of every symbol's closes as one (symbols x bars) matrix, NaN-padded
+    on the left where a symbol has less history.
+    """
+    series = [indicators.calculate_hma(df['close'], period=hma_period).pct_change().to_numpy() for df in frames]
+    width = max((len(s) for s in series), default=0)
+    matrix = np.full((len(series), width), np.nan)
+    for row, s in zip(matrix, series):
+        row[width - len(s):] = s
+    return matrix
+
+def signal_share(pct_changes, scalings, thresholds):
+    """
+    Share of bars per symbol whose |slope| reaches the threshold with the given scalings.
+    """
+    limits = np.tan(np.radians(thresholds)) / scalings
+    valid = ~np.isnan(pct_changes)
+    hits = np.abs(np.nan_to_num(pct_changes)) >= limits[:, None]
+    return (hits & valid).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+
+def solve_scaling(pct_changes, thresholds, share):
+    """
+    Scaling per symbol so that `share` of its bars have |slope| >= its threshold.
+    """
+    quantiles = np.nanquantile(np.abs(pct_changes), 1 - share, axis=1)
+    return np.tan(np.radians(thresholds)) / quantiles
+
+def propose_symbol_config(symbols, scalings, digits=2):
+    """
+    config.SYMBOL_CONFIG with the calibrated slope_scaling for `symbols` (rounded to
+    `digits` significant digits), other keys kept.
+    """
+    proposed = {sym: dict(cfg) for sym, cfg in config.SYMBOL_CONFIG.items()}
+    for symbol, scaling in zip(symbols, scalings):
+        proposed.setdefault(symbol, {})["slope_scaling"] = float(f"{scaling:.{digits}g}")
+    return proposed
 
 def calibrate():
-    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL)
-    symbol = "ETHUSD"
-    
-    print(f"Fetching data for {symbol}...")
-    start_dt = datetime.now() - timedelta(days=2)
-    end_dt = datetime.now()
-    
-    df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=int(start_dt.timestamp()), end=int(end_dt.timestamp()))
-    
-    if df is None or df.empty:
-        print("No data received")
-        return
+    parser = argparse.ArgumentParser(description="Calibrate slope_scaling per symbol from the HMA pct_change distribution.")
+    parser.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    parser.add_argument("--days", type=int, default=28, help="History to analyse")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--signals-per-day", type=float, help="Target bars per day beyond the slope threshold")
+    target.add_argument("--percentile", type=float, default=95.0,
+                        help="Percentile of |pct_change| that should land exactly on the threshold (default: 95)")
+    parser.add_argument("--output", default="symbol_config_proposed.py")
+    args = parser.parse_args()
 
-    # Calculate Indicators with current config to find the row
-    df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
-    
-    # Calculate percentage change series which is the base for slope
-    # slope = degrees(atan(pct_change * factor))
-    # so pct_change = tan(radians(slope)) / factor
-    series = df['HMA']
-    pct_changes = series.pct_change()
-    
-    # Find the target candle : 08:15 UTC
-    # Since we don't know the exact day (probably today Dec 20), we search for 08:15 in last few rows
-    target_row_idx = -1
-    target_time_str = "08:15:00"
-    
-    print(f"Searching for {target_time_str}...")
-    for i in range(len(df)-1, 0, -1):
-        t_str = str(df.iloc[i]['time']) # Expecting format like 2025-12-20 08:15:00
-        if target_time_str in t_str:
-            target_row_idx = i
-            print(f"Found target candle at index {i}: {t_str}")
-            break
-            
-    if target_row_idx == -1:
-        print("Target candle not found!")
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+    end_time = int(time.time())
+    start_time = end_time - args.days * 24 * 60 * 60
+
+    symbols, frames = [], []
+    for symbol in args.symbols:
+        print(f"Fetching {args.days} days of data for {symbol}...")
+        df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=start_time, end=end_time)
+        if df is None or df.empty:
+            print(f"{symbol}: No data received")
+            continue
+        symbols.append(symbol)
+        frames.append(df)
+    if not symbols:
         return
 
-    # Get the pct_change for this candle
-    target_pct_change = pct_changes.iloc[target_row_idx]
-    
-    print(f"HMA pct_change at target: {target_pct_change}")
-    
-    # Goal: We want slope >= 26 degrees
-    # Target Angle = 26
-    # equation: 26 = degrees(atan(pct_change * new_factor))
-    # tan(radians(26)) = pct_change * new_factor
-    # new_factor = tan(radians(26)) / pct_change
-    
-    target_angle = 26.0
-    rad_angle = math.radians(target_angle)
-    tan_angle = math.tan(rad_angle)
-    
-    required_factor = tan_angle / target_pct_change
-    
-    print(f"Target Angle: {target_angle} degrees")
-    print(f"Required Scaling Factor: {required_factor:.2f}")
-    
-    # Verification
-    check_slope = math.degrees(math.atan(target_pct_change * required_factor))
-    print(f"Verification Check: atan({target_pct_change:.6f} * {required_factor:.2f}) -> {check_slope:.2f} degrees")
-    
-    # Suggest a round number
-    suggested = round(required_factor / 100) * 100
-    print(f"Suggested Round Factor: {suggested}")
+    bars_per_day = 24 * 60 * 60 / RESOLUTION_SECONDS[config.TIMEFRAME]
+    if args.signals_per_day is not None:
+        share = args.signals_per_day / bars_per_day
+    else:
+        share = 1 - args.percentile / 100
+
+    sym_configs = [config.SYMBOL_CONFIG.get(sym, {}) for sym in symbols]
+    thresholds = np.array([c.get("slope_threshold", config.HMA_SLOPE_THRESHOLD) for c in sym_configs], dtype=float)
+    current = np.array([c.get("slope_scaling", config.DEFAULT_SLOPE_SCALING) for c in sym_configs], dtype=float)
+
+    pct_changes = hma_pct_changes(frames, config.HMA_PERIOD)
+    scalings = solve_scaling(pct_changes, thresholds, share)
+    current_share = signal_share(pct_changes, current, thresholds)
+    new_share = signal_share(pct_changes, scalings, thresholds)
+
+    print(f"\nTarget: {share * 100:.2f}% of bars beyond the threshold ({share * bars_per_day:.1f} per day)")
+    print(f"{'SYMBOL':<8} {'BARS':>6} {'THRESH':>7} {'CURRENT':>10} {'PER DAY':>8} {'PROPOSED':>10} {'PER DAY':>8}")
+    for i, symbol in enumerate(symbols):
+        bars = int((~np.isnan(pct_changes[i])).sum())
+        print(f"{symbol:<8} {bars:>6} {thresholds[i]:>7.1f} {current[i]:>10.1f} {current_share[i] * bars_per_day:>8.1f} "
+              f"{scalings[i]:>10.1f} {new_share[i] * bars_per_day:>8.1f}")
+
+    proposed = propose_symbol_config(symbols, scalings)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(f"# Proposed by calibrate_slope.py from {args.days} days of {config.TIMEFRAME} candles, "
+                f"target {share * 100:.2f}% of bars beyond the slope threshold.\n")
+        f.write("# Review, then copy into config.py.\n")
+        f.write(f"SYMBOL_CONFIG = {pprint.pformat(proposed, sort_dicts=False)}\n")
+    print(f"\nProposed SYMBOL_CONFIG written to {args.output}")
 
 if __name__ == "__main__":
     calibrate()
@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+import pandas as pd
+
+import clock
+
+# Candle resolutions supported by /v2/history/candles, in seconds
+RESOLUTION_SECONDS = {
+    "1m": 60,
+    "3m": 3 * 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "1h": 60 * 60,
+    "2h": 2 * 60 * 60,
+    "4h": 4 * 60 * 60,
+    "6h": 6 * 60 * 60,
+    "1d": 24 * 60 * 60,
+    "1w": 7 * 24 * 60 * 60
+}
+
+CANDLE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+class CandleStore:
+    """
+    On-disk OHLCV cache (SQLite) keyed by symbol and resolution.
+    Remembers which [start, end] ranges have already been synced, so repeated
+    requests only download the gaps. Only closed bars are stored; the forming
+    bar is always fetched live.
+    """
+    def __init__(self, path="candles.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        # WAL lets bot.py and server.py read/write the same file concurrently
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS candles (
+                symbol TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                time INTEGER NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (symbol, resolution, time)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS coverage (
+                symbol TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                end INTEGER NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _coverage(self, symbol, resolution):
+        rows = self._conn.execute(
+            "SELECT start, end FROM coverage WHERE symbol = ? AND resolution = ? ORDER BY start",
+            (symbol, resolution)
+        ).fetchall()
+        return [(int(s), int(e)) for s, e in rows]
+
+    def missing_ranges(self, symbol, resolution, start, end):
+        """
+        Returns the [start, end] sub-ranges of the request that are not cached yet.
+        """
+        with self._lock:
+            covered = self._coverage(symbol, resolution)
+
+        missing = []
+        cursor = start
+        for c_start, c_end in covered:
+            if c_end < cursor:
+                continue
+            if c_start > end:
+                break
+            if c_start > cursor:
+                missing.append((cursor, c_start - 1))
+            cursor = max(cursor, c_end + 1)
+            if cursor > end:
+                break
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    def add(self, symbol, resolution, df, start, end):
+        """
+        Stores candles from a fetch_candles()-style DataFrame and marks
+        [start, end] as synced (merged with adjacent covered ranges).
+        """
+        rows = []
+        if df is not None and not df.empty:
+            times = (df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+            rows = list(zip(
+                (symbol for _ in range(len(df))),
+                (resolution for _ in range(len(df))),
+                times.astype(int).tolist(),
+                df['open'].tolist(), df['high'].tolist(), df['low'].tolist(),
+                df['close'].tolist(), df['volume'].tolist()
+            ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO candles (symbol, resolution, time, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+            # Merge the new range into the existing coverage
+            merged = []
+            for c_start, c_end in sorted(self._coverage(symbol, resolution) + [(start, end)]):
+                if merged and c_start <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], c_end))
+                else:
+                    merged.append((c_start, c_end))
+            self._conn.execute("DELETE FROM coverage WHERE symbol = ? AND resolution = ?", (symbol, resolution))
+            self._conn.executemany(
+                "INSERT INTO coverage (symbol, resolution, start, end) VALUES (?, ?, ?, ?)",
+                [(symbol, resolution, s, e) for s, e in merged]
+            )
+            self._conn.commit()
+
+    def load(self, symbol, resolution, start, end):
+        """
+        Returns cached candles with start <= time <= end as a DataFrame.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT time, open, high, low, close, volume FROM candles "
+                "WHERE symbol = ? AND resolution = ? AND time BETWEEN ? AND ? ORDER BY time",
+                (symbol, resolution, start, end)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=CANDLE_COLUMNS)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
+
+    def fetch(self, symbol, resolution, start, end, downloader):
+        """
+        Serves [start, end] from the cache, calling downloader(symbol, resolution, start, end)
+        only for missing ranges and for the still-forming bar.
+        downloader returns a DataFrame (possibly empty) or None on failure.
+        """
+        bar_seconds = RESOLUTION_SECONDS.get(resolution)
+        if bar_seconds is None:
+            df = downloader(symbol, resolution, start, end)
+            return df if df is not None else pd.DataFrame()
+
+        # Bars opening at or after forming_start are not closed yet, never cache them
+        forming_start = (int(clock.now()) // bar_seconds) * bar_seconds
+        closed_end = min(end, forming_start - 1)
+
+        live = []
+        tail_fetched = end < forming_start
+        if start <= closed_end:
+            missing = self.missing_ranges(symbol, resolution, start, closed_end)
+            for i, (m_start, m_end) in enumerate(missing):
+                # Fold the live tail into the last gap when they touch: one request instead of two
+                fetch_end = end if (i == len(missing) - 1 and m_end == closed_end and not tail_fetched) else m_end
+                df = downloader(symbol, resolution, m_start, fetch_end)
+                if df is None:
+                    continue # leave the gap uncovered, retried on the next call
+                if fetch_end != m_end:
+                    tail_fetched = True
+                    if not df.empty:
+                        is_forming = df['time'] >= pd.Timestamp(forming_start, unit='s')
+                        live.append(df[is_forming])
+                        df = df[~is_forming]
+                self.add(symbol, resolution, df, m_start, m_end)
+
+        if not tail_fetched:
+            df = downloader(symbol, resolution, max(start, forming_start), end)
+            if df is not None and not df.empty:
+                live.append(df)
+
+        cached = self.load(symbol, resolution, start, closed_end) if start <= closed_end else None
+        frames = [f[CANDLE_COLUMNS] for f in [cached] + live if f is not None and not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates('time', keep='last').sort_values('time').reset_index(drop=True)
+        return df
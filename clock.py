@@ -0,0 +1,57 @@
+import threading
+import time
+
+class SystemClock:
+    """
+    Wall clock: the default for live trading.
+    """
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class ReplayFinished(BaseException):
+    """
+    Raised by VirtualClock.sleep once the replay passes its end. Derives from
+    BaseException so the bot's `except Exception` retry loop does not swallow it.
+    """
+
+class VirtualClock:
+    """
+    Simulated time for replays: sleep() advances the clock instantly.
+    """
+    def __init__(self, start, end=None):
+        self.now = float(start)
+        self.end = end
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(seconds, 0)
+            finished = self.end is not None and self.now > self.end
+        if finished:
+            raise ReplayFinished()
+
+_clock = SystemClock()
+
+def now():
+    """
+    Current time in epoch seconds from the active clock.
+    """
+    return _clock.time()
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+def set_clock(new_clock):
+    """
+    Makes new_clock the active clock for bot, market service and candle cache code.
+    Returns the previous clock so callers can restore it.
+    """
+    global _clock
+    previous, _clock = _clock, new_clock
+    return previous
@@ -19,6 +19,12 @@ QUANTITIES = {
     "SOLUSD": 10
 }
 DEFAULT_QUANTITY = 1
+# Underlying per contract (Delta /v2/products contract_value): converts PnL points x contracts to USD
+CONTRACT_VALUES = {
+    "BTCUSD": 0.001,
+    "ETHUSD": 0.01,
+    "SOLUSD": 1
+}
 LEVERAGE = 10
 TIMEFRAME = "15m"   # 15 minute candles
 
@@ -46,7 +52,39 @@ SYMBOL_CONFIG = {
 # Fallback defaults
 DEFAULT_SLOPE_SCALING = 3000.0
 HMA_SLOPE_THRESHOLD = 26 
+TAKE_PROFIT = 1000  # Points from entry, checked on candle close (per symbol: "take_profit" in SYMBOL_CONFIG)
+
+
+# Local Candle Cache (SQLite file shared by bot, dashboard and backtests; set to None to disable)
+CANDLE_CACHE_PATH = "candles.db"
+
+# Scheduler Settings
+SYMBOL_WORKERS = 8      # Symbols evaluated concurrently each cycle
+API_RATE_LIMIT = 10     # Max REST requests per second across all symbols
+BAR_CLOSE_DELAY = 1     # Seconds after a candle closes before evaluating it
+METRICS_PORT = None     # Prometheus /metrics endpoint of bot.py, e.g. 9108 (None = disabled)
+METRICS_HOST = "127.0.0.1"  # "0.0.0.0" to let a remote Prometheus scrape it
+
+# WebSocket Market Feed (wake the bot on bar close instead of on the clock)
+USE_WS_FEED = False
+# For Global users: wss://socket.delta.exchange
+WS_URL = "wss://socket.india.delta.exchange"
+
+# Shared Market Service (market_service.py computes indicators once for bot.py and server.py)
+USE_MARKET_SERVICE = False
+MARKET_STATE_PATH = "market_state.db"
+MARKET_HISTORY_BARS = 192        # Indicator frame length (192 x 15m = 48 hours)
+MARKET_SERVICE_INTERVAL = 10     # Seconds between forming-bar refreshes
+MARKET_STATE_MAX_AGE = 30        # Older published state is ignored by the dashboard
+MARKET_SERVICE_WAIT = 5          # Seconds the bot waits for a just-closed bar to be published
+
+# Trade Ledger (closed strategy trades and per-symbol cursors, kept across restarts)
+TRADE_LEDGER_PATH = "trade_ledger.db"
+DASHBOARD_HISTORY_DAYS = 7       # Closed trades shown on the dashboard
 
+# Bot State Store (last evaluated candle, traded trend, open position and order journal per symbol)
+BOT_STATE_PATH = "bot_state.db"
+WARM_RESTART_MAX_AGE = 3600      # Saved state at most this old skips the startup download and report
 
 # System Settings
 DRY_RUN = True  # Set to False to actually place trades
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 import pandas as pd
 
 def check_signal():
-    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL)
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
     symbol = "ETHUSD"
     
     print(f"Fetching data for {symbol}...")
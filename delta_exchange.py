@@ -1,17 +1,167 @@
 import time
 import hmac
 import hashlib
+import random
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import urllib.parse
+import threading
 import pandas as pd
 from datetime import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from candle_store import CandleStore, RESOLUTION_SECONDS
+import clock
+import metrics
+
+# Max candles returned by a single /v2/history/candles request
+CANDLE_LIMIT = 2000
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most `rate` requests per second on average,
+    with bursts of up to `burst` requests. acquire() blocks until a token is free.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def round_to_tick(price, tick_size):
+    """
+    Rounds a price to the nearest multiple of tick_size (unchanged if tick_size is unknown).
+    """
+    if not tick_size:
+        return price
+    tick = Decimal(str(tick_size))
+    return float((Decimal(str(price)) / tick).quantize(Decimal(1)) * tick)
+
+def candles_to_frame(candles):
+    """
+    /v2/history/candles result (list of dicts, epoch-second times) -> DataFrame sorted by time.
+    """
+    # Convert to DataFrame
+    df = pd.DataFrame(candles)
+    # Ensure columns are float/int
+    df['close'] = df['close'].astype(float)
+    df['open'] = df['open'].astype(float)
+    df['high'] = df['high'].astype(float)
+    df['low'] = df['low'].astype(float)
+    df['volume'] = df['volume'].astype(float)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    # Sort by time ascending
+    df = df.sort_values('time').reset_index(drop=True)
+    return df
+
+class ProductRegistry:
+    """
+    In-memory index of the /v2/products catalogue by symbol and by id.
+    Loaded on first use and refreshed after `ttl` seconds, or on a lookup miss
+    (at most once every `miss_refresh_interval` seconds, so unknown symbols
+    cannot trigger a download per call). A failed refresh is also retried at most
+    once per `miss_refresh_interval`, serving the stale table meanwhile.
+    Each entry is the product dict from the exchange; tick_size and
+    contract_value are converted to float.
+    """
+    def __init__(self, exchange, ttl=3600, miss_refresh_interval=60):
+        self.exchange = exchange
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._by_symbol = {}
+        self._by_id = {}
+        self._loaded_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Downloads the catalogue and rebuilds the indexes. Returns False if the request failed.
+        """
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        # Called with self._lock held: concurrent lookups wait for the download in progress
+        self._attempted_at = time.time()
+        data = self.exchange._request("GET", "/v2/products", auth=False)
+        if not data or not data.get("success"):
+            return False
+
+        by_symbol, by_id = {}, {}
+        for product in data["result"]:
+            product = dict(product)
+            for key in ("tick_size", "contract_value"):
+                if product.get(key) is not None:
+                    product[key] = float(product[key])
+            by_symbol[product["symbol"]] = product
+            by_id[int(product["id"])] = product
+
+        self._by_symbol, self._by_id = by_symbol, by_id
+        self._loaded_at = time.time()
+        return True
+
+    def _lookup(self, index_name, key):
+        with self._lock:
+            now = time.time()
+            retry_due = self._attempted_at is None or now - self._attempted_at > self.miss_refresh_interval
+            if (self._loaded_at is None or now - self._loaded_at > self.ttl) and retry_due:
+                retry_due = False
+                self._load()
+
+            product = getattr(self, index_name).get(key)
+            if product is None and retry_due:
+                # Possibly a newly listed product
+                if self._load():
+                    product = getattr(self, index_name).get(key)
+        return product
+
+    def get(self, symbol):
+        return self._lookup("_by_symbol", symbol)
+
+    def get_by_id(self, product_id):
+        return self._lookup("_by_id", int(product_id))
 
 class DeltaExchange:
-    def __init__(self, api_key, api_secret, base_url="https://api.india.delta.exchange"):
+    def __init__(self, api_key, api_secret, base_url="https://api.india.delta.exchange", candle_cache=None, max_download_workers=4,
+                 timeout=(5, 15), max_retries=3, backoff_base=0.5, backoff_cap=10.0, rate_limit=None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = base_url
+        # (connect, read) seconds for every request
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        # Global token bucket shared by all threads using this client (requests per second, None = unlimited)
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+
+        # Keep-alive connection pool, sized for the parallel candle downloads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, max_download_workers))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Parallel requests used when a candle range spans several CANDLE_LIMIT windows
+        self.max_download_workers = max_download_workers
+        # Optional on-disk candle cache (path to a SQLite file); fetch_candles serves from it when set
+        self.candle_store = CandleStore(candle_cache) if candle_cache else None
+        # Contract metadata, downloaded once instead of on every lookup
+        self.products = ProductRegistry(self)
 
     def _generate_signature(self, method, path, payload, timestamp):
         """
@@ -31,8 +181,7 @@ class DeltaExchange:
         ).hexdigest()
         return signature
 
-    def _request(self, method, endpoint, payload=None, auth=True):
-        url = self.base_url + endpoint
+    def _headers(self, method, endpoint, payload, auth):
         headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json',
@@ -40,6 +189,7 @@ class DeltaExchange:
         }
         
         if auth:
+            # Signed per attempt, retries must not reuse an old timestamp
             timestamp = str(int(time.time()))
             signature = self._generate_signature(method, endpoint, payload, timestamp)
             headers.update({
@@ -47,46 +197,154 @@ class DeltaExchange:
                 'signature': signature,
                 'timestamp': timestamp
             })
+        return headers
 
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=payload)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=payload)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers, json=payload)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error: {e}")
-            if response.text:
-                print(f"Response Body: {response.text}")
-            return None
-        except Exception as e:
-            print(f"Request Error: {e}")
-            return None
+    def _retry_delay(self, attempt, response=None):
+        """
+        Seconds to wait before retry number `attempt` (0-based).
+        Honors the rate-limit headers of a 429 response (capped at backoff_cap, so a
+        huge value cannot stall a cycle past the next candle), otherwise uses
+        exponential backoff with full jitter.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(max(float(retry_after), 0.0), self.backoff_cap)
+                except ValueError:
+                    pass
+            # Delta reports the time until the rate-limit window resets in milliseconds
+            reset_ms = response.headers.get('X-RATE-LIMIT-RESET')
+            if reset_ms:
+                try:
+                    return min(max(float(reset_ms) / 1000.0, 0.0), self.backoff_cap)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
 
-    def get_product_id(self, symbol):
-        # NOTE: Cached id lookup would be better for performance, doing it simple for now
-        data = self._request("GET", "/v2/products", auth=False)
-        if data and data.get("success"):
-            for product in data["result"]:
-                if product["symbol"] == symbol:
-                    return product["id"]
+    def _request(self, method, endpoint, payload=None, auth=True):
+        """
+        Sends a request over the pooled session and returns the decoded JSON, or None on failure.
+        GETs are retried on connection errors, timeouts and 5xx responses; any method is
+        retried on 429 since a rate-limited request was rejected, not executed.
+        """
+        url = self.base_url + endpoint
+
+        for attempt in range(self.max_retries + 1):
+            headers = self._headers(method, endpoint, payload, auth)
+            can_retry = attempt < self.max_retries
+            response = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                with metrics.HTTP_SECONDS.time(method=method, endpoint=endpoint):
+                    if method == "GET":
+                        response = self.session.get(url, headers=headers, params=payload, timeout=self.timeout)
+                    elif method == "POST":
+                        response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+                    elif method == "DELETE":
+                        response = self.session.delete(url, headers=headers, json=payload, timeout=self.timeout)
+                    else:
+                        raise ValueError(f"Unsupported method: {method}")
+                if response.status_code >= 400:
+                    metrics.API_ERRORS.inc(method=method, endpoint=endpoint, reason=str(response.status_code))
+
+                if can_retry and (response.status_code == 429 or (method == "GET" and response.status_code >= 500)):
+                    delay = self._retry_delay(attempt, response if response.status_code == 429 else None)
+                    print(f"HTTP {response.status_code} on {endpoint}, retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.HTTPError as e:
+                print(f"HTTP Error: {e}")
+                if response.text:
+                    print(f"Response Body: {response.text}")
+                return None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason = "timeout" if isinstance(e, requests.exceptions.Timeout) else "connection"
+                metrics.API_ERRORS.inc(method=method, endpoint=endpoint, reason=reason)
+                if can_retry and method == "GET":
+                    delay = self._retry_delay(attempt)
+                    print(f"Request Error: {e}, retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                print(f"Request Error: {e}")
+                return None
+            except Exception as e:
+                metrics.API_ERRORS.inc(method=method, endpoint=endpoint, reason="error")
+                print(f"Request Error: {e}")
+                return None
         return None
 
+    def get_product_id(self, symbol):
+        product = self.products.get(symbol)
+        return product["id"] if product else None
+
+    def get_product(self, symbol):
+        """
+        Cached product metadata (id, tick_size, contract_value, ...) or None.
+        """
+        return self.products.get(symbol)
+
     def fetch_candles(self, symbol, timeframe="15m", start=None, end=None):
         """
         Fetches candles and returns a Pandas DataFrame.
+        Served from the local candle cache when one is configured (only missing ranges are downloaded).
         """
         if end is None:
-            end = int(time.time())
+            end = int(clock.now())
         if start is None:
             start = end - (24 * 60 * 60) # Default last 24h
-            
+
+        if self.candle_store is not None:
+            return self.candle_store.fetch(symbol, timeframe, start, end, self._download_candles)
+
+        df = self._download_candles(symbol, timeframe, start, end)
+        return df if df is not None else pd.DataFrame() # Empty DF if failed
+
+    def _download_candles(self, symbol, timeframe, start, end):
+        """
+        Downloads candles for [start, end] from /v2/history/candles.
+        Ranges longer than CANDLE_LIMIT bars are split into windows that are fetched
+        concurrently (at most max_download_workers at a time), so results are never truncated.
+        Returns one sorted, de-duplicated DataFrame (empty if the exchange has no candles)
+        or None if any request failed.
+        """
+        windows = self._candle_windows(timeframe, start, end)
+        if len(windows) == 1:
+            return self._download_candle_window(symbol, timeframe, start, end)
+
+        workers = max(1, min(self.max_download_workers, len(windows)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(lambda w: self._download_candle_window(symbol, timeframe, w[0], w[1]), windows))
+
+        if any(f is None for f in frames):
+            return None
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        # Adjacent windows can both return the boundary bar
+        df = df.drop_duplicates('time', keep='last').sort_values('time').reset_index(drop=True)
+        return df
+
+    @staticmethod
+    def _candle_windows(timeframe, start, end):
+        """
+        Splits [start, end] into consecutive windows of at most CANDLE_LIMIT bars.
+        """
+        bar_seconds = RESOLUTION_SECONDS.get(timeframe)
+        if bar_seconds is None:
+            return [(start, end)]
+        span = bar_seconds * CANDLE_LIMIT
+        return [(w_start, min(w_start + span - 1, end)) for w_start in range(start, end + 1, span)]
+
+    def _download_candle_window(self, symbol, timeframe, start, end):
+        """
+        Single /v2/history/candles request. Returns a DataFrame or None on failure.
+        """
         params = {
             "resolution": timeframe,
             "symbol": symbol,
@@ -95,21 +353,12 @@ class DeltaExchange:
         }
         
         data = self._request("GET", "/v2/history/candles", params, auth=False)
-        if data and data.get("success") and data.get("result"):
-            candles = data["result"]
-            # Convert to DataFrame
-            df = pd.DataFrame(candles)
-            # Ensure columns are float/int
-            df['close'] = df['close'].astype(float)
-            df['open'] = df['open'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
-            df['volume'] = df['volume'].astype(float)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            # Sort by time ascending
-            df = df.sort_values('time').reset_index(drop=True)
-            return df
-        return pd.DataFrame() # Empty DF if failed
+        if not data or not data.get("success"):
+            return None
+        if not data.get("result"):
+            return pd.DataFrame()
+
+        return candles_to_frame(data["result"])
 
     def place_order(self, product_id, size, side, order_type="limit_order", limit_price=None, stop_price=None, trail_amount=None):
         payload = {
@@ -120,11 +369,15 @@ class DeltaExchange:
             "time_in_force": "gtc"
         }
         
+        # Prices must be multiples of the contract tick size
+        product = self.products.get_by_id(product_id) if (limit_price or stop_price) else None
+        tick_size = product.get("tick_size") if product else None
+
         if limit_price:
-            payload["limit_price"] = str(limit_price)
+            payload["limit_price"] = str(round_to_tick(limit_price, tick_size))
         
         if stop_price:
-             payload["stop_price"] = str(stop_price)
+             payload["stop_price"] = str(round_to_tick(stop_price, tick_size))
              
         if trail_amount:
             payload["trail_amount"] = str(trail_amount)
@@ -0,0 +1,475 @@
+import argparse
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import pandas as pd
+import requests
+
+import config
+from candle_store import RESOLUTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Captured at import: injected latency is real wall time even when a replay virtualizes time.sleep
+_sleep = time.sleep
+
+def load_recording(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def record(exchange, symbols, timeframe, start, end, path=None):
+    """
+    Records /v2/products, candles for [start, end] and (with API keys) the current
+    /v2/positions and open /v2/orders into a JSON file ExchangeSimulator can replay.
+    Returns the recording.
+    """
+    products = exchange._request("GET", "/v2/products", auth=False)
+    recording = {
+        "products": products["result"] if products and products.get("success") else [],
+        "candles": {},
+        "positions": [],
+        "orders": []
+    }
+    for symbol in symbols:
+        df = exchange.fetch_candles(symbol, timeframe=timeframe, start=start, end=end)
+        if df is None or df.empty:
+            logger.warning(f"{symbol}: no candles recorded")
+            continue
+        times = (df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        rows = zip(times.tolist(), df['open'].tolist(), df['high'].tolist(), df['low'].tolist(),
+                   df['close'].tolist(), df['volume'].tolist())
+        recording["candles"][symbol] = {
+            timeframe: [{"time": t, "open": o, "high": h, "low": l, "close": c, "volume": v} for t, o, h, l, c, v in rows]
+        }
+    if exchange.api_key:
+        for key, endpoint in (("positions", "/v2/positions"), ("orders", "/v2/orders")):
+            data = exchange._request("GET", endpoint, auth=True)
+            if data and data.get("success"):
+                recording[key] = data["result"]
+
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(recording, f)
+    return recording
+
+class ExchangeSimulator:
+    """
+    Local stand-in for the Delta REST API, replaying a recording (see record()).
+
+    Recorded candle times are shifted so the bar at `start` (default: the last recorded
+    bar) is the one forming at clock() when the simulator is created; from then on the
+    replay advances with clock(). Only bars that have opened are served; the forming bar
+    shows just its open, so the bot never sees the future.
+
+    Orders fill against the replayed prices: market orders (and limit orders without a
+    limit price) at the last price, limit/stop orders once a later bar trades through
+    their price. Positions and realized PnL are tracked per product.
+    latency (+ random jitter) seconds are added to every response and error_rate of the
+    requests fail with error_status. With api_secret set, signatures are verified.
+    """
+    def __init__(self, recording, clock=time.time, start=None, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, error_status=503, api_secret=None, seed=None):
+        self.clock = clock
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_secret = api_secret
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.products = [dict(p) for p in recording.get("products", [])]
+        self._products_by_id = {int(p["id"]): p for p in self.products}
+        self._products_by_symbol = {p["symbol"]: p for p in self.products}
+        self.candles = {
+            symbol: {res: sorted(candles, key=lambda c: c["time"]) for res, candles in by_res.items()}
+            for symbol, by_res in recording.get("candles", {}).items()
+        }
+        self._times = {
+            (symbol, res): [c["time"] for c in candles]
+            for symbol, by_res in self.candles.items() for res, candles in by_res.items()
+        }
+
+        # Align the replay so `start` is the bar forming now
+        all_bars = [(c["time"], RESOLUTION_SECONDS.get(res, 60))
+                    for by_res in self.candles.values() for res, candles in by_res.items() for c in candles]
+        align = max((b for _, b in all_bars), default=60)
+        if start is None:
+            start = max((t for t, _ in all_bars), default=0)
+        self.offset = (int(clock()) // align) * align - start
+
+        self.positions = {}
+        for pos in recording.get("positions", []):
+            self.positions[int(pos["product_id"])] = {
+                "size": int(pos["size"]), "entry_price": float(pos["entry_price"]), "realized_pnl": 0.0
+            }
+        self.orders = [dict(o) for o in recording.get("orders", [])]
+        self._next_order_id = max((int(o["id"]) for o in self.orders), default=0) + 1
+        self.fills = []
+        self.request_count = 0
+
+    # --- market data ------------------------------------------------------
+
+    def now(self):
+        return int(self.clock())
+
+    def _visible_candles(self, symbol, resolution, start=None, end=None):
+        """
+        Replayed candles (shifted times) that have opened by now; the forming one as open only.
+        """
+        candles = self.candles.get(symbol, {}).get(resolution, [])
+        times = self._times.get((symbol, resolution), [])
+        bar_seconds = RESOLUTION_SECONDS.get(resolution, 60)
+        now = self.now()
+        last = now if end is None else min(end, now)
+        lo = 0 if start is None else bisect.bisect_left(times, start - self.offset)
+        hi = bisect.bisect_right(times, last - self.offset)
+
+        visible = [dict(c, time=c["time"] + self.offset) for c in candles[lo:hi]]
+        if visible and visible[-1]["time"] + bar_seconds > now:
+            o = visible[-1]["open"]
+            visible[-1].update(high=o, low=o, close=o, volume=0)
+        return visible
+
+    def _series(self, symbol):
+        by_res = self.candles.get(symbol, {})
+        if not by_res:
+            return None
+        return min(by_res, key=lambda res: RESOLUTION_SECONDS.get(res, 60))
+
+    def last_price(self, symbol):
+        resolution = self._series(symbol)
+        if resolution is None:
+            return None
+        bars = self._visible_candles(symbol, resolution, start=self.now() - 10 * RESOLUTION_SECONDS.get(resolution, 60))
+        return float(bars[-1]["close"]) if bars else None
+
+    # --- orders and positions ---------------------------------------------
+
+    def _fill(self, order, price):
+        product_id = int(order["product_id"])
+        contract_value = float(self._products_by_id.get(product_id, {}).get("contract_value") or 1)
+        signed = int(order["size"]) * (1 if order["side"] == "buy" else -1)
+
+        pos = self.positions.setdefault(product_id, {"size": 0, "entry_price": 0.0, "realized_pnl": 0.0})
+        size, entry = pos["size"], pos["entry_price"]
+        if size == 0 or (size > 0) == (signed > 0):
+            # Opening or adding: volume weighted entry
+            pos["entry_price"] = (entry * abs(size) + price * abs(signed)) / (abs(size) + abs(signed))
+        else:
+            closed = min(abs(size), abs(signed))
+            pos["realized_pnl"] += (price - entry) * closed * contract_value * (1 if size > 0 else -1)
+            if abs(signed) > abs(size):
+                pos["entry_price"] = price # Reversed through zero
+        pos["size"] = size + signed
+        if pos["size"] == 0:
+            pos["entry_price"] = 0.0
+
+        order.update(state="closed", unfilled_size=0, average_fill_price=str(price), updated_at=self.now())
+        self.fills.append({
+            "time": self.now(), "order_id": order["id"], "product_id": product_id, "side": order["side"],
+            "size": int(order["size"]), "price": price, "position": pos["size"]
+        })
+
+    def _match_orders(self):
+        """
+        Fills open limit/stop orders whose price was traded through by a bar closed after they were placed.
+        """
+        for order in self.orders:
+            if order["state"] != "open":
+                continue
+            symbol = self._products_by_id.get(int(order["product_id"]), {}).get("symbol")
+            resolution = self._series(symbol)
+            if resolution is None:
+                continue
+            for bar in self._visible_candles(symbol, resolution, start=order["created_at"]):
+                if bar["time"] + RESOLUTION_SECONDS.get(resolution, 60) > self.now():
+                    break # forming bar: range unknown yet
+                buy = order["side"] == "buy"
+                if order.get("stop_price"):
+                    stop = float(order["stop_price"])
+                    if (buy and bar["high"] >= stop) or (not buy and bar["low"] <= stop):
+                        self._fill(order, stop)
+                        break
+                elif order.get("limit_price"):
+                    limit = float(order["limit_price"])
+                    if (buy and bar["low"] <= limit) or (not buy and bar["high"] >= limit):
+                        self._fill(order, limit)
+                        break
+
+    def place_order(self, body):
+        product = self._products_by_id.get(int(body.get("product_id", 0)))
+        if product is None or body.get("side") not in ("buy", "sell") or int(body.get("size", 0)) <= 0:
+            return 400, {"success": False, "error": {"code": "bad_schema"}}
+
+        order = {
+            "id": self._next_order_id,
+            "product_id": int(product["id"]),
+            "product_symbol": product["symbol"],
+            "size": int(body["size"]),
+            "unfilled_size": int(body["size"]),
+            "side": body["side"],
+            "order_type": body.get("order_type", "limit_order"),
+            "limit_price": body.get("limit_price"),
+            "stop_price": body.get("stop_price"),
+            "state": "open",
+            "average_fill_price": None,
+            "created_at": self.now()
+        }
+        self._next_order_id += 1
+        self.orders.append(order)
+
+        # An order without a price can only fill at market
+        if order["order_type"] == "market_order" or not (order["limit_price"] or order["stop_price"]):
+            price = self.last_price(product["symbol"])
+            if price is None:
+                order["state"] = "cancelled"
+                return 400, {"success": False, "error": {"code": "no_market_price"}}
+            self._fill(order, price)
+        return 200, {"success": True, "result": order}
+
+    def cancel_orders(self, body):
+        cancelled = []
+        for order in self.orders:
+            if order["state"] != "open":
+                continue
+            if "id" in body and int(body["id"]) != order["id"]:
+                continue
+            if "product_id" in body and int(body["product_id"]) != order["product_id"]:
+                continue
+            order["state"] = "cancelled"
+            cancelled.append(order)
+        return 200, {"success": True, "result": cancelled}
+
+    def positions_result(self):
+        result = []
+        for product_id, pos in self.positions.items():
+            if pos["size"] == 0:
+                continue
+            product = self._products_by_id.get(product_id, {})
+            result.append({
+                "product_id": product_id,
+                "product_symbol": product.get("symbol"),
+                "size": pos["size"],
+                "entry_price": str(pos["entry_price"]),
+                "realized_pnl": str(round(pos["realized_pnl"], 8))
+            })
+        return result
+
+    # --- request dispatch -------------------------------------------------
+
+    def _check_signature(self, method, path_with_query, body_text, headers):
+        timestamp = headers.get("timestamp", "")
+        expected = hmac.new(self.api_secret.encode('utf-8'), (method + timestamp + path_with_query + body_text).encode('utf-8'),
+                            hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, headers.get("signature", ""))
+
+    def handle(self, method, url, headers, body_text=""):
+        """
+        Serves one request. Returns (status, json body, extra headers).
+        """
+        delay = self.latency + (self._rng.random() * self.latency_jitter if self.latency_jitter else 0.0)
+        if delay > 0:
+            _sleep(delay)
+
+        parsed = urlparse(url)
+        path = parsed.path
+        params = dict(parse_qsl(parsed.query))
+        body = json.loads(body_text) if body_text else {}
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        with self._lock:
+            self.request_count += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                extra = {"Retry-After": "0"} if self.error_status == 429 else {}
+                return self.error_status, {"success": False, "error": {"code": "simulated_error"}}, extra
+
+            public = path in ("/v2/products", "/v2/history/candles") or path.startswith("/v2/products/")
+            if not public and self.api_secret is not None:
+                path_with_query = path + ("?" + parsed.query if parsed.query else "")
+                if not self._check_signature(method, path_with_query, body_text, headers):
+                    return 401, {"success": False, "error": {"code": "Signature Mismatch"}}, {}
+
+            self._match_orders()
+
+            if method == "GET" and path == "/v2/products":
+                return 200, {"success": True, "result": self.products}, {}
+            if method == "GET" and path.startswith("/v2/products/"):
+                product = self._products_by_symbol.get(path.rsplit("/", 1)[1])
+                if product is None:
+                    return 404, {"success": False, "error": {"code": "not_found"}}, {}
+                return 200, {"success": True, "result": product}, {}
+            if method == "GET" and path == "/v2/history/candles":
+                start = int(params["start"]) if "start" in params else None
+                end = int(params["end"]) if "end" in params else None
+                candles = self._visible_candles(params.get("symbol"), params.get("resolution"), start, end)
+                # Newest first, like the exchange
+                return 200, {"success": True, "result": candles[::-1]}, {}
+            if method == "GET" and path == "/v2/positions":
+                return 200, {"success": True, "result": self.positions_result()}, {}
+            if method == "GET" and path == "/v2/orders":
+                open_orders = [o for o in self.orders if o["state"] == "open"
+                               and ("product_id" not in params or o["product_id"] == int(params["product_id"]))]
+                return 200, {"success": True, "result": open_orders}, {}
+            if method == "POST" and path == "/v2/orders":
+                status, result = self.place_order(body)
+                return status, result, {}
+            if method == "DELETE" and path in ("/v2/orders", "/v2/orders/all"):
+                status, result = self.cancel_orders(body)
+                return status, result, {}
+        return 404, {"success": False, "error": {"code": "not_found"}}, {}
+
+    # --- transports -------------------------------------------------------
+
+    def serve(self, host="127.0.0.1", port=0):
+        """
+        Starts an HTTP server in a background thread and returns it. The base URL
+        for DeltaExchange is simulator.url.
+        """
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like the real API behind the pooled session
+            disable_nagle_algorithm = True # headers and body go out in separate writes
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body_text = self.rfile.read(length).decode() if length else ""
+                status, body, extra = simulator.handle(self.command, self.path, dict(self.headers), body_text)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in extra.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.server = server
+        self.url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        return server
+
+    def adapter(self):
+        """
+        requests transport adapter serving this simulator in-process (no sockets):
+        exchange.session.mount(exchange.base_url, simulator.adapter()).
+        """
+        return SimulatorAdapter(self)
+
+class SimulatorAdapter(requests.adapters.BaseAdapter):
+    def __init__(self, simulator):
+        super().__init__()
+        self.simulator = simulator
+
+    def send(self, request, **kwargs):
+        body = request.body.decode() if isinstance(request.body, bytes) else (request.body or "")
+        status, payload, extra = self.simulator.handle(request.method, request.path_url, dict(request.headers), body)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.headers.update(extra)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def measure_decision_latency(simulator, symbols, ticks):
+    """
+    Runs bot.process_symbol `ticks` times per symbol against the simulator over HTTP
+    (DRY_RUN off, so positions and orders go through it) and returns per-tick seconds.
+    """
+    import bot
+    from delta_exchange import DeltaExchange
+
+    exchange = DeltaExchange("sim-key", simulator.api_secret or "sim-secret", simulator.url, max_retries=1)
+    dry_run, telegram = config.DRY_RUN, config.TELEGRAM_ENABLED
+    config.DRY_RUN, config.TELEGRAM_ENABLED = False, False
+    latencies = []
+    try:
+        states = {sym: {} for sym in symbols}
+        for _ in range(ticks):
+            for symbol in symbols:
+                states[symbol].pop('last_bar', None) # a full tick, not the already-evaluated skip
+                started = time.perf_counter()
+                bot.process_symbol(exchange, symbol, states[symbol])
+                latencies.append(time.perf_counter() - started)
+    finally:
+        config.DRY_RUN, config.TELEGRAM_ENABLED = dry_run, telegram
+    return latencies
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Record Delta REST responses or replay them from a local simulator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record products and candles (and positions/orders with API keys)")
+    rec.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    rec.add_argument("--days", type=float, default=7)
+    rec.add_argument("--output", default="recording.json")
+
+    for name, help_text in (("serve", "Serve a recording over HTTP"), ("measure", "Time bot.process_symbol against a recording")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--recording", required=True)
+        p.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+        p.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+        p.add_argument("--error-rate", type=float, default=0.0)
+        p.add_argument("--error-status", type=int, default=503)
+        p.add_argument("--seed", type=int)
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    measure = sub.choices["measure"]
+    measure.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    measure.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from delta_exchange import DeltaExchange
+        exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+        end = int(time.time())
+        record(exchange, args.symbols, config.TIMEFRAME, end - int(args.days * 24 * 60 * 60), end, args.output)
+        logger.info(f"Recording written to {args.output}")
+        return
+
+    simulator = ExchangeSimulator(load_recording(args.recording), latency=args.latency, latency_jitter=args.jitter,
+                                  error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    if args.command == "serve":
+        simulator.serve(args.host, args.port)
+        logger.info(f"Simulated Delta API on {simulator.url} (set BASE_URL to it). Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            simulator.server.shutdown()
+        return
+
+    simulator.serve()
+    latencies = measure_decision_latency(simulator, args.symbols, args.ticks)
+    latencies_ms = sorted(l * 1000 for l in latencies)
+    p95 = latencies_ms[int(0.95 * (len(latencies_ms) - 1))]
+    print(f"process_symbol over {len(latencies_ms)} ticks ({simulator.request_count} requests): "
+          f"median {statistics.median(latencies_ms):.1f} ms | p95 {p95:.1f} ms | max {latencies_ms[-1]:.1f} ms")
+    simulator.server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,76 @@
 import pandas as pd
 import numpy as np
 import math
+from collections import deque
+
+try:
+    from numba import njit
+except ImportError: # numba is optional, the kernels run as plain Python without it
+    njit = None
+
+def _wma(values, window):
+    """
+    Weighted Moving Average over a float64 array with linear weights 1..window.
+    Vectorized equivalent of rolling(window).apply(np.dot(x, weights) / weights.sum()).
+    Windows containing NaN (warmup) yield NaN, same as the rolling version.
+    """
+    out = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return out
+
+    weights = np.arange(1, window + 1, dtype=float)
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    out[window - 1:] = windows @ weights / weights.sum()
+    return out
 
 def calculate_hma(series, period):
     """
     Calculates Hull Moving Average (HMA).
     Formula: HMA = WMA(2 * WMA(n/2) - WMA(n)), sqrt(n))
     """
-    wma_half = series.rolling(window=int(period / 2)).apply(lambda x: np.dot(x, np.arange(1, len(x) + 1)) / np.arange(1, len(x) + 1).sum(), raw=True)
-    wma_full = series.rolling(window=period).apply(lambda x: np.dot(x, np.arange(1, len(x) + 1)) / np.arange(1, len(x) + 1).sum(), raw=True)
+    values = series.to_numpy(dtype=float)
+    wma_half = _wma(values, int(period / 2))
+    wma_full = _wma(values, period)
     
     raw_hma = 2 * wma_half - wma_full
     sqrt_period = int(math.sqrt(period))
     
-    hma = raw_hma.rolling(window=sqrt_period).apply(lambda x: np.dot(x, np.arange(1, len(x) + 1)) / np.arange(1, len(x) + 1).sum(), raw=True)
-    return hma
+    hma = _wma(raw_hma, sqrt_period)
+    return pd.Series(hma, index=series.index, name=series.name)
 
-def calculate_supertrend(df, period=10, multiplier=3):
+def _supertrend_kernel(close, basic_upperband, basic_lowerband):
     """
-    Calculates Supertrend indicator.
-    Returns a DataFrame with 'Supertrend', 'SupertrendTrend' (1 for Bullish, -1 for Bearish).
+    Final band / trend recurrence of the Supertrend over plain float64 arrays.
+    Returns (supertrend, trend) arrays. JIT-compiled with numba when available.
     """
-    high = df['high']
-    low = df['low']
-    close = df['close']
-    
-    # Calculate ATR
-    tr1 = pd.DataFrame(high - low)
-    tr2 = pd.DataFrame(abs(high - close.shift(1)))
-    tr3 = pd.DataFrame(abs(low - close.shift(1)))
-    frames = [tr1, tr2, tr3]
-    tr = pd.concat(frames, axis=1, join='inner').max(axis=1)
-    atr = tr.ewm(alpha=1/period).mean()
-    
-    # Calculate Basic Upper and Lower Bands
-    hl2 = (high + low) / 2
-    basic_upperband = hl2 + (multiplier * atr)
-    basic_lowerband = hl2 - (multiplier * atr)
-    
-    # Initialize lists for Final Bands and Trend
-    final_upperband = [0.0] * len(df)
-    final_lowerband = [0.0] * len(df)
-    supertrend = [0.0] * len(df)
+    n = len(close)
+    final_upperband = np.zeros(n)
+    final_lowerband = np.zeros(n)
+    supertrend = np.zeros(n)
     # 1 for Bullish (Buy), -1 for Bearish (Sell)
-    trend = [1] * len(df) 
+    trend = np.ones(n, dtype=np.int64)
     
-    for i in range(1, len(df)):
+    for i in range(1, n):
         # Final Upper Band
-        if basic_upperband.iloc[i] < final_upperband[i-1] or close.iloc[i-1] > final_upperband[i-1]:
-            final_upperband[i] = basic_upperband.iloc[i]
+        if basic_upperband[i] < final_upperband[i-1] or close[i-1] > final_upperband[i-1]:
+            final_upperband[i] = basic_upperband[i]
         else:
             final_upperband[i] = final_upperband[i-1]
             
         # Final Lower Band
-        if basic_lowerband.iloc[i] > final_lowerband[i-1] or close.iloc[i-1] < final_lowerband[i-1]:
-            final_lowerband[i] = basic_lowerband.iloc[i]
+        if basic_lowerband[i] > final_lowerband[i-1] or close[i-1] < final_lowerband[i-1]:
+            final_lowerband[i] = basic_lowerband[i]
         else:
             final_lowerband[i] = final_lowerband[i-1]
             
         # Trend
         if trend[i-1] == 1: # Previous trend was Up
-            if close.iloc[i] <= final_lowerband[i]:
+            if close[i] <= final_lowerband[i]:
                 trend[i] = -1
             else:
                 trend[i] = 1
         else: # Previous trend was Down
-            if close.iloc[i] >= final_upperband[i]:
+            if close[i] >= final_upperband[i]:
                 trend[i] = 1
             else:
                 trend[i] = -1
@@ -76,6 +81,34 @@ def calculate_supertrend(df, period=10, multiplier=3):
         else:
             supertrend[i] = final_upperband[i]
             
+    return supertrend, trend
+
+if njit is not None:
+    _supertrend_kernel = njit(cache=True)(_supertrend_kernel)
+
+def calculate_supertrend(df, period=10, multiplier=3):
+    """
+    Calculates Supertrend indicator.
+    Returns a DataFrame with 'Supertrend', 'SupertrendTrend' (1 for Bullish, -1 for Bearish).
+    """
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+    
+    # Calculate ATR (first bar has no previous close, so its TR is high - low)
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = pd.Series(tr).ewm(alpha=1/period).mean().to_numpy()
+    
+    # Calculate Basic Upper and Lower Bands
+    hl2 = (high + low) / 2
+    basic_upperband = hl2 + (multiplier * atr)
+    basic_lowerband = hl2 - (multiplier * atr)
+    
+    supertrend, trend = _supertrend_kernel(close, basic_upperband, basic_lowerband)
+            
     df['Supertrend'] = supertrend
     df['SupertrendTrend'] = trend
     
@@ -95,3 +128,155 @@ def calculate_slope_degrees(series, scaling_factor=1.0):
     slopes = diff.apply(lambda x: math.degrees(math.atan(x * scaling_factor)))
     
     return slopes
+
+
+class IndicatorState:
+    """
+    Streaming Supertrend / HMA / HMA slope for a single symbol.
+    Each update() costs O(1): it keeps the ATR EMA, the final bands, the trend
+    and the WMA ring buffers instead of recomputing over the whole history.
+    Sending a candle with the same time as the latest one revises that (forming)
+    bar; older candles are ignored.
+    """
+    COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'Supertrend', 'SupertrendTrend', 'HMA', 'HMA_Slope']
+
+    def __init__(self, st_period=10, st_multiplier=3, hma_period=31, slope_scaling=1.0, history=100):
+        self.st_period = st_period
+        self.st_multiplier = st_multiplier
+        self.hma_period = hma_period
+        self.slope_scaling = slope_scaling
+
+        half = int(hma_period / 2)
+        sqrt_period = int(math.sqrt(hma_period))
+        self._weights_half = np.arange(1, half + 1, dtype=float)
+        self._weights_full = np.arange(1, hma_period + 1, dtype=float)
+        self._weights_sqrt = np.arange(1, sqrt_period + 1, dtype=float)
+
+        self.rows = deque(maxlen=history)
+        self.last_time = None
+        self._state = {
+            'prev_close': None,
+            'atr': np.nan,
+            'atr_weight': 1.0,
+            'final_upperband': 0.0,
+            'final_lowerband': 0.0,
+            'trend': 1,
+            'half': deque(maxlen=half),
+            'full': deque(maxlen=hma_period),
+            'raw': deque(maxlen=sqrt_period),
+            'prev_hma': np.nan,
+        }
+        self._committed = None # state before the latest bar, used to revise it
+
+    def _snapshot(self, state):
+        snap = dict(state)
+        for key in ('half', 'full', 'raw'):
+            snap[key] = deque(state[key], maxlen=state[key].maxlen)
+        return snap
+
+    @staticmethod
+    def _wma(buffer, weights):
+        if len(buffer) < len(weights):
+            return np.nan
+        return float(np.dot(np.fromiter(buffer, dtype=float, count=len(weights)), weights) / weights.sum())
+
+    def update(self, candle):
+        """
+        Applies one candle (dict or row with time/open/high/low/close/volume).
+        Returns the indicator row for that bar, or None if the candle is stale.
+        """
+        candle_time = candle['time']
+        if self.last_time is not None and candle_time < self.last_time:
+            return None
+
+        if self.last_time is not None and candle_time == self.last_time:
+            # Forming bar revised: roll back to the state before it
+            self._state = self._snapshot(self._committed)
+            self.rows.pop()
+        else:
+            self._committed = self._snapshot(self._state)
+
+        s = self._state
+        high = float(candle['high'])
+        low = float(candle['low'])
+        close = float(candle['close'])
+        prev_close = s['prev_close']
+
+        # ATR: same adjusted EWM recurrence as Series.ewm(alpha=1/period).mean()
+        if prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        if s['atr'] != s['atr']:
+            s['atr'] = tr
+        else:
+            s['atr_weight'] *= 1.0 - 1.0 / self.st_period
+            if s['atr'] != tr:
+                s['atr'] = (s['atr_weight'] * s['atr'] + tr) / (s['atr_weight'] + 1.0)
+            s['atr_weight'] += 1.0
+
+        # Supertrend (first bar keeps zero bands and a bullish trend, as in calculate_supertrend)
+        if prev_close is not None:
+            hl2 = (high + low) / 2
+            basic_upperband = hl2 + (self.st_multiplier * s['atr'])
+            basic_lowerband = hl2 - (self.st_multiplier * s['atr'])
+
+            if basic_upperband < s['final_upperband'] or prev_close > s['final_upperband']:
+                s['final_upperband'] = basic_upperband
+            if basic_lowerband > s['final_lowerband'] or prev_close < s['final_lowerband']:
+                s['final_lowerband'] = basic_lowerband
+
+            if s['trend'] == 1:
+                s['trend'] = -1 if close <= s['final_lowerband'] else 1
+            else:
+                s['trend'] = 1 if close >= s['final_upperband'] else -1
+            supertrend = s['final_lowerband'] if s['trend'] == 1 else s['final_upperband']
+        else:
+            supertrend = 0.0
+        s['prev_close'] = close
+
+        # HMA
+        s['half'].append(close)
+        s['full'].append(close)
+        raw_hma = 2 * self._wma(s['half'], self._weights_half) - self._wma(s['full'], self._weights_full)
+        if raw_hma == raw_hma:
+            s['raw'].append(raw_hma)
+        hma = self._wma(s['raw'], self._weights_sqrt)
+
+        # Slope (float64 division: a zero previous HMA gives inf/nan like the batch pct_change)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct_change = float(np.float64(hma) / s['prev_hma'] - 1)
+        slope = math.degrees(math.atan(pct_change * self.slope_scaling))
+        s['prev_hma'] = hma
+
+        row = {
+            'time': candle_time,
+            'open': float(candle['open']),
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': float(candle['volume']),
+            'Supertrend': supertrend,
+            'SupertrendTrend': s['trend'],
+            'HMA': hma,
+            'HMA_Slope': slope,
+        }
+        self.rows.append(row)
+        self.last_time = candle_time
+        return row
+
+    def update_frame(self, df):
+        """
+        Applies every candle of a fetch_candles() DataFrame in time order.
+        """
+        if df is None or df.empty:
+            return
+        for candle in df.to_dict('records'):
+            self.update(candle)
+
+    def to_frame(self):
+        """
+        Returns the retained history as a DataFrame with the same indicator
+        columns that calculate_supertrend / calculate_hma / calculate_slope_degrees produce.
+        """
+        return pd.DataFrame(list(self.rows), columns=self.COLUMNS)
@@ -0,0 +1,222 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+from websockets.sync.client import connect
+
+from candle_store import RESOLUTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# For Global users: wss://socket.delta.exchange
+DEFAULT_WS_URL = "wss://socket.india.delta.exchange"
+
+class MarketFeed:
+    """
+    Streaming market data from the Delta WebSocket (candlestick_<tf> and v2/ticker channels).
+    Builds the forming bar per symbol in memory and reports it as closed as soon as the
+    first update of the next bar arrives. After a reconnect, bars closed while the socket
+    was down are backfilled through exchange.fetch_candles.
+    Bars use the same layout as fetch_candles rows: time (naive UTC), open, high, low, close, volume.
+    """
+    def __init__(self, exchange, symbols, timeframe="15m", url=DEFAULT_WS_URL, on_bar_close=None,
+                 history=100, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.bar_seconds = RESOLUTION_SECONDS[timeframe]
+        self.url = url
+        self.on_bar_close = on_bar_close
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.forming = {}
+        self.closed = {sym: deque(maxlen=history) for sym in self.symbols}
+        self.prices = {}
+        self.connected = threading.Event()
+        self.closed_count = 0 # total bars closed, lets waiters detect new closes
+
+        self._lock = threading.Lock()
+        self._bar_closed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    # --- public API -------------------------------------------------------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def latest_price(self, symbol):
+        return self.prices.get(symbol)
+
+    def last_closed_bar(self, symbol):
+        with self._lock:
+            bars = self.closed.get(symbol)
+            return dict(bars[-1]) if bars else None
+
+    def wait_for_close(self, timeout, since=None):
+        """
+        Blocks until a bar closes after `since` (a closed_count value, default: now)
+        or `timeout` seconds pass. Returns True if a bar closed.
+        """
+        deadline = time.time() + timeout
+        with self._bar_closed:
+            if since is None:
+                since = self.closed_count
+            while self.closed_count <= since:
+                remaining = deadline - time.time()
+                if remaining <= 0 or self._stop.is_set():
+                    return False
+                self._bar_closed.wait(remaining)
+            return True
+
+    # --- bar building -----------------------------------------------------
+
+    def _close_bar(self, symbol, bar):
+        # Caller holds the lock; callbacks run after it is released
+        self.closed[symbol].append(bar)
+        self.closed_count += 1
+        self._bar_closed.notify_all()
+
+    def _apply_bar(self, symbol, bar):
+        """
+        Applies an update of (possibly) a new bar. Returns the bars it closed.
+        """
+        closed = []
+        with self._lock:
+            forming = self.forming.get(symbol)
+            if forming is not None and bar['time'] < forming['time']:
+                return closed # late update of an already closed bar
+            if forming is not None and bar['time'] > forming['time']:
+                last = self.closed[symbol][-1] if self.closed[symbol] else None
+                if last is None or forming['time'] > last['time']:
+                    self._close_bar(symbol, forming)
+                    closed.append(forming)
+            self.forming[symbol] = bar
+            self.prices[symbol] = bar['close']
+        return closed
+
+    def _handle_message(self, message):
+        msg_type = message.get("type", "")
+        symbol = message.get("symbol")
+        if symbol not in self.closed:
+            return []
+
+        if msg_type == f"candlestick_{self.timeframe}":
+            bar = {
+                'time': pd.Timestamp(int(message['candle_start_time']), unit='us'),
+                'open': float(message['open']),
+                'high': float(message['high']),
+                'low': float(message['low']),
+                'close': float(message['close']),
+                'volume': float(message.get('volume') or 0)
+            }
+            return [(symbol, b) for b in self._apply_bar(symbol, bar)]
+
+        if msg_type == "v2/ticker":
+            price = message.get("mark_price") or message.get("close")
+            if price is not None:
+                self.prices[symbol] = float(price)
+        return []
+
+    def _backfill(self):
+        """
+        Fetches bars that closed while disconnected through the REST path.
+        """
+        now = time.time()
+        emitted = []
+        for symbol in self.symbols:
+            with self._lock:
+                forming = self.forming.get(symbol)
+                last_closed = self.closed[symbol][-1] if self.closed[symbol] else None
+            if forming is not None:
+                start = int(forming['time'].timestamp())
+            elif last_closed is not None:
+                start = int(last_closed['time'].timestamp()) + self.bar_seconds
+            else:
+                continue # nothing seen yet, consumers seed their own history
+
+            df = self.exchange.fetch_candles(symbol, timeframe=self.timeframe, start=start, end=int(now))
+            if df is None or df.empty:
+                continue
+
+            with self._lock:
+                last_closed = self.closed[symbol][-1]['time'] if self.closed[symbol] else None
+                for candle in df[['time', 'open', 'high', 'low', 'close', 'volume']].to_dict('records'):
+                    if last_closed is not None and candle['time'] <= last_closed:
+                        continue
+                    if candle['time'].timestamp() + self.bar_seconds <= now:
+                        self._close_bar(symbol, candle)
+                        emitted.append((symbol, candle))
+                        last_closed = candle['time']
+                    else:
+                        self.forming[symbol] = candle
+                        self.prices[symbol] = candle['close']
+                forming = self.forming.get(symbol)
+                if forming is not None and last_closed is not None and forming['time'] <= last_closed:
+                    del self.forming[symbol]
+        return emitted
+
+    def _emit(self, bars):
+        if self.on_bar_close is None:
+            return
+        for symbol, bar in bars:
+            try:
+                self.on_bar_close(symbol, bar)
+            except Exception as e:
+                logger.error(f"Bar close handler failed for {symbol}: {e}")
+
+    # --- connection loop --------------------------------------------------
+
+    def _subscribe_message(self):
+        return json.dumps({
+            "type": "subscribe",
+            "payload": {
+                "channels": [
+                    {"name": f"candlestick_{self.timeframe}", "symbols": self.symbols},
+                    {"name": "v2/ticker", "symbols": self.symbols}
+                ]
+            }
+        })
+
+    def _run(self):
+        delay = self.reconnect_delay
+        first_connect = True
+        while not self._stop.is_set():
+            try:
+                with connect(self.url, open_timeout=10) as ws:
+                    self._ws = ws
+                    ws.send(self._subscribe_message())
+                    self.connected.set()
+                    delay = self.reconnect_delay
+                    if not first_connect:
+                        self._emit(self._backfill())
+                    first_connect = False
+                    logger.info(f"Market feed connected: {self.url}")
+
+                    for raw in ws:
+                        self._emit(self._handle_message(json.loads(raw)))
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Market feed disconnected: {e}")
+            finally:
+                self._ws = None
+                self.connected.clear()
+
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_reconnect_delay)
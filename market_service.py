@@ -0,0 +1,186 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import clock
+import config
+import metrics
+from candle_store import RESOLUTION_SECONDS
+from delta_exchange import DeltaExchange
+from indicators import IndicatorState
+from trade_ledger import TradeLedger, closed_rows
+
+# Setup Logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BAR_SECONDS = RESOLUTION_SECONDS.get(config.TIMEFRAME, 60)
+
+def create_indicator_state(symbol):
+    """
+    Streaming indicator state for a symbol, configured from config.py.
+    """
+    sym_config = config.SYMBOL_CONFIG.get(symbol, {})
+    return IndicatorState(
+        st_period=config.SUPERTREND_PERIOD,
+        st_multiplier=config.SUPERTREND_MULTIPLIER,
+        hma_period=config.HMA_PERIOD,
+        slope_scaling=sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING),
+        history=config.MARKET_HISTORY_BARS
+    )
+
+def compute_frame(exchange, symbol, state):
+    """
+    Updates state['indicators'] with new candles and returns the indicator frame.
+    The first call seeds it from MARKET_HISTORY_BARS of history, later calls only
+    fetch candles from the last known bar onwards (which also revises the forming bar).
+    Returns None if no candles were received.
+    """
+    indicator_state = state.get('indicators')
+    end_time = int(clock.now())
+    if indicator_state is not None and indicator_state.last_time is not None:
+        start_time = int(indicator_state.last_time.timestamp())
+    else:
+        start_time = end_time - config.MARKET_HISTORY_BARS * BAR_SECONDS
+
+    with metrics.STAGE_SECONDS.time(stage="candle_fetch", symbol=symbol):
+        df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=start_time, end=end_time)
+    if df is None or df.empty:
+        return None
+
+    with metrics.STAGE_SECONDS.time(stage="indicators", symbol=symbol):
+        if indicator_state is None:
+            indicator_state = create_indicator_state(symbol)
+            state['indicators'] = indicator_state
+        indicator_state.update_frame(df)
+        return indicator_state.to_frame()
+
+def _to_epoch(value):
+    return int(value.timestamp()) if isinstance(value, pd.Timestamp) else value
+
+def _from_epoch(value):
+    return pd.Timestamp(value, unit='s') if isinstance(value, int) else value
+
+class MarketStateStore:
+    """
+    Latest indicator frame and scanned trades per symbol, shared between processes
+    through a SQLite file in WAL mode (one writer, any number of readers).
+    """
+    def __init__(self, path="market_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS market_state (
+                symbol TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                last_bar INTEGER NOT NULL,
+                frame TEXT NOT NULL,
+                trades TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def publish(self, symbol, df, trades):
+        frame = {col: df[col].tolist() for col in df.columns}
+        frame['time'] = [_to_epoch(t) for t in df['time']]
+        trades = [{k: _to_epoch(v) for k, v in t.items()} for t in trades]
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO market_state (symbol, updated_at, last_bar, frame, trades) VALUES (?, ?, ?, ?, ?)",
+                (symbol, time.time(), frame['time'][-1], json.dumps(frame), json.dumps(trades))
+            )
+            self._conn.commit()
+
+    def read(self, symbol):
+        """
+        Returns {'frame', 'trades', 'updated_at', 'last_bar'} for a symbol, or None if never published.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, last_bar, frame, trades FROM market_state WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        updated_at, last_bar, frame, trades = row
+        df = pd.DataFrame(json.loads(frame))
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        trades = [
+            {k: (_from_epoch(v) if k in ('entry_time', 'exit_time') else v) for k, v in t.items()}
+            for t in json.loads(trades)
+        ]
+        return {'frame': df, 'trades': trades, 'updated_at': updated_at, 'last_bar': last_bar}
+
+    def read_fresh(self, symbol, max_age):
+        """
+        Latest published state if it is at most max_age seconds old, else None.
+        """
+        published = self.read(symbol)
+        if published is None or time.time() - published['updated_at'] > max_age:
+            return None
+        return published
+
+    def wait_for_bar(self, symbol, closed_bar_start, timeout, poll=0.2):
+        """
+        Waits until the producer has published the candle opening at closed_bar_start
+        after that candle closed. Returns the published state or None on timeout.
+        """
+        deadline = time.time() + timeout
+        while True:
+            published = self.read(symbol)
+            if (published is not None and published['last_bar'] >= closed_bar_start
+                    and published['updated_at'] >= closed_bar_start + BAR_SECONDS):
+                return published
+            if time.time() >= deadline:
+                return None
+            time.sleep(poll)
+
+def publish_symbol(exchange, store, symbol, state, ledger):
+    df = compute_frame(exchange, symbol, state)
+    if df is None:
+        logger.error(f"{symbol}: No candle data received")
+        return
+    now = clock.now()
+    ledger.update(symbol, df, closed=closed_rows(df, BAR_SECONDS, now))
+    since = pd.Timestamp(now - config.DASHBOARD_HISTORY_DAYS * 86400, unit='s')
+    store.publish(symbol, df, ledger.trades(symbol, df, since=since))
+
+def main():
+    """
+    Producer loop: computes indicators and trades once for all consumers (bot.py, server.py).
+    Publishes right after every candle close and refreshes the forming bar every
+    MARKET_SERVICE_INTERVAL seconds in between.
+    """
+    logger.info("Starting Market Service...")
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH,
+                             rate_limit=config.API_RATE_LIMIT)
+    store = MarketStateStore(config.MARKET_STATE_PATH)
+    ledger = TradeLedger(config.TRADE_LEDGER_PATH, book="dashboard")
+    symbols = list(config.QUANTITIES.keys())
+    states = {sym: {} for sym in symbols}
+    logger.info(f"Publishing Symbols: {symbols} -> {config.MARKET_STATE_PATH}")
+
+    while True:
+        try:
+            for symbol in symbols:
+                try:
+                    publish_symbol(exchange, store, symbol, states[symbol], ledger)
+                except Exception as e:
+                    logger.error(f"Error publishing {symbol}: {e}")
+
+            now = time.time()
+            until_close = BAR_SECONDS - (now % BAR_SECONDS) + config.BAR_CLOSE_DELAY
+            time.sleep(min(config.MARKET_SERVICE_INTERVAL, until_close))
+        except KeyboardInterrupt:
+            logger.info("Market service stopped by user.")
+            break
+
+if __name__ == "__main__":
+    main()
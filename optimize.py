@@ -0,0 +1,247 @@
+import argparse
+import csv
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import config
+from backtest import WARMUP_MINUTES, parse_ist_date, summarize
+from delta_exchange import DeltaExchange
+import indicators
+import strategy_utils
+
+# Setup Logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# Parameters computed into indicators (swept per task) and strategy-only parameters (swept inside a task)
+INDICATOR_PARAMS = ["st_period", "st_multiplier", "hma_period", "slope_scaling"]
+STRATEGY_PARAMS = ["slope_threshold", "take_profit"]
+CANDLE_ARRAYS = ["time", "high", "low", "close"]
+
+# Per-worker state: memory-mapped candles and indicator caches keyed by their parameters
+_candles = {}
+_supertrend_cache = {}
+_hma_cache = {}
+_slope_cache = {}
+
+def save_candles(data_dir, symbol, df, start_idx):
+    """
+    Writes a symbol's candle columns as .npy files that workers memory-map.
+    """
+    for col in CANDLE_ARRAYS:
+        values = (df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1) if col == 'time' else df[col]
+        np.save(os.path.join(data_dir, f"{symbol}_{col}.npy"), values.to_numpy(dtype=np.int64 if col == 'time' else np.float64))
+    np.save(os.path.join(data_dir, f"{symbol}_start.npy"), np.array([start_idx]))
+
+def _init_worker(data_dir, symbols):
+    for symbol in symbols:
+        arrays = {col: np.load(os.path.join(data_dir, f"{symbol}_{col}.npy"), mmap_mode='r') for col in CANDLE_ARRAYS}
+        arrays['start'] = int(np.load(os.path.join(data_dir, f"{symbol}_start.npy"))[0])
+        _candles[symbol] = arrays
+
+def _supertrend(symbol, period, multiplier):
+    key = (symbol, period, multiplier)
+    if key not in _supertrend_cache:
+        c = _candles[symbol]
+        df = pd.DataFrame({'high': np.asarray(c['high']), 'low': np.asarray(c['low']), 'close': np.asarray(c['close'])})
+        _supertrend_cache[key] = indicators.calculate_supertrend(df, period=period, multiplier=multiplier)['SupertrendTrend'].to_numpy()
+    return _supertrend_cache[key]
+
+def _slope(symbol, hma_period, scaling):
+    key = (symbol, hma_period, scaling)
+    if key not in _slope_cache:
+        hma_key = (symbol, hma_period)
+        if hma_key not in _hma_cache:
+            _hma_cache[hma_key] = indicators.calculate_hma(pd.Series(np.asarray(_candles[symbol]['close'])), period=hma_period)
+        _slope_cache[key] = indicators.calculate_slope_degrees(_hma_cache[hma_key], scaling_factor=scaling).to_numpy()
+    return _slope_cache[key]
+
+def _indicator_frame(symbol, ind):
+    c = _candles[symbol]
+    return pd.DataFrame({
+        'time': pd.to_datetime(np.asarray(c['time']), unit='s'),
+        'close': np.asarray(c['close']),
+        'SupertrendTrend': _supertrend(symbol, ind['st_period'], ind['st_multiplier']),
+        'HMA_Slope': _slope(symbol, ind['hma_period'], ind['slope_scaling'])
+    })
+
+def run_task(task, window=None):
+    """
+    Backtests one symbol/indicator combination for every (slope_threshold, take_profit) pair.
+    window (start, end) limits trading to bars start..end-1 (default: the whole loaded period).
+    Returns a list of result rows.
+    """
+    symbol, ind, strategy_grid = task
+    df = _indicator_frame(symbol, ind)
+    # Indicators are causal, so computing them once over the full history and slicing is exact
+    start, end = window if window is not None else (_candles[symbol]['start'], len(df))
+    df = df.iloc[:end]
+
+    rows = []
+    for slope_threshold, take_profit in strategy_grid:
+        trades = strategy_utils.run_strategy(df, symbol, take_profit=take_profit, slope_threshold=slope_threshold, start=start)
+        row = {"symbol": symbol, **ind, "slope_threshold": slope_threshold, "take_profit": take_profit}
+        row.update(summarize(trades))
+        rows.append(row)
+    return rows
+
+def run_params(symbol, params, window):
+    """
+    Trades of a single parameter set (a result row) over window (start, end).
+    """
+    ind = {p: params[p] for p in INDICATOR_PARAMS}
+    df = _indicator_frame(symbol, ind).iloc[:window[1]]
+    return strategy_utils.run_strategy(df, symbol, take_profit=params['take_profit'],
+                                       slope_threshold=params['slope_threshold'], start=window[0])
+
+def symbol_grid(symbol, grid):
+    """
+    The grid for one symbol. slope_scaling, slope_threshold and take_profit set to None
+    (the command line defaults) stand for the symbol's SYMBOL_CONFIG value, so the
+    default row is the strategy that runs live; "slope_scale" sweeps multiples of the
+    configured slope_scaling instead of absolute values.
+    """
+    grid = dict(grid)
+    scales = grid.pop("slope_scale", None)
+    if grid.get("slope_scaling") is None:
+        scaling = config.SYMBOL_CONFIG.get(symbol, {}).get("slope_scaling", config.DEFAULT_SLOPE_SCALING)
+        grid["slope_scaling"] = [scaling * scale for scale in (scales or [1.0])]
+    params = strategy_utils.strategy_params(symbol)
+    for name in STRATEGY_PARAMS:
+        if grid.get(name) is None:
+            grid[name] = [params[name]]
+    return grid
+
+def build_tasks(symbols, grid, samples=None, seed=0):
+    """
+    Splits the parameter grid into tasks, one per symbol and indicator combination.
+    With `samples`, a random subset of that many combinations per symbol is used instead.
+    Tasks sharing a Supertrend are adjacent so they tend to land on the same worker.
+    """
+    tasks = []
+    for symbol in symbols:
+        sym_grid = symbol_grid(symbol, grid)
+        combos = list(itertools.product(*(sym_grid[p] for p in INDICATOR_PARAMS + STRATEGY_PARAMS)))
+        if samples is not None and samples < len(combos):
+            combos = random.Random(seed).sample(combos, samples)
+
+        by_indicator = {}
+        for combo in combos:
+            by_indicator.setdefault(combo[:len(INDICATOR_PARAMS)], []).append(combo[len(INDICATOR_PARAMS):])
+        for ind_values in sorted(by_indicator):
+            tasks.append((symbol, dict(zip(INDICATOR_PARAMS, ind_values)), by_indicator[ind_values]))
+    return tasks
+
+def run_sweep(candles, grid, samples=None, seed=0, workers=None):
+    """
+    candles: {symbol: (indicator-free candle DataFrame, index of the first candle to trade)}.
+    Returns all result rows sorted by total PnL (best first).
+    """
+    symbols = list(candles)
+    tasks = build_tasks(symbols, grid, samples, seed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for symbol, (df, start_idx) in candles.items():
+            save_candles(data_dir, symbol, df, start_idx)
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir, symbols)) as pool:
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            for task_rows in pool.map(run_task, tasks, chunksize=chunksize):
+                rows.extend(task_rows)
+
+    rows.sort(key=lambda r: r['total_pnl'], reverse=True)
+    return rows
+
+def load_candles(exchange, symbols, start_utc, end_utc):
+    fetch_start_utc = start_utc - timedelta(minutes=WARMUP_MINUTES)
+    start_ts = int(fetch_start_utc.replace(tzinfo=timezone.utc).timestamp())
+    end_ts = int(end_utc.replace(tzinfo=timezone.utc).timestamp())
+
+    candles = {}
+    for symbol in symbols:
+        df = exchange.fetch_candles(symbol, timeframe=config.TIMEFRAME, start=start_ts, end=end_ts)
+        if df is None or df.empty:
+            logger.error(f"{symbol}: Failed to fetch data.")
+            continue
+        in_period = df['time'] >= start_utc
+        candles[symbol] = (df, int(in_period.idxmax()) if in_period.any() else len(df))
+        logger.info(f"{symbol}: {len(df)} candles")
+    return candles
+
+def print_ranking(rows, top):
+    columns = INDICATOR_PARAMS + STRATEGY_PARAMS
+    for symbol in dict.fromkeys(r['symbol'] for r in rows):
+        print(f"\nTop {top} for {symbol}")
+        print(" ".join(f"{c:>15}" for c in columns) + f" {'PNL':>10} {'TRADES':>7} {'WIN %':>7} {'MAX DD':>10}")
+        for r in [r for r in rows if r['symbol'] == symbol][:top]:
+            print(" ".join(f"{r[c]:>15}" for c in columns) +
+                  f" {r['total_pnl']:>10.2f} {r['trades']:>7} {r['win_rate']:>7.1f} {r['max_drawdown']:>10.2f}")
+
+def add_grid_arguments(parser):
+    parser.add_argument("--st-period", nargs="+", type=int, default=[config.SUPERTREND_PERIOD])
+    parser.add_argument("--st-multiplier", nargs="+", type=float, default=[config.SUPERTREND_MULTIPLIER])
+    parser.add_argument("--hma-period", nargs="+", type=int, default=[config.HMA_PERIOD])
+    scaling = parser.add_mutually_exclusive_group()
+    scaling.add_argument("--slope-scaling", nargs="+", type=float,
+                         help="Absolute slope scaling factors for every symbol (default: each symbol's SYMBOL_CONFIG value)")
+    scaling.add_argument("--slope-scale", nargs="+", type=float,
+                         help="Multiples of each symbol's configured slope scaling, e.g. 0.5 1 2")
+    parser.add_argument("--threshold", nargs="+", type=float, help="Default: each symbol's configured threshold")
+    parser.add_argument("--take-profit", nargs="+", type=float, help="Default: each symbol's configured take profit")
+
+def grid_from_args(args):
+    return {
+        "st_period": args.st_period,
+        "st_multiplier": args.st_multiplier,
+        "hma_period": args.hma_period,
+        "slope_scaling": args.slope_scaling,
+        "slope_scale": args.slope_scale,
+        "slope_threshold": args.threshold,
+        "take_profit": args.take_profit
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid / random search over strategy settings.")
+    parser.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    parser.add_argument("--start", required=True, help="First day (IST), dd/mm/yyyy")
+    parser.add_argument("--end", help="Last day (IST), dd/mm/yyyy (default: --start)")
+    add_grid_arguments(parser)
+    parser.add_argument("--samples", type=int, help="Random search: number of combinations to try")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = grid_from_args(args)
+    start_utc = parse_ist_date(args.start)
+    end_utc = parse_ist_date(args.end or args.start, end_of_day=True)
+
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+    candles = load_candles(exchange, args.symbols, start_utc, end_utc)
+    if not candles:
+        return
+
+    started = time.perf_counter()
+    rows = run_sweep(candles, grid, args.samples, args.seed, args.workers)
+    logger.info(f"{len(rows)} backtests in {time.perf_counter() - started:.1f}s")
+
+    print_ranking(rows, args.top)
+    if rows:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        logger.info(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
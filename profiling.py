@@ -0,0 +1,120 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# Innermost frames of threads that are parked, not working (idle pool workers, HTTP servers)
+IDLE_LEAVES = {("thread.py", "_worker"), ("selectors.py", "select"), ("socketserver.py", "serve_forever"),
+               ("threading.py", "wait")}
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler: every `interval` seconds records the Python stack of
+    every busy thread. collapsed() returns "root;caller;callee count" lines, the input
+    format of flamegraph.pl and speedscope.
+    """
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, "thread"))
+            self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        return [f"{stack} {count}" for stack, count in sorted(self.counts.items())]
+
+    def top_self(self, limit=15):
+        """
+        (frame, samples) with the most samples as the innermost frame.
+        """
+        leaves = Counter()
+        for stack, count in self.counts.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", type=int, metavar="N",
+                        help="Profile N iterations of the main work (after one warm-up) instead of running normally")
+    parser.add_argument("--profiler", choices=("sample", "cprofile"), default="sample",
+                        help="sample: collapsed stacks of all threads for flamegraph.pl/speedscope; "
+                             "cprofile: deterministic .prof of the calling thread")
+    parser.add_argument("--profile-output", help="Profile file (default: profile_<program>.folded / .prof)")
+    parser.add_argument("--profile-interval", type=float, default=0.001, help="Sampling interval in seconds")
+
+def options_from_args(args):
+    return {"mode": args.profiler, "output": args.profile_output, "interval": args.profile_interval}
+
+def run_profiled(work, iterations, name, mode="sample", output=None, interval=0.001, warmup=1):
+    """
+    Calls work(i) `warmup` times unprofiled (numba compilation, caches), then `iterations`
+    times under the chosen profiler, writes the profile and prints a short summary.
+    Returns the output path.
+    """
+    for i in range(warmup):
+        work(i)
+
+    if mode == "cprofile":
+        output = output or f"profile_{name}.prof"
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        for i in range(iterations):
+            work(i)
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        profiler.dump_stats(output)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        output = output or f"profile_{name}.folded"
+        sampler = StackSampler(interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            for i in range(iterations):
+                work(i)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+        with open(output, "w", encoding="utf-8") as f:
+            f.write("\n".join(sampler.collapsed()) + "\n")
+        total = sum(sampler.counts.values()) or 1
+        print(f"{'SELF %':>7}  FRAME ({sampler.samples} samples)")
+        for frame, count in sampler.top_self():
+            print(f"{count / total * 100:>6.1f}%  {frame}")
+
+    print(f"{iterations} iterations in {elapsed:.2f}s ({elapsed / max(iterations, 1) * 1000:.1f} ms each), profile written to {output}")
+    return output
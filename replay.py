@@ -0,0 +1,206 @@
+import argparse
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timezone
+
+import pandas as pd
+
+import bot
+import clock
+import config
+from backtest import parse_ist_date, summarize
+from candle_store import RESOLUTION_SECONDS
+from delta_exchange import DeltaExchange
+from exchange_simulator import ExchangeSimulator, load_recording, record
+import indicators
+import strategy_utils
+
+# Setup Logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+BAR_SECONDS = RESOLUTION_SECONDS.get(config.TIMEFRAME, 60)
+
+@contextmanager
+def replay_config(symbols):
+    """
+    Temporarily configures the bot for a replay: real order flow (against the simulator),
+    no Telegram, WebSocket feed, market service, candle cache, rate limit or metrics server,
+    and an in-memory state store.
+    """
+    overrides = {
+        "DRY_RUN": False,
+        "TELEGRAM_ENABLED": False,
+        "USE_WS_FEED": False,
+        "USE_MARKET_SERVICE": False,
+        "CANDLE_CACHE_PATH": None,
+        "API_RATE_LIMIT": None,
+        "METRICS_PORT": None,
+        "BOT_STATE_PATH": None,
+        "QUANTITIES": {sym: config.QUANTITIES.get(sym, config.DEFAULT_QUANTITY) for sym in symbols}
+    }
+    saved = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+        bot.state_store = None
+
+def trades_from_fills(simulator, mark_prices=None):
+    """
+    Round trips from the simulator's fills, in the trade dict format of run_strategy.
+    entry_time/exit_time are the candles the bot acted on (the one closed before the fill);
+    a position still open is marked at mark_prices[symbol] when given.
+    """
+    symbols = {int(p["id"]): p["symbol"] for p in simulator.products}
+    trades = []
+    open_trades = {}
+    for fill in simulator.fills:
+        product_id = fill["product_id"]
+        symbol = symbols.get(product_id)
+        signal_bar = pd.Timestamp((fill["time"] // BAR_SECONDS) * BAR_SECONDS - BAR_SECONDS, unit='s')
+        qty = config.QUANTITIES.get(symbol, config.DEFAULT_QUANTITY)
+
+        trade = open_trades.pop(product_id, None)
+        if trade is not None:
+            side = 1 if trade["type"] == "LONG" else -1
+            trade.update(exit_price=fill["price"], exit_time=signal_bar, status="CLOSED",
+                         pnl=round((fill["price"] - trade["entry_price"]) * side * qty, 2))
+            trades.append(trade)
+        if fill["position"] != 0:
+            open_trades[product_id] = {
+                "symbol": symbol, "type": "LONG" if fill["position"] > 0 else "SHORT",
+                "entry_price": fill["price"], "exit_price": None, "entry_time": signal_bar,
+                "exit_time": "-", "pnl": 0.0, "status": "OPEN"
+            }
+    for trade in open_trades.values():
+        mark = (mark_prices or {}).get(trade["symbol"])
+        if mark is not None:
+            side = 1 if trade["type"] == "LONG" else -1
+            qty = config.QUANTITIES.get(trade["symbol"], config.DEFAULT_QUANTITY)
+            trade["pnl"] = round((mark - trade["entry_price"]) * side * qty, 2)
+        trades.append(trade)
+    return trades
+
+def backtest_trades(recording, symbol, first_bar, end):
+    """
+    run_strategy over the same recorded candles, trading from the first candle the bot evaluates.
+    """
+    candles = recording["candles"][symbol][config.TIMEFRAME]
+    df = pd.DataFrame([c for c in candles if c["time"] <= end])
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    # Only closed candles, as the bot sees them
+    df = df[df['time'] + pd.Timedelta(seconds=BAR_SECONDS) <= pd.Timestamp(end, unit='s')].reset_index(drop=True)
+
+    sym_config = config.SYMBOL_CONFIG.get(symbol, {})
+    df = indicators.calculate_supertrend(df, period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
+    df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
+    df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING))
+    start_idx = int((df['time'] >= pd.Timestamp(first_bar, unit='s')).idxmax())
+    return strategy_utils.run_strategy(df, symbol, start=start_idx)
+
+def compare(live, backtest):
+    """
+    Entries (candle, side) only one side took, per symbol.
+    """
+    live_entries = {(t["entry_time"], t["type"]) for t in live}
+    backtest_entries = {(t["entry_time"], t["type"]) for t in backtest}
+    return {
+        "live_only": sorted(live_entries - backtest_entries),
+        "backtest_only": sorted(backtest_entries - live_entries)
+    }
+
+def run_replay(recording, symbols, start, end, verbose=False):
+    """
+    Runs bot.main over [start, end] (epoch seconds) on a virtual clock against the
+    recording. Returns the bot's trades, the backtest's trades and their differences.
+    """
+    start_bar = (start // BAR_SECONDS) * BAR_SECONDS
+    virtual_clock = clock.VirtualClock(start_bar + config.BAR_CLOSE_DELAY, end=end)
+    simulator = ExchangeSimulator(recording, clock=virtual_clock.time, start=start_bar)
+
+    exchange = DeltaExchange("replay", "replay", "http://replay", max_retries=0)
+    exchange.session.mount("http://replay", simulator.adapter())
+
+    bot_level = bot.logger.level
+    if not verbose:
+        bot.logger.setLevel(logging.WARNING)
+    previous_clock = clock.set_clock(virtual_clock)
+    try:
+        with replay_config(symbols):
+            try:
+                bot.main(exchange)
+            except clock.ReplayFinished:
+                pass
+            # Mark open positions at the last close, as run_strategy does
+            last_closes = {}
+            for symbol in symbols:
+                closed = [c for c in recording["candles"].get(symbol, {}).get(config.TIMEFRAME, []) if c["time"] + BAR_SECONDS <= end]
+                if closed:
+                    last_closes[symbol] = closed[-1]["close"]
+            live = trades_from_fills(simulator, last_closes)
+    finally:
+        clock.set_clock(previous_clock)
+        bot.logger.setLevel(bot_level)
+
+    results = {"symbols": {}}
+    for symbol in symbols:
+        live_trades = [t for t in live if t["symbol"] == symbol]
+        # The bot's first cycle evaluates the candle that closed at start_bar
+        backtest = backtest_trades(recording, symbol, start_bar - BAR_SECONDS, end)
+        results["symbols"][symbol] = {
+            "live": {"summary": summarize(live_trades), "trades": live_trades},
+            "backtest": {"summary": summarize(backtest), "trades": backtest},
+            "differences": compare(live_trades, backtest)
+        }
+    results["requests"] = simulator.request_count
+    return results
+
+def print_replay(results):
+    for symbol, res in results["symbols"].items():
+        live, backtest, diff = res["live"]["summary"], res["backtest"]["summary"], res["differences"]
+        print(f"{symbol:<8} bot: {live['trades']} trades, PnL {live['total_pnl']:.2f} | "
+              f"backtest: {backtest['trades']} trades, PnL {backtest['total_pnl']:.2f}")
+        for name in ("live_only", "backtest_only"):
+            for entry_time, side in diff[name]:
+                print(f"    {name.replace('_', ' '):<14} {side:<6} entry on candle {entry_time}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay bot.main over historical candles on a virtual clock.")
+    parser.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    parser.add_argument("--start", required=True, help="First day (IST), dd/mm/yyyy")
+    parser.add_argument("--end", help="Last day (IST), dd/mm/yyyy (default: --start)")
+    parser.add_argument("--recording", help="exchange_simulator.py recording (default: fetch through the candle cache)")
+    parser.add_argument("--output", default="replay_results.json")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's per-candle log")
+    args = parser.parse_args()
+
+    to_ts = lambda dt: int(dt.replace(tzinfo=timezone.utc).timestamp())
+    start = to_ts(parse_ist_date(args.start))
+    end = to_ts(parse_ist_date(args.end or args.start, end_of_day=True))
+
+    if args.recording:
+        recording = load_recording(args.recording)
+    else:
+        exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+        # Enough history before the start to seed the bot's indicators
+        history = (config.MARKET_HISTORY_BARS + 2) * BAR_SECONDS
+        recording = record(exchange, args.symbols, config.TIMEFRAME, start - history, end)
+        recording["positions"], recording["orders"] = [], [] # replay starts flat
+
+    started = time.perf_counter()
+    results = run_replay(recording, args.symbols, start, end, verbose=args.verbose)
+    logger.info(f"Replayed {(end - start) / 86400:.1f} days ({results['requests']} API calls) in {time.perf_counter() - started:.1f}s")
+
+    print_replay(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    logger.info(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
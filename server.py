@@ -1,157 +1,364 @@
-from flask import Flask, jsonify, render_template_string
+import argparse
+import bisect
+import heapq
+import json
+from collections import deque
+from flask import Flask, Response, render_template_string, request, stream_with_context
 from datetime import datetime, timedelta
-import pytz
+try:
+    import orjson
+except ImportError: # orjson is optional, the standard json module is used without it
+    orjson = None
 import config
 from delta_exchange import DeltaExchange
+from market_service import BAR_SECONDS, MarketStateStore
 import indicators
+import metrics
+import profiling
 import strategy_utils
+from trade_ledger import TradeLedger, closed_rows
+import numpy as np
 import pandas as pd
 import threading
 import time
-import pytz
 from datetime import datetime, timedelta
 
 app = Flask(__name__)
 
 # Initialize Exchange
-exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL)
+exchange = DeltaExchange(config.API_KEY, config.API_SECRET, base_url=config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+
+# Shared indicator state from market_service.py (None = compute everything here)
+market_store = MarketStateStore(config.MARKET_STATE_PATH) if config.USE_MARKET_SERVICE else None
+
+# Closed trades of the locally computed frames. Its own book: the market service writes
+# "dashboard" from its frames, which can differ from the fallback's (other window, refresh)
+ledger = TradeLedger(config.TRADE_LEDGER_PATH, book="dashboard-local")
 
 SYMBOLS = ["BTCUSD", "ETHUSD", "SOLUSD"]
-CACHE = {
-    "signals": {},
-    "history": [],
-    "last_update": None
-}
+
+SSE_KEEPALIVE = 15 # Seconds between keep-alive comments on idle event streams
+
+def encode_json(obj):
+    """
+    Compact JSON bytes; numpy scalars and timestamps are handled by orjson or str().
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+def trade_key(trade):
+    return f"{trade['symbol']}|{trade['entry_time']}|{trade['type']}"
+
+class DashboardFeed:
+    """
+    Versioned, immutable dashboard state for /api/data and /api/stream. publish() (the
+    monitor thread) diffs a refresh against the previous one and pre-encodes the full
+    snapshot and the update event once; requests only hand out those bytes. The last
+    `maxlen` updates are kept for delta queries, and streams block on a condition
+    until a newer version exists, so idle viewers cost no CPU.
+    """
+    def __init__(self, maxlen=64):
+        # Versions start at the start time in ms, so they keep increasing across restarts
+        self.version = int(time.time() * 1000)
+        self.signals = {}
+        self.trades = {}
+        self.events = deque(maxlen=maxlen) # (version, update dict, encoded update)
+        self._cond = threading.Condition()
+        self._snapshot = encode_json(self._full_state([], None))
+
+    def _full_state(self, history, last_update):
+        return {
+            "version": self.version,
+            "signals": self.signals,
+            "history": history,
+            "last_update": str(last_update) if last_update is not None else None
+        }
+
+    def publish(self, signals, history, last_update):
+        trades = {trade_key(t): t for t in history}
+        with self._cond:
+            version = self.version + 1
+            update = {
+                "version": version,
+                "signals": {sym: rec for sym, rec in signals.items() if self.signals.get(sym) != rec},
+                "trades": [t for key, t in trades.items() if self.trades.get(key) != t],
+                "removed": [key for key in self.trades if key not in trades],
+                "last_update": str(last_update)
+            }
+            self.version, self.signals, self.trades = version, dict(signals), trades
+            self._snapshot = encode_json(self._full_state(history, last_update))
+            self.events.append((version, update, encode_json(update)))
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """
+        (version, encoded full state).
+        """
+        with self._cond:
+            return self.version, self._snapshot
+
+    def changes_since(self, since):
+        """
+        (version, encoded changes after version `since`): the retained updates merged into
+        one, or the full snapshot if they no longer reach back that far.
+        """
+        with self._cond:
+            version, snapshot = self.version, self._snapshot
+            updates = [(v, update, data) for v, update, data in self.events if v > since]
+            reachable = since == version or (since <= version and self.events and self.events[0][0] <= since + 1)
+        if not reachable:
+            return version, snapshot
+        if len(updates) == 1:
+            return version, updates[0][2]
+
+        merged = {"version": version, "signals": {}, "trades": {}, "removed": set(), "last_update": None}
+        for _, update, _ in updates:
+            merged["signals"].update(update["signals"])
+            for key in update["removed"]:
+                merged["trades"].pop(key, None)
+                merged["removed"].add(key)
+            for trade in update["trades"]:
+                key = trade_key(trade)
+                merged["trades"][key] = trade
+                merged["removed"].discard(key)
+            merged["last_update"] = update["last_update"]
+        merged["trades"] = list(merged["trades"].values())
+        merged["removed"] = sorted(merged["removed"])
+        return version, encode_json(merged)
+
+    def wait(self, after, timeout):
+        """
+        Encoded update events newer than version `after` ([] on timeout), or None if
+        some were already dropped and the client needs a fresh snapshot.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > after, timeout)
+            if self.version <= after:
+                return []
+            if not self.events or self.events[0][0] > after + 1:
+                return None
+            return [(v, data) for v, _, data in self.events if v > after]
+
+    def stream(self, last_event_id=None):
+        """
+        Server-Sent Events: a snapshot (unless the client resumes at a retained version),
+        then one update event per publish and keep-alive comments in between.
+        """
+        last = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        if last is None or last > self.version or self.wait(last, 0) is None:
+            last, data = self.snapshot()
+            yield f"id: {last}\nevent: snapshot\ndata: {data.decode()}\n\n"
+        while True:
+            events = self.wait(last, SSE_KEEPALIVE)
+            if events is None:
+                last, data = self.snapshot()
+                yield f"id: {last}\nevent: snapshot\ndata: {data.decode()}\n\n"
+                continue
+            if not events:
+                yield ": keep-alive\n\n"
+            for last, data in events:
+                yield f"id: {last}\nevent: update\ndata: {data.decode()}\n\n"
+
+FEED = DashboardFeed()
+
+IST = 'Asia/Kolkata'
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+def _ist_strings(values):
+    """
+    Timestamps (naive = UTC) -> IST strings for a whole column at once; other values kept.
+    """
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    is_time = np.fromiter((isinstance(v, datetime) for v in values), dtype=bool, count=len(values))
+    if is_time.any():
+        times = pd.to_datetime(list(column[is_time]), utc=True)
+        column[is_time] = times.tz_convert(IST).strftime(TIME_FORMAT).to_numpy()
+    return column.tolist()
+
+def format_trades(trades):
+    """
+    Copies of the trade dicts with entry/exit times as IST strings.
+    """
+    if not trades:
+        return []
+    entries = _ist_strings([t['entry_time'] for t in trades])
+    exits = _ist_strings([t['exit_time'] for t in trades])
+    return [dict(t, entry_time=entry, exit_time=exit) for t, entry, exit in zip(trades, entries, exits)]
+
+class TradeLog:
+    """
+    Dashboard trade history, newest entry first. A trade closed on a candle that has
+    closed never changes, so it is formatted once and its record reused (kept in entry
+    order) on every refresh; open trades and trades closed on the forming candle (their
+    exit price and PnL are provisional) are formatted again.
+    """
+    def __init__(self):
+        self._closed = {} # (symbol, entry epoch, type) -> formatted record
+        self._order = []  # (-entry epoch, key) of the memoized closed trades
+
+    def update(self, trades, settled_before=None):
+        """
+        Formatted history of `trades`. Closed trades whose exit candle opened before
+        `settled_before` (the forming candle's open time; None = all) are memoized.
+        """
+        settled_before = pd.Timestamp(settled_before) if settled_before is not None else None
+        keyed = {(t['symbol'], pd.Timestamp(t['entry_time']).value // 10**9, t['type']): t for t in trades}
+
+        # Closed trades that slid out of the scanned window
+        stale = {key for key in self._closed if keyed.get(key, {}).get('status') != 'CLOSED'}
+        if stale:
+            for key in stale:
+                del self._closed[key]
+            self._order = [item for item in self._order if item[1] not in stale]
+
+        fresh = [(key, t) for key, t in keyed.items() if t['status'] != 'CLOSED' or key not in self._closed]
+        open_trades = []
+        for (key, t), record in zip(fresh, format_trades([t for _, t in fresh])):
+            if t['status'] == 'CLOSED' and (settled_before is None or pd.Timestamp(t['exit_time']) < settled_before):
+                self._closed[key] = record
+                bisect.insort(self._order, (-key[1], key))
+            else:
+                open_trades.append((-key[1], key, record))
+        open_trades.sort(key=lambda item: item[:2])
+
+        closed = ((neg_time, key, self._closed[key]) for neg_time, key in self._order)
+        return [record for _, _, record in heapq.merge(open_trades, closed, key=lambda item: item[:2])]
+
+TRADE_LOG = TradeLog()
+
 
 
+def load_symbol(symbol):
+    """
+    Returns (indicator frame, scanned trades) for a symbol. Uses the state published by
+    market_service.py when it is enabled and fresh, so the dashboard shows exactly
+    what the bot saw; otherwise downloads and computes it here.
+    """
+    if market_store is not None:
+        published = market_store.read_fresh(symbol, config.MARKET_STATE_MAX_AGE)
+        if published is not None:
+            return published['frame'], published['trades']
+        print(f"{symbol}: market service state is stale, computing locally", flush=True)
+
+    tf = config.TIMEFRAME
+    start_dt = datetime.now() - timedelta(days=2) 
+    end_dt = datetime.now()
+    
+    print(f"Fetching {symbol}...", flush=True)
+    df = exchange.fetch_candles(symbol, timeframe=tf, start=int(start_dt.timestamp()), end=int(end_dt.timestamp()))
+    
+    if df is None or df.empty:
+        return None, []
+    
+    # Indicators
+    sym_config = config.SYMBOL_CONFIG.get(symbol, {})
+    slope_scaling = sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING)
+
+    df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
+    df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=slope_scaling)
+    df = indicators.calculate_supertrend(df, period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
+    
+    # --- History: only candles closed since the last refresh are run through the strategy ---
+    now = time.time()
+    ledger.update(symbol, df, closed=closed_rows(df, BAR_SECONDS, now))
+    since = pd.Timestamp(now - config.DASHBOARD_HISTORY_DAYS * 86400, unit='s')
+    return df, ledger.trades(symbol, df, since=since)
+
+def update_cache():
+    """Downloads (or reads) every symbol's state and publishes it to FEED once"""
+    new_data = {}
+    all_trades = []
+    
+    for symbol in SYMBOLS:
+        try:
+            sym_config = config.SYMBOL_CONFIG.get(symbol, {})
+            slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
+
+            df, symbol_trades = load_symbol(symbol)
+            
+            if df is None or df.empty:
+                new_data[symbol] = {"error": "No Data"}
+                continue
+            
+            all_trades.extend(symbol_trades)
+            
+            # Calculate Accuracy (Win Rate)
+            closed_trades = [t for t in symbol_trades if t['status'] == 'CLOSED']
+            winning_trades = [t for t in closed_trades if t['pnl'] > 0]
+            total_closed = len(closed_trades)
+            accuracy = (len(winning_trades) / total_closed * 100) if total_closed > 0 else 0
+            # -----------------------
+
+            # Latest State
+            last_row = df.iloc[-1]
+            price = last_row['close']
+            trend = last_row['SupertrendTrend']
+            slope = last_row['HMA_Slope']
+            supertrend_val = last_row['Supertrend']
+            
+            # Trend Age (Latest): 999 if the trend started before the frame
+            trend_start = strategy_utils.trend_start_indices(df['SupertrendTrend'].to_numpy())[-1]
+            trend_age = int(len(df) - 1 - trend_start) if trend_start > 0 else 999
+            
+            # Signal
+            signal_text = "HOLD"
+            signal_color = "gray"
+            
+            if trend == 1:
+                status = "BULLISH"
+                if slope >= slope_threshold and trend_age <= 1:
+                     signal_text = "ENTRY LONG"
+                     signal_color = "green"
+                elif slope >= slope_threshold:
+                     signal_text = "HOLD LONG"
+                     signal_color = "green"
+                else:
+                     signal_text = "WEAK BULLISH"
+                     signal_color = "yellow"
+            else:
+                status = "BEARISH"
+                if slope <= -slope_threshold and trend_age <= 1:
+                     signal_text = "ENTRY SHORT"
+                     signal_color = "red"
+                elif slope <= -slope_threshold:
+                     signal_text = "HOLD SHORT"
+                     signal_color = "red"
+                else:
+                     signal_text = "WEAK BEARISH"
+                     signal_color = "yellow"
+
+            new_data[symbol] = {
+                "price": price,
+                "trend": status,
+                "slope": round(float(slope), 2),
+                "slope_threshold": slope_threshold,
+                "supertrend": round(float(supertrend_val), 2),
+                "signal": signal_text,
+                "signal_color": signal_color,
+                "trend_age": trend_age,
+                "accuracy": round(accuracy, 1),
+                "total_trades": total_closed
+            }
+
+        except Exception as e:
+            print(f"Error processing {symbol}: {e}", flush=True)
+            new_data[symbol] = {"error": str(e)}
+    
+    # Newest first, times as IST strings; exits on the forming candle are not final yet
+    forming = pd.Timestamp((int(time.time()) // BAR_SECONDS) * BAR_SECONDS, unit='s')
+    history = TRADE_LOG.update(all_trades, settled_before=forming)
+
+    if new_data:
+        FEED.publish(new_data, history, datetime.now())
 
 def monitor_market():
     """Background task to update market data periodically"""
     while True:
-        new_data = {}
-        all_trades = []
-        
-        for symbol in SYMBOLS:
-            try:
-                tf = config.TIMEFRAME
-                start_dt = datetime.now() - timedelta(days=2) 
-                end_dt = datetime.now()
-                
-                print(f"Fetching {symbol}...", flush=True)
-                df = exchange.fetch_candles(symbol, timeframe=tf, start=int(start_dt.timestamp()), end=int(end_dt.timestamp()))
-                
-                if df is None or df.empty:
-                    new_data[symbol] = {"error": "No Data"}
-                    continue
-                
-                # Indicators
-                sym_config = config.SYMBOL_CONFIG.get(symbol, {})
-                slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
-                slope_scaling = sym_config.get("slope_scaling", config.DEFAULT_SLOPE_SCALING)
-
-                df['HMA'] = indicators.calculate_hma(df['close'], period=config.HMA_PERIOD)
-                df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=slope_scaling)
-                df = indicators.calculate_supertrend(df, period=config.SUPERTREND_PERIOD, multiplier=config.SUPERTREND_MULTIPLIER)
-                
-                # --- History Scanner ---
-                symbol_trades = strategy_utils.scan_trades_for_df(df, symbol)
-                all_trades.extend(symbol_trades)
-                
-                # Calculate Accuracy (Win Rate)
-                closed_trades = [t for t in symbol_trades if t['status'] == 'CLOSED']
-                winning_trades = [t for t in closed_trades if t['pnl'] > 0]
-                total_closed = len(closed_trades)
-                accuracy = (len(winning_trades) / total_closed * 100) if total_closed > 0 else 0
-                # -----------------------
-
-                # Latest State
-                last_row = df.iloc[-1]
-                price = last_row['close']
-                trend = last_row['SupertrendTrend']
-                slope = last_row['HMA_Slope']
-                supertrend_val = last_row['Supertrend']
-                
-                # Trend Age (Latest)
-                trend_age = 0
-                for i in range(len(df)-1, 0, -1):
-                    if df.iloc[i]['SupertrendTrend'] != df.iloc[i-1]['SupertrendTrend']:
-                        trend_age = len(df) - 1 - i
-                        break
-                    if i == 1: trend_age = 999 
-                
-                # Signal
-                signal_text = "HOLD"
-                signal_color = "gray"
-                
-                if trend == 1:
-                    status = "BULLISH"
-                    if slope >= slope_threshold and trend_age <= 1:
-                         signal_text = "ENTRY LONG"
-                         signal_color = "green"
-                    elif slope >= slope_threshold:
-                         signal_text = "HOLD LONG"
-                         signal_color = "green"
-                    else:
-                         signal_text = "WEAK BULLISH"
-                         signal_color = "yellow"
-                else:
-                    status = "BEARISH"
-                    if slope <= -slope_threshold and trend_age <= 1:
-                         signal_text = "ENTRY SHORT"
-                         signal_color = "red"
-                    elif slope <= -slope_threshold:
-                         signal_text = "HOLD SHORT"
-                         signal_color = "red"
-                    else:
-                         signal_text = "WEAK BEARISH"
-                         signal_color = "yellow"
-
-                new_data[symbol] = {
-                    "price": price,
-                    "trend": status,
-                    "slope": round(float(slope), 2),
-                    "slope_threshold": slope_threshold,
-                    "supertrend": round(float(supertrend_val), 2),
-                    "signal": signal_text,
-                    "signal_color": signal_color,
-                    "trend_age": trend_age,
-                    "accuracy": round(accuracy, 1),
-                    "total_trades": total_closed,
-                    "timestamp": datetime.now().strftime("%H:%M:%S")
-                }
-
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}", flush=True)
-                new_data[symbol] = {"error": str(e)}
-        
-        # Sort trades by time (descending)
-        all_trades.sort(key=lambda x: x['entry_time'], reverse=True)
-        
-        # Convert Timestamps to strings for JSON (in IST)
-        ist = pytz.timezone('Asia/Kolkata')
-        for t in all_trades:
-            if isinstance(t['entry_time'], pd.Timestamp):
-                # Assuming original is UTC or naive (Delta API usually returns UTC)
-                if t['entry_time'].tz is None:
-                    t['entry_time'] = t['entry_time'].tz_localize('UTC')
-                t['entry_time'] = t['entry_time'].astimezone(ist).strftime("%Y-%m-%d %H:%M")
-            
-            if isinstance(t['exit_time'], pd.Timestamp):
-                if t['exit_time'].tz is None:
-                    t['exit_time'] = t['exit_time'].tz_localize('UTC')
-                t['exit_time'] = t['exit_time'].astimezone(ist).strftime("%Y-%m-%d %H:%M")
-
-        if new_data:
-            CACHE["signals"] = new_data
-            CACHE["history"] = all_trades
-            CACHE["last_update"] = datetime.now()
-        
+        update_cache()
         time.sleep(10)
 
-# Start Background Thread
-t = threading.Thread(target=monitor_market)
-t.daemon = True
-t.start()
 
 @app.route('/')
 def dashboard():
@@ -160,8 +367,61 @@ def dashboard():
 
 @app.route('/api/data')
 def get_data():
-    return jsonify(CACHE)
+    """
+    Pre-encoded snapshot, or with ?since=<version> only what changed after that version.
+    Answers 304 when the client's ETag is still current.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        version, body = FEED.snapshot()
+        etag = str(version)
+    else:
+        version, body = FEED.changes_since(since)
+        etag = f"{since}-{version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/stream')
+def stream_data():
+    response = Response(stream_with_context(FEED.stream(request.headers.get('Last-Event-ID'))),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # let nginx pass events through unbuffered
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def profile_dashboard(iterations, **options):
+    """
+    Profiles cache refreshes followed by an /api/data request (indicators, trade scan,
+    formatting and JSON encoding) in the calling thread.
+    """
+    client = app.test_client()
+
+    def work(i):
+        update_cache()
+        client.get('/api/data')
+
+    profiling.run_profiled(work, iterations, "server", **options)
 
 if __name__ == '__main__':
-    print("Starting Dashboard Server on http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    parser = argparse.ArgumentParser(description="Live dashboard server.")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profile_dashboard(args.profile, **profiling.options_from_args(args))
+    else:
+        # Start Background Thread
+        t = threading.Thread(target=monitor_market)
+        t.daemon = True
+        t.start()
+
+        print("Starting Dashboard Server on http://localhost:5000")
+        app.run(host='0.0.0.0', port=5000, debug=False)
@@ -16,6 +16,6 @@ sudo timedatectl set-timezone Asia/Kolkata
 echo "Installing Python dependencies..."
 # Using --break-system-packages because we are in a VM dedicated to this bot
 # Alternatively, we could use a venv, but this is simpler for a single-purpose VM.
-pip3 install flask pandas numpy requests pytz --break-system-packages
+pip3 install flask pandas numpy requests pytz websockets --break-system-packages
 
 echo "Setup complete! You can now run your bot."
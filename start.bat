@@ -1,4 +1,11 @@
 @echo off
+rem The market service only runs when config.USE_MARKET_SERVICE is on (bot and dashboard read it then)
+python -c "import config, sys; sys.exit(0 if config.USE_MARKET_SERVICE else 1)"
+if not errorlevel 1 (
+    echo Starting Market Service...
+    start "Robin Market Service" python market_service.py
+)
+
 echo Starting Dashboard Server...
 start "Robin Dashboard" python server.py
 
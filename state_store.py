@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import threading
+
+import clock
+
+class BotStateStore:
+    """
+    Durable per-symbol bot state (product id, last traded trend, last evaluated candle,
+    open position) and an order journal, in a SQLite file in WAL mode. Every write is
+    committed before it returns, so a killed process loses at most the candle it was
+    evaluating.
+    """
+    def __init__(self, path="bot_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Every transaction is a single small row: fsync the WAL on each commit
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS bot_state (
+                symbol TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                product_id INTEGER,
+                last_traded_trend INTEGER,
+                last_bar INTEGER,
+                position TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                symbol TEXT NOT NULL,
+                bar INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                side TEXT NOT NULL,
+                size REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (symbol, bar, action)
+            )
+        """)
+        self._conn.commit()
+
+    def save(self, symbol, state):
+        """
+        Persists the durable keys of a symbol's state dict (the indicator state is rebuilt
+        from the candle cache).
+        """
+        position = state.get('position')
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO bot_state (symbol, updated_at, product_id, last_traded_trend, last_bar, position) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, clock.now(), state.get('product_id'), state.get('last_traded_trend'), state.get('last_bar'),
+                 json.dumps(position) if position else None)
+            )
+            self._conn.commit()
+
+    def load(self):
+        """
+        {symbol: state dict with 'updated_at'} for every saved symbol.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT symbol, updated_at, product_id, last_traded_trend, last_bar, position FROM bot_state"
+            ).fetchall()
+        return {
+            symbol: {
+                'updated_at': updated_at,
+                'product_id': product_id,
+                'last_traded_trend': last_traded_trend,
+                'last_bar': last_bar,
+                'position': json.loads(position) if position else None
+            }
+            for symbol, updated_at, product_id, last_traded_trend, last_bar, position in rows
+        }
+
+    def claim_order(self, symbol, bar, action, side, size):
+        """
+        Journals an order ('entry' or 'exit') for the candle opening at `bar` before it is
+        sent. Returns False if that action was already journaled for the candle (by a run
+        that crashed or restarted after claiming it), then it must not be sent again.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO orders (symbol, bar, action, side, size, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, bar, action, side, size, clock.now())
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def orders(self, symbol):
+        """
+        Journaled orders of a symbol as (bar, action, side, size), oldest first.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT bar, action, side, size FROM orders WHERE symbol = ? ORDER BY bar, created_at", (symbol,)
+            ).fetchall()
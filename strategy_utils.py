@@ -1,99 +1,178 @@
+import numpy as np
 import config
 
-def scan_trades_for_df(df, symbol):
+# Strategy core shared by the live bot (bot.process_symbol), the dashboard / DRY_RUN
+# scanner (scan_trades_for_df) and the backtester (backtest.py):
+#   Entry: Supertrend trend with HMA slope beyond +/- threshold, on the 1st or 2nd
+#          candle of the trend (age <= 1), and not a re-entry into the trend last traded.
+#   Exit:  take profit (points from entry, on candle close) or Supertrend reversal.
+# An exit and a new entry can happen on the same candle (stop and reverse).
+
+def strategy_params(symbol, take_profit=None, slope_threshold=None):
     """
-    Scans the dataframe for historical trades based on strategy logic.
-    Returns a list of trade dicts.
+    Per-symbol strategy settings from config.py, with optional overrides.
+    Returns dict(qty, slope_threshold, take_profit); take_profit None disables it.
     """
-    trades = []
-    in_position = 0 # 0, 1, -1
-    entry_price = 0.0
-    entry_time = None
-    
-    # Pre-calc Trend Age for entire DF
-    trend_starts = [0] * len(df)
-    current_start = 0
-    # Assuming df has 'SupertrendTrend' column
-    # Iterate from 1
-    for i in range(1, len(df)):
-        if df.iloc[i]['SupertrendTrend'] != df.iloc[i-1]['SupertrendTrend']:
-            current_start = i
-        trend_starts[i] = current_start
-        
-    # Determine Quantity
-    qty = config.QUANTITIES.get(symbol, config.DEFAULT_QUANTITY)
-    
     sym_config = config.SYMBOL_CONFIG.get(symbol, {})
-    slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
-
-    for i in range(1, len(df)):
-        row = df.iloc[i]
-        curr_price = row['close']
-        trend = row['SupertrendTrend']
-        slope = row['HMA_Slope']
-        time_str = row['time'] # timestamp object
-        
-        # Calculate Age
-        trend_age = i - trend_starts[i]
-        
+    if slope_threshold is None:
+        slope_threshold = sym_config.get("slope_threshold", config.HMA_SLOPE_THRESHOLD)
+    if take_profit is None:
+        take_profit = sym_config.get("take_profit", config.TAKE_PROFIT)
+    return {
+        "qty": config.QUANTITIES.get(symbol, config.DEFAULT_QUANTITY),
+        "slope_threshold": slope_threshold,
+        "take_profit": take_profit
+    }
+
+def entry_signal(trend, slope, trend_age, slope_threshold, last_traded_trend=0):
+    """
+    1 (BUY), -1 (SELL) or 0 (no entry) for a closed candle while flat.
+    """
+    if trend_age > 1:
+        return 0
+    if trend == 1 and slope >= slope_threshold and last_traded_trend != 1:
+        return 1
+    if trend == -1 and slope <= -slope_threshold and last_traded_trend != -1:
+        return -1
+    return 0
+
+def exit_signal(side, entry_price, price, trend, take_profit=None):
+    """
+    Exit reason for an open position (side 1 long, -1 short) at a candle close:
+    "TP", "REVERSAL" or None to hold.
+    """
+    if side == 1:
+        if take_profit and price >= entry_price + take_profit:
+            return "TP"
+        if trend == -1:
+            return "REVERSAL"
+    elif side == -1:
+        if take_profit and price <= entry_price - take_profit:
+            return "TP"
+        if trend == 1:
+            return "REVERSAL"
+    return None
+
+def trend_start_indices(trend):
+    """
+    For every bar, the index of the bar where its current Supertrend trend started.
+    Trend age of bar i is i - trend_start_indices(trend)[i].
+    """
+    starts = np.zeros(len(trend), dtype=np.int64)
+    if len(trend) > 1:
+        flips = np.flatnonzero(trend[1:] != trend[:-1]) + 1
+        starts[flips] = flips
+        np.maximum.accumulate(starts, out=starts)
+    return starts
+
+def flat_state():
+    """
+    Strategy state before the first bar: no position, no trend traded yet.
+    """
+    return {"position": 0, "entry_price": 0.0, "entry_time": None, "last_traded_trend": 0}
+
+def advance_strategy(df, symbol, state=None, take_profit=None, slope_threshold=None, start=1):
+    """
+    Runs the strategy over bars [start, len(df)) of an indicator frame (time, close,
+    SupertrendTrend, HMA_Slope), continuing from `state` (see flat_state, None = flat).
+    Earlier bars only provide the trend age. Returns (closed trade dicts, new state).
+    """
+    params = strategy_params(symbol, take_profit, slope_threshold)
+    qty = params["qty"]
+    slope_threshold = params["slope_threshold"]
+    take_profit = params["take_profit"]
+
+    state = dict(state or flat_state())
+    trades = []
+    in_position = state["position"] # 0, 1, -1
+    entry_price = state["entry_price"]
+    entry_time = state["entry_time"]
+    last_traded_trend = state["last_traded_trend"]
+
+    start = max(start, 1)
+    # Pre-calc Trend Age for entire DF: index of the bar where each trend started
+    trend_starts = trend_start_indices(df['SupertrendTrend'].to_numpy())[start:].tolist()
+
+    # Plain Python lists of the bars to run: the position state machine below touches every one
+    closes = df['close'].to_numpy()[start:].tolist()
+    trends = df['SupertrendTrend'].to_numpy()[start:].tolist()
+    slopes = df['HMA_Slope'].to_numpy()[start:].tolist()
+    times = df['time'].array # indexed only on entries/exits, yields timestamp objects
+
+    for j, curr_price in enumerate(closes):
+        i = start + j
+        trend = trends[j]
+
         # Check Exit first
-        if in_position == 1 and trend == -1:
-            # Exit Long
-            pnl = (curr_price - entry_price) * qty
-            trades.append({
-                "symbol": symbol,
-                "type": "LONG",
-                "entry_price": entry_price,
-                "exit_price": curr_price,
-                "entry_time": entry_time,
-                "exit_time": time_str,
-                "pnl": round(pnl, 2),
-                "status": "CLOSED"
-            })
-            in_position = 0
-            
-        elif in_position == -1 and trend == 1:
-            # Exit Short
-            pnl = (entry_price - curr_price) * qty
-            trades.append({
-                "symbol": symbol,
-                "type": "SHORT",
-                "entry_price": entry_price,
-                "exit_price": curr_price,
-                "entry_time": entry_time,
-                "exit_time": time_str,
-                "pnl": round(pnl, 2),
-                "status": "CLOSED"
-            })
-            in_position = 0
-            
+        if in_position != 0:
+            reason = exit_signal(in_position, entry_price, curr_price, trend, take_profit)
+            if reason:
+                pnl = ((curr_price - entry_price) if in_position == 1 else (entry_price - curr_price)) * qty
+                trades.append({
+                    "symbol": symbol,
+                    "type": "LONG" if in_position == 1 else "SHORT",
+                    "entry_price": entry_price,
+                    "exit_price": curr_price,
+                    "entry_time": entry_time,
+                    "exit_time": times[i],
+                    "pnl": round(pnl, 2),
+                    "status": "CLOSED",
+                    "exit_reason": reason
+                })
+                in_position = 0
+
         # Check Entry
         if in_position == 0:
-            # BUY
-            if trend == 1 and slope >= slope_threshold and trend_age <= 1:
-                in_position = 1
+            signal = entry_signal(trend, slopes[j], i - trend_starts[j], slope_threshold, last_traded_trend)
+            if signal:
+                in_position = signal
                 entry_price = curr_price
-                entry_time = time_str
-                
-            # SELL
-            elif trend == -1 and slope <= -slope_threshold and trend_age <= 1:
-                in_position = -1
-                entry_price = curr_price
-                entry_time = time_str
-    
+                entry_time = times[i]
+                last_traded_trend = signal
+
+    state.update(position=in_position, entry_price=entry_price, entry_time=entry_time,
+                 last_traded_trend=last_traded_trend)
+    return trades, state
+
+def open_trade(symbol, state, price, qty=None):
+    """
+    The OPEN trade dict for a state holding a position, marked at `price`; None when flat.
+    """
+    in_position = state["position"]
+    if in_position == 0:
+        return None
+    if qty is None:
+        qty = strategy_params(symbol)["qty"]
+    entry_price = state["entry_price"]
+    pnl = ((price - entry_price) if in_position == 1 else (entry_price - price)) * qty
+    return {
+        "symbol": symbol,
+        "type": "LONG" if in_position == 1 else "SHORT",
+        "entry_price": entry_price,
+        "exit_price": price,
+        "entry_time": state["entry_time"],
+        "exit_time": "-",
+        "pnl": round(pnl, 2),
+        "status": "OPEN",
+        "exit_reason": None
+    }
+
+def run_strategy(df, symbol, take_profit=None, slope_threshold=None, start=1):
+    """
+    Runs the strategy over an indicator frame (time, close, SupertrendTrend, HMA_Slope)
+    and returns a list of trade dicts. Trading starts flat at bar `start`; earlier bars
+    only warm up the trend age. A position still open at the last bar is reported as OPEN.
+    """
+    trades, state = advance_strategy(df, symbol, None, take_profit, slope_threshold, start)
+
     # If still in position, add Open Trade
-    if in_position != 0:
-        curr_price = df.iloc[-1]['close']
-        pnl = ((curr_price - entry_price) if in_position == 1 else (entry_price - curr_price)) * qty
-        trades.append({
-            "symbol": symbol,
-            "type": "LONG" if in_position == 1 else "SHORT",
-            "entry_price": entry_price,
-            "exit_price": curr_price,
-            "entry_time": entry_time,
-            "exit_time": "-",
-            "pnl": round(pnl, 2),
-            "status": "OPEN"
-        })
-        
+    if state["position"] != 0:
+        trades.append(open_trade(symbol, state, float(df['close'].iloc[-1])))
     return trades
+
+def scan_trades_for_df(df, symbol):
+    """
+    Scans the dataframe for historical trades based on strategy logic.
+    Returns a list of trade dicts.
+    """
+    return run_strategy(df, symbol)
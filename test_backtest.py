@@ -0,0 +1,49 @@
+import pandas as pd
+
+import backtest
+import config
+
+
+def _trade(symbol, entry, exit, pnl, entry_price=100.0):
+    return {"symbol": symbol, "type": "LONG", "entry_price": entry_price, "exit_price": entry_price + pnl,
+            "entry_time": pd.Timestamp(entry), "exit_time": pd.Timestamp(exit) if exit else "-", "pnl": pnl,
+            "status": "CLOSED" if exit else "OPEN", "exit_reason": "REVERSAL" if exit else None}
+
+
+def test_summarize_drawdown_and_win_rate():
+    trades = [_trade("ETHUSD", "2025-01-01 00:00", "2025-01-01 01:00", 50.0),
+              _trade("ETHUSD", "2025-01-01 02:00", "2025-01-01 03:00", -30.0),
+              _trade("ETHUSD", "2025-01-01 04:00", "2025-01-01 05:00", -40.0),
+              _trade("ETHUSD", "2025-01-01 06:00", None, 10.0)]
+    summary = backtest.summarize(trades)
+    assert summary["total_pnl"] == -10.0
+    assert summary["realized_pnl"] == -20.0
+    assert summary["max_drawdown"] == 70.0
+    assert summary["win_rate"] == round(100 / 3, 2)
+
+
+def test_portfolio_margin_counts_overlapping_positions():
+    trades = [_trade("ETHUSD", "2025-01-01 00:00", "2025-01-01 02:00", 10.0, entry_price=3000.0),
+              _trade("SOLUSD", "2025-01-01 01:00", "2025-01-01 03:00", -5.0, entry_price=200.0),
+              # Enters on the candle ETHUSD exits: margin is released first
+              _trade("BTCUSD", "2025-01-01 02:00", None, 20.0, entry_price=90000.0)]
+    summary = backtest.portfolio_summary(trades)
+    value = config.CONTRACT_VALUES
+    eth = 3000.0 * config.QUANTITIES["ETHUSD"] * value["ETHUSD"] / config.LEVERAGE
+    sol = 200.0 * config.QUANTITIES["SOLUSD"] * value["SOLUSD"] / config.LEVERAGE
+    btc = 90000.0 * config.QUANTITIES["BTCUSD"] * value["BTCUSD"] / config.LEVERAGE
+    assert summary["max_open_positions"] == 2
+    assert summary["peak_margin"] == round(max(eth + sol, sol + btc), 2)
+    assert summary["pnl_unit"] == "USD"
+    assert summary["total_pnl"] == round(10.0 * value["ETHUSD"] - 5.0 * value["SOLUSD"] + 20.0 * value["BTCUSD"], 2)
+
+
+def test_portfolio_without_contract_value_reports_no_margin(monkeypatch):
+    monkeypatch.setattr(config, "CONTRACT_VALUES", {"ETHUSD": 0.01})
+    trades = [_trade("ETHUSD", "2025-01-01 00:00", "2025-01-01 02:00", 10.0),
+              _trade("XRPUSD", "2025-01-01 01:00", None, 5.0)]
+    summary = backtest.portfolio_summary(trades)
+    assert summary["pnl_unit"] == "points" and summary["total_pnl"] == 15.0
+    assert "peak_margin" not in summary and "return_on_margin" not in summary
+    assert summary["max_open_positions"] == 2
+    assert "not reported" in backtest.describe_margin(summary, config.LEVERAGE)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+import calibrate_slope
+import indicators
+
+
+def _frame(n, scale, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, scale, n)))
+    return pd.DataFrame({'close': close})
+
+
+def test_solved_scaling_hits_target_share():
+    frames = [_frame(3000, 0.002, 0), _frame(2000, 0.0005, 1)]
+    pct_changes = calibrate_slope.hma_pct_changes(frames, hma_period=31)
+    assert pct_changes.shape == (2, 3000)
+
+    thresholds = np.array([26.0, 30.0])
+    scalings = calibrate_slope.solve_scaling(pct_changes, thresholds, share=0.05)
+    # Quieter symbol needs the larger scaling
+    assert scalings[1] > scalings[0]
+    np.testing.assert_allclose(calibrate_slope.signal_share(pct_changes, scalings, thresholds), 0.05, atol=0.002)
+
+    # Same share as counting slopes computed the way the bot does
+    hma = indicators.calculate_hma(frames[0]['close'], period=31)
+    slopes = indicators.calculate_slope_degrees(hma, scaling_factor=scalings[0]).dropna()
+    assert abs((slopes.abs() >= 26.0).mean() - 0.05) < 0.002
+
+
+def test_proposed_config_keeps_other_keys():
+    proposed = calibrate_slope.propose_symbol_config(["ETHUSD", "NEWUSD"], [4321.0, 287.4])
+    assert proposed["ETHUSD"]["slope_scaling"] == 4300.0
+    assert proposed["ETHUSD"]["slope_threshold"] == 26
+    assert proposed["NEWUSD"] == {"slope_scaling": 290.0}
@@ -0,0 +1,66 @@
+import time
+
+import pandas as pd
+
+from candle_store import CandleStore
+
+BAR = 15 * 60
+
+
+class FakeDownloader:
+    """Stands in for DeltaExchange._download_candles, recording every requested range."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbol, resolution, start, end):
+        self.calls.append((start, end))
+        first = -(-start // BAR) * BAR
+        times = list(range(first, end + 1, BAR))
+        return pd.DataFrame({
+            'time': pd.to_datetime(times, unit='s'),
+            'open': [float(t % 997) for t in times],
+            'high': [float(t % 997) + 1 for t in times],
+            'low': [float(t % 997) - 1 for t in times],
+            'close': [float(t % 997) for t in times],
+            'volume': [1.0] * len(times),
+        })
+
+
+def test_fetch_only_downloads_gaps(tmp_path):
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    download = FakeDownloader()
+    end = (int(time.time()) // BAR) * BAR - 10 * BAR # fully closed history
+
+    first = store.fetch('ETHUSD', '15m', end - 100 * BAR, end - 50 * BAR, download)
+    assert len(first) == 51
+    assert len(download.calls) == 1
+
+    # Overlapping request: only the part after the cached range is downloaded
+    second = store.fetch('ETHUSD', '15m', end - 80 * BAR, end, download)
+    assert download.calls[-1] == (end - 50 * BAR + 1, end)
+    assert len(second) == 81
+    assert second['time'].is_monotonic_increasing
+
+    # Fully cached request needs no download at all
+    calls = len(download.calls)
+    third = store.fetch('ETHUSD', '15m', end - 100 * BAR, end, download)
+    assert len(download.calls) == calls
+    assert len(third) == 101
+
+
+def test_forming_bar_is_never_cached(tmp_path):
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    download = FakeDownloader()
+    now = int(time.time())
+    forming_start = (now // BAR) * BAR
+
+    df = store.fetch('BTCUSD', '15m', now - 20 * BAR, now, download)
+    assert df['time'].iloc[-1] == pd.Timestamp(forming_start, unit='s')
+    assert len(download.calls) == 1 # gap and live tail folded into one request
+
+    cached = store.load('BTCUSD', '15m', now - 20 * BAR, now)
+    assert cached['time'].iloc[-1] < pd.Timestamp(forming_start, unit='s')
+
+    store.fetch('BTCUSD', '15m', now - 20 * BAR, now, download)
+    assert download.calls[-1][0] >= forming_start - BAR
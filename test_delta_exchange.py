@@ -0,0 +1,213 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pandas as pd
+import requests
+
+import delta_exchange
+from delta_exchange import DeltaExchange
+
+BAR = 15 * 60
+
+
+def fake_candle_api(calls):
+    """Mimics /v2/history/candles, including the per-request candle limit."""
+    def _request(method, endpoint, payload=None, auth=True):
+        calls.append(payload)
+        first = -(-payload['start'] // BAR) * BAR
+        times = list(range(first, payload['end'] + 1, BAR))[:delta_exchange.CANDLE_LIMIT]
+        # newest first, as the exchange returns them
+        result = [{'time': t, 'open': 1, 'high': 2, 'low': 0, 'close': t % 1000, 'volume': 5} for t in reversed(times)]
+        return {'success': True, 'result': result}
+    return _request
+
+
+def test_long_range_is_paginated_without_truncation():
+    calls = []
+    exchange = DeltaExchange('', '', max_download_workers=3)
+    exchange._request = fake_candle_api(calls)
+
+    start = 1_700_000_100 // BAR * BAR
+    end = start + 5000 * BAR
+    df = exchange.fetch_candles('BTCUSD', timeframe='15m', start=start, end=end)
+
+    assert len(calls) == 3
+    assert len(df) == 5001
+    assert df['time'].is_monotonic_increasing
+    assert not df['time'].duplicated().any()
+    assert df['time'].iloc[0] == pd.Timestamp(start, unit='s')
+    assert df['time'].iloc[-1] == pd.Timestamp(end, unit='s')
+
+
+def test_failed_window_fails_whole_range():
+    calls = []
+    exchange = DeltaExchange('', '')
+    api = fake_candle_api(calls)
+
+    def flaky_request(method, endpoint, payload=None, auth=True):
+        if payload['start'] > 1_700_000_100 // BAR * BAR:
+            return None # every window after the first fails
+        return api(method, endpoint, payload, auth)
+
+    exchange._request = flaky_request
+    start = 1_700_000_100 // BAR * BAR
+    assert exchange._download_candles('BTCUSD', '15m', start, start + 4500 * BAR) is None
+
+
+class FakeSession:
+    """Replays a scripted list of responses / exceptions in place of requests.Session."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = []
+
+    def _next(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def get(self, url, **kwargs):
+        return self._next('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._next('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._next('DELETE', url, **kwargs)
+
+
+def make_response(status, body=b'{"success": true, "result": []}', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+def test_get_is_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(delta_exchange.time, 'sleep', sleeps.append)
+    exchange = DeltaExchange('', '', timeout=(1, 2))
+    exchange.session = FakeSession([
+        requests.exceptions.ConnectionError('reset'),
+        make_response(503),
+        make_response(200),
+    ])
+
+    assert exchange._request('GET', '/v2/products', auth=False) == {'success': True, 'result': []}
+    assert len(sleeps) == 2
+    assert all(0 <= s <= exchange.backoff_cap for s in sleeps)
+    assert all(call[2]['timeout'] == (1, 2) for call in exchange.session.calls)
+
+
+def test_rate_limit_headers_are_honored(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(delta_exchange.time, 'sleep', sleeps.append)
+    exchange = DeltaExchange('key', 'secret')
+    exchange.session = FakeSession([
+        make_response(429, headers={'X-RATE-LIMIT-RESET': '1500'}),
+        make_response(200, body=b'{"success": true, "result": {"id": 1}}'),
+    ])
+
+    assert exchange.place_order(1, 1, 'buy', 'market_order')['result'] == {'id': 1}
+    assert sleeps == [1.5]
+
+
+def test_retry_after_is_capped(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(delta_exchange.time, 'sleep', sleeps.append)
+    exchange = DeltaExchange('key', 'secret', backoff_cap=10.0)
+    exchange.session = FakeSession([
+        make_response(429, headers={'Retry-After': '3600'}),
+        make_response(200, body=b'{"success": true, "result": {"id": 1}}'),
+    ])
+
+    assert exchange.place_order(1, 1, 'buy', 'market_order')['result'] == {'id': 1}
+    assert sleeps == [10.0]
+
+
+def test_order_is_not_resent_after_timeout(monkeypatch):
+    monkeypatch.setattr(delta_exchange.time, 'sleep', lambda s: None)
+    exchange = DeltaExchange('key', 'secret')
+    exchange.session = FakeSession([requests.exceptions.ReadTimeout('slow'), make_response(200)])
+
+    assert exchange.place_order(1, 1, 'buy', 'market_order') is None
+    assert len(exchange.session.calls) == 1
+
+
+def test_product_registry_loads_catalogue_once(monkeypatch):
+    calls = []
+    products = [
+        {'id': 27, 'symbol': 'BTCUSD', 'tick_size': '0.5', 'contract_value': '0.001'},
+        {'id': 3136, 'symbol': 'ETHUSD', 'tick_size': '0.05', 'contract_value': '0.01'},
+    ]
+    exchange = DeltaExchange('', '')
+    exchange._request = lambda method, endpoint, payload=None, auth=True: calls.append(endpoint) or {'success': True, 'result': products}
+
+    assert exchange.get_product_id('ETHUSD') == 3136
+    assert exchange.get_product_id('BTCUSD') == 27
+    assert exchange.products.get_by_id(27)['tick_size'] == 0.5
+    assert exchange.get_product_id('DOGEUSD') is None # miss right after a load does not refetch
+    assert calls == ['/v2/products']
+
+    now = delta_exchange.time.time()
+    monkeypatch.setattr(delta_exchange.time, 'time', lambda: now + 120)
+    assert exchange.get_product_id('DOGEUSD') is None # miss after the interval triggers one refresh
+    assert len(calls) == 2
+
+
+def test_concurrent_first_lookups_wait_for_the_load():
+    calls = []
+    products = [{'id': 27, 'symbol': 'BTCUSD'}, {'id': 3136, 'symbol': 'ETHUSD'}, {'id': 14969, 'symbol': 'SOLUSD'}]
+    def slow_products(method, endpoint, payload=None, auth=True):
+        calls.append(endpoint)
+        time.sleep(0.2)
+        return {'success': True, 'result': products}
+    exchange = DeltaExchange('', '')
+    exchange._request = slow_products
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        ids = list(pool.map(exchange.get_product_id, ['BTCUSD', 'ETHUSD', 'SOLUSD']))
+    assert ids == [27, 3136, 14969]
+    assert calls == ['/v2/products']
+
+
+def test_failed_product_refresh_backs_off(monkeypatch):
+    calls = []
+    responses = [{'success': True, 'result': [{'id': 3136, 'symbol': 'ETHUSD', 'tick_size': '0.05'}]}]
+    exchange = DeltaExchange('', '')
+    exchange.products.ttl = 3600
+    exchange._request = lambda method, endpoint, payload=None, auth=True: calls.append(endpoint) or (responses.pop() if responses else None)
+    assert exchange.get_product_id('ETHUSD') == 3136
+
+    # TTL expired and the API is down: one attempt, then the stale table until the retry interval
+    now = delta_exchange.time.time()
+    monkeypatch.setattr(delta_exchange.time, 'time', lambda: now + 4000)
+    for _ in range(5):
+        assert exchange.get_product_id('ETHUSD') == 3136
+    assert len(calls) == 2
+    monkeypatch.setattr(delta_exchange.time, 'time', lambda: now + 4100)
+    assert exchange.get_product_id('ETHUSD') == 3136
+    assert len(calls) == 3
+
+
+def test_order_prices_are_rounded_to_tick():
+    payloads = []
+    exchange = DeltaExchange('', '')
+    exchange.products._by_id = {3136: {'id': 3136, 'symbol': 'ETHUSD', 'tick_size': 0.05}}
+    exchange.products._loaded_at = delta_exchange.time.time()
+    exchange._request = lambda method, endpoint, payload=None, auth=True: payloads.append(payload)
+
+    exchange.place_order(3136, 1, 'buy', limit_price=3012.37)
+    assert payloads[0]['limit_price'] == '3012.35'
+
+
+def test_rate_limiter_allows_burst_then_throttles():
+    limiter = delta_exchange.RateLimiter(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(10):
+        limiter.acquire()
+    # 5 from the burst, the other 5 at 50/s
+    assert time.monotonic() - start >= 5 / 50 * 0.9
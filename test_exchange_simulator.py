@@ -0,0 +1,78 @@
+import pytest
+
+from delta_exchange import DeltaExchange
+from exchange_simulator import ExchangeSimulator
+
+BAR = 15 * 60
+T0 = 1765929600 # recorded time of the first candle
+
+
+def make_recording(n=20):
+    candles = [{"time": T0 + i * BAR, "open": 100.0 + i, "high": 103.0 + i, "low": 98.0 + i, "close": 101.0 + i, "volume": 10}
+               for i in range(n)]
+    return {
+        "products": [{"id": 3136, "symbol": "ETHUSD", "tick_size": "0.05", "contract_value": "0.01"}],
+        "candles": {"ETHUSD": {"15m": candles}}
+    }
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sim():
+    clock = Clock(1_800_000_000 + 60) # one minute into a bar
+    simulator = ExchangeSimulator(make_recording(), clock=clock, start=T0 + 10 * BAR, api_secret="secret")
+    simulator.serve()
+    yield simulator, clock
+    simulator.server.shutdown()
+
+
+def test_candles_replay_without_lookahead(sim):
+    simulator, clock = sim
+    exchange = DeltaExchange("key", "secret", simulator.url)
+    df = exchange.fetch_candles("ETHUSD", start=int(clock.now) - 5 * BAR, end=int(clock.now))
+    assert len(df) == 5
+    assert df['close'].iloc[-2] == 110.0 # recorded candle 9 closed
+    assert df['close'].iloc[-1] == df['open'].iloc[-1] == 110.0 # candle 10 forming: open only
+
+    clock.now += BAR
+    df = exchange.fetch_candles("ETHUSD", start=int(clock.now) - 2 * BAR, end=int(clock.now))
+    assert df['high'].tolist() == [113.0, 111.0]
+
+
+def test_orders_fill_and_track_positions(sim):
+    simulator, clock = sim
+    exchange = DeltaExchange("key", "secret", simulator.url)
+    assert exchange.place_order(3136, 2, "buy", "market_order")["result"]["state"] == "closed"
+    pos = exchange.get_position(3136)
+    assert pos["size"] == 2 and float(pos["entry_price"]) == 110.0
+
+    # Limit sell above the market rests until a closed bar trades through it
+    order = exchange.place_order(3136, 2, "sell", limit_price=113.5)["result"]
+    assert order["state"] == "open"
+    clock.now += BAR # recorded candle 10 closes with high 113
+    assert exchange.get_position(3136)["size"] == 2
+    clock.now += BAR # candle 11 closes with high 114
+    assert exchange.get_position(3136) is None
+    assert simulator.positions[3136]["realized_pnl"] == pytest.approx(3.5 * 2 * 0.01)
+
+
+def test_signature_is_verified(sim):
+    simulator, _ = sim
+    assert DeltaExchange("key", "wrong", simulator.url).get_position(3136) is None
+    assert simulator.request_count == 1
+    assert DeltaExchange("key", "wrong", simulator.url).get_product_id("ETHUSD") == 3136
+
+
+def test_injected_errors_are_retried():
+    simulator = ExchangeSimulator(make_recording(), clock=Clock(1_800_000_000), error_rate=0.5, seed=3)
+    exchange = DeltaExchange("", "", "http://sim", max_retries=10, backoff_base=0, backoff_cap=0)
+    exchange.session.mount("http://sim", simulator.adapter())
+    assert exchange.get_product_id("ETHUSD") == 3136
+    assert simulator.request_count > 1
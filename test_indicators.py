@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+def reference_hma(series, period):
+    # Original rolling().apply implementation, kept as the numerical reference
+    wma = lambda x: np.dot(x, np.arange(1, len(x) + 1)) / np.arange(1, len(x) + 1).sum()
+    wma_half = series.rolling(window=int(period / 2)).apply(wma, raw=True)
+    wma_full = series.rolling(window=period).apply(wma, raw=True)
+    raw_hma = 2 * wma_half - wma_full
+    return raw_hma.rolling(window=int(math.sqrt(period))).apply(wma, raw=True)
+
+
+def reference_supertrend(df, period, multiplier):
+    # Original per-row .iloc implementation, kept as the bit-exact reference
+    high, low, close = df['high'], df['low'], df['close']
+    tr = pd.concat([high - low, abs(high - close.shift(1)), abs(low - close.shift(1))], axis=1).max(axis=1)
+    atr = tr.ewm(alpha=1/period).mean()
+    hl2 = (high + low) / 2
+    basic_upperband = hl2 + (multiplier * atr)
+    basic_lowerband = hl2 - (multiplier * atr)
+    final_upperband = [0.0] * len(df)
+    final_lowerband = [0.0] * len(df)
+    supertrend = [0.0] * len(df)
+    trend = [1] * len(df)
+    for i in range(1, len(df)):
+        if basic_upperband.iloc[i] < final_upperband[i-1] or close.iloc[i-1] > final_upperband[i-1]:
+            final_upperband[i] = basic_upperband.iloc[i]
+        else:
+            final_upperband[i] = final_upperband[i-1]
+        if basic_lowerband.iloc[i] > final_lowerband[i-1] or close.iloc[i-1] < final_lowerband[i-1]:
+            final_lowerband[i] = basic_lowerband.iloc[i]
+        else:
+            final_lowerband[i] = final_lowerband[i-1]
+        if trend[i-1] == 1:
+            trend[i] = -1 if close.iloc[i] <= final_lowerband[i] else 1
+        else:
+            trend[i] = 1 if close.iloc[i] >= final_upperband[i] else -1
+        supertrend[i] = final_lowerband[i] if trend[i] == 1 else final_upperband[i]
+    return supertrend, trend
+
+
+def make_close(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.Series(3000 + np.cumsum(rng.normal(0, 5, n)), name='close')
+
+
+def make_ohlc(n, seed=7):
+    close = make_close(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    spread = rng.uniform(0, 8, n)
+    return pd.DataFrame({
+        'open': close.shift(1).fillna(close.iloc[0]),
+        'high': close + spread,
+        'low': close - spread[::-1],
+        'close': close,
+    })
+
+
+def test_hma_matches_reference():
+    close = make_close(2000)
+    for period in (4, 9, 16, 31, 55):
+        expected = reference_hma(close, period)
+        result = indicators.calculate_hma(close, period)
+        assert result.isna().equals(expected.isna())
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=0, equal_nan=True)
+
+
+def test_hma_short_series_is_all_nan():
+    close = make_close(10)
+    result = indicators.calculate_hma(close, 31)
+    assert len(result) == 10
+    assert result.isna().all()
+
+
+def test_supertrend_is_bit_identical_to_reference():
+    df = make_ohlc(3000)
+    for period, multiplier in ((2, 2), (10, 3)):
+        expected_st, expected_trend = reference_supertrend(df, period, multiplier)
+        result = indicators.calculate_supertrend(df.copy(), period=period, multiplier=multiplier)
+        assert result['Supertrend'].tolist() == expected_st
+        assert result['SupertrendTrend'].tolist() == expected_trend
+
+
+def test_supertrend_pure_python_kernel(monkeypatch):
+    # Without numba the same kernel runs as plain Python over the arrays
+    kernel = getattr(indicators._supertrend_kernel, 'py_func', indicators._supertrend_kernel)
+    monkeypatch.setattr(indicators, '_supertrend_kernel', kernel)
+    df = make_ohlc(500)
+    expected_st, expected_trend = reference_supertrend(df, 2, 2)
+    result = indicators.calculate_supertrend(df.copy(), period=2, multiplier=2)
+    assert result['Supertrend'].tolist() == expected_st
+    assert result['SupertrendTrend'].tolist() == expected_trend
+
+
+def batch_frame(df, scaling=3000.0):
+    df = indicators.calculate_supertrend(df.copy(), period=2, multiplier=2)
+    df['HMA'] = indicators.calculate_hma(df['close'], period=31)
+    df['HMA_Slope'] = indicators.calculate_slope_degrees(df['HMA'], scaling_factor=scaling)
+    return df
+
+
+def make_candles(n, seed=7):
+    df = make_ohlc(n, seed)
+    df['volume'] = 1.0
+    df['time'] = pd.date_range('2025-12-01', periods=n, freq='15min')
+    return df
+
+
+def test_indicator_state_matches_batch():
+    df = make_candles(400)
+    expected = batch_frame(df)
+
+    state = indicators.IndicatorState(st_period=2, st_multiplier=2, hma_period=31, slope_scaling=3000.0, history=400)
+    state.update_frame(df)
+    result = state.to_frame()
+
+    assert result['SupertrendTrend'].tolist() == expected['SupertrendTrend'].tolist()
+    np.testing.assert_allclose(result['Supertrend'], expected['Supertrend'], rtol=1e-12)
+    np.testing.assert_allclose(result['HMA'], expected['HMA'], rtol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(result['HMA_Slope'], expected['HMA_Slope'], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_indicator_state_revises_forming_bar():
+    df = make_candles(200)
+    expected = batch_frame(df)
+
+    state = indicators.IndicatorState(st_period=2, st_multiplier=2, hma_period=31, slope_scaling=3000.0, history=50)
+    state.update_frame(df.iloc[:-1])
+    forming = df.iloc[-1].to_dict()
+    state.update(dict(forming, close=forming['close'] + 40, high=forming['high'] + 40))
+    assert state.update(df.iloc[-3].to_dict()) is None # stale bar ignored
+    row = state.update(forming)
+
+    assert len(state.rows) == 50
+    assert row['SupertrendTrend'] == expected['SupertrendTrend'].iloc[-1]
+    assert row['Supertrend'] == pytest.approx(expected['Supertrend'].iloc[-1], rel=1e-12)
+    assert row['HMA_Slope'] == pytest.approx(expected['HMA_Slope'].iloc[-1], rel=1e-9)
+
+
+def test_indicator_state_slope_after_zero_hma():
+    df = make_candles(120)
+    df.loc[:59, ['open', 'high', 'low', 'close']] = 0.0
+    expected = batch_frame(df)
+
+    state = indicators.IndicatorState(st_period=2, st_multiplier=2, hma_period=31, slope_scaling=3000.0, history=120)
+    state.update_frame(df)
+    result = state.to_frame()
+
+    assert (expected['HMA_Slope'] == 90).any() # the first HMA after the zeros
+    np.testing.assert_allclose(result['HMA_Slope'], expected['HMA_Slope'], rtol=1e-9, atol=1e-9, equal_nan=True)
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+
+import pandas as pd
+from websockets.sync.server import serve
+
+from market_feed import MarketFeed
+
+BAR = 15 * 60
+US = 1_000_000
+
+
+def candle_message(start, close):
+    return json.dumps({
+        'type': 'candlestick_15m', 'symbol': 'ETHUSD', 'resolution': '15m',
+        'candle_start_time': start * US, 'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+    })
+
+
+class BackfillExchange:
+    """REST stand-in: only used by the feed to backfill after a reconnect."""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def fetch_candles(self, symbol, timeframe, start, end):
+        self.calls.append((symbol, start, end))
+        rows = [b for b in self.bars if start <= b['time'].timestamp() <= end]
+        return pd.DataFrame(rows)
+
+
+def test_feed_closes_bars_and_backfills_after_reconnect():
+    now = int(time.time()) // BAR * BAR
+    t0, t1, t2, t3 = now - 3 * BAR, now - 2 * BAR, now - BAR, now
+    subscriptions = []
+    connections = []
+
+    def handler(ws):
+        subscriptions.append(json.loads(ws.recv()))
+        connections.append(ws)
+        if len(connections) == 1:
+            ws.send(candle_message(t0, 100.0))
+            ws.send(candle_message(t0, 101.0)) # revision of the forming bar
+            ws.send(candle_message(t1, 102.0)) # first update of t1 closes t0
+            ws.send(json.dumps({'type': 'v2/ticker', 'symbol': 'ETHUSD', 'mark_price': '102.5'}))
+            time.sleep(0.2)
+            return # drop the connection
+        ws.send(candle_message(t3, 110.0))
+        time.sleep(1)
+
+    def bar(start, close):
+        return {'time': pd.Timestamp(start, unit='s'), 'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.0}
+
+    exchange = BackfillExchange([bar(t1, 103.0), bar(t2, 104.0), bar(t3, 105.0)])
+    closed = []
+
+    with serve(handler, 'localhost', 0) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.socket.getsockname()[1]
+        feed = MarketFeed(exchange, ['ETHUSD'], url=f'ws://localhost:{port}',
+                          on_bar_close=lambda sym, b: closed.append((sym, b)), reconnect_delay=0.05)
+        feed.start()
+        try:
+            assert feed.wait_for_close(timeout=5, since=0)
+            deadline = time.time() + 5
+            while len(closed) < 3 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            feed.stop()
+            server.shutdown()
+
+    assert subscriptions[0]['payload']['channels'][0] == {'name': 'candlestick_15m', 'symbols': ['ETHUSD']}
+    assert [(b['time'].timestamp(), b['close']) for _, b in closed] == [(t0, 101.0), (t1, 103.0), (t2, 104.0)]
+    assert exchange.calls and exchange.calls[0][1] == t1 # backfill resumes from the last known bar
+    assert feed.forming['ETHUSD']['time'] == pd.Timestamp(t3, unit='s')
+    assert feed.latest_price('ETHUSD') in (105.0, 110.0)
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import market_service
+from market_service import MarketStateStore
+
+
+def make_frame(n=5):
+    return pd.DataFrame({
+        'time': pd.date_range('2025-12-17', periods=n, freq='15min'),
+        'close': np.linspace(3000, 3010, n),
+        'SupertrendTrend': [1, 1, -1, -1, 1][:n],
+        'HMA': [np.nan] + [3001.0] * (n - 1),
+    })
+
+
+def test_published_state_round_trips(tmp_path):
+    store = MarketStateStore(str(tmp_path / 'state.db'))
+    df = make_frame()
+    trades = [
+        {'symbol': 'ETHUSD', 'type': 'LONG', 'entry_price': 3000.0, 'exit_price': 3005.0,
+         'entry_time': df['time'][0], 'exit_time': df['time'][2], 'pnl': 5.0, 'status': 'CLOSED'},
+        {'symbol': 'ETHUSD', 'type': 'LONG', 'entry_price': 3010.0, 'exit_price': 3010.0,
+         'entry_time': df['time'][4], 'exit_time': '-', 'pnl': 0.0, 'status': 'OPEN'},
+    ]
+    store.publish('ETHUSD', df, trades)
+
+    # A second connection, as a consumer process would open it
+    published = MarketStateStore(store.path).read_fresh('ETHUSD', max_age=30)
+    pd.testing.assert_frame_equal(published['frame'], df, check_dtype=False)
+    assert published['trades'] == trades
+    assert published['last_bar'] == int(df['time'].iloc[-1].timestamp())
+    assert MarketStateStore(store.path).read('BTCUSD') is None
+
+
+def test_wait_for_bar_requires_publish_after_close(tmp_path):
+    store = MarketStateStore(str(tmp_path / 'state.db'))
+    bar = market_service.BAR_SECONDS
+    closed_bar_start = (int(time.time()) // bar) * bar - bar
+    df = make_frame(2)
+    df['time'] = pd.to_datetime([closed_bar_start - bar, closed_bar_start], unit='s')
+
+    assert store.wait_for_bar('ETHUSD', closed_bar_start, timeout=0.3, poll=0.1) is None
+    store.publish('ETHUSD', df, [])
+    assert store.wait_for_bar('ETHUSD', closed_bar_start, timeout=0.3, poll=0.1)['last_bar'] == closed_bar_start
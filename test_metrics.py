@@ -0,0 +1,69 @@
+import urllib.request
+
+import pytest
+import requests
+
+import bot
+import config
+import delta_exchange
+import metrics
+from delta_exchange import DeltaExchange
+from test_delta_exchange import FakeSession, make_response
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_latency_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, stage='fetch')
+
+    text = metrics.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{stage="fetch"} 4' in text
+    assert hist.get(stage='fetch') == (4, pytest.approx(4.05))
+    with pytest.raises(ValueError):
+        hist.observe(1.0, symbol='ETHUSD')
+
+
+def test_requests_are_timed_and_errors_counted(monkeypatch):
+    monkeypatch.setattr(delta_exchange.time, 'sleep', lambda s: None)
+    count_before = metrics.HTTP_SECONDS.get(method='GET', endpoint='/v2/products')[0]
+    errors_before = metrics.API_ERRORS.get(method='GET', endpoint='/v2/products', reason='503')
+    timeouts_before = metrics.API_ERRORS.get(method='GET', endpoint='/v2/products', reason='timeout')
+
+    exchange = DeltaExchange('', '')
+    exchange.session = FakeSession([
+        requests.exceptions.Timeout('slow'),
+        make_response(503),
+        make_response(200),
+    ])
+    assert exchange._request('GET', '/v2/products', auth=False) is not None
+
+    assert metrics.HTTP_SECONDS.get(method='GET', endpoint='/v2/products')[0] == count_before + 3
+    assert metrics.API_ERRORS.get(method='GET', endpoint='/v2/products', reason='503') == errors_before + 1
+    assert metrics.API_ERRORS.get(method='GET', endpoint='/v2/products', reason='timeout') == timeouts_before + 1
+
+
+def test_metrics_endpoint():
+    metrics.LOOP_LAG.set(0.25)
+    server = metrics.serve(0, host='127.0.0.1')
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain')
+        assert 'bot_loop_lag_seconds 0.25' in body
+    finally:
+        server.shutdown()
+
+
+def test_bot_survives_metrics_port_in_use(monkeypatch):
+    taken = metrics.serve(0, host='127.0.0.1')
+    try:
+        monkeypatch.setattr(config, "METRICS_HOST", '127.0.0.1')
+        monkeypatch.setattr(config, "METRICS_PORT", taken.server_address[1])
+        assert bot.start_metrics() is None
+    finally:
+        taken.shutdown()
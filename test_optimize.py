@@ -0,0 +1,81 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import config
+import indicators
+import optimize
+import walkforward
+import strategy_utils
+
+
+def _candles(n=600, seed=2):
+    rng = np.random.default_rng(seed)
+    close = 3000 + np.cumsum(rng.normal(0, 8, n))
+    return pd.DataFrame({
+        'time': pd.date_range('2025-01-01', periods=n, freq='15min'),
+        'open': close,
+        'high': close + rng.random(n) * 10,
+        'low': close - rng.random(n) * 10,
+        'close': close,
+        'volume': 1.0
+    })
+
+
+def test_build_tasks_groups_strategy_params():
+    grid = {"st_period": [2, 3], "st_multiplier": [2.0], "hma_period": [31], "slope_scaling": [3000.0],
+            "slope_threshold": [20, 26], "take_profit": [0, 30]}
+    tasks = optimize.build_tasks(["ETHUSD"], grid)
+    assert len(tasks) == 2
+    assert all(len(strategy_grid) == 4 for _, _, strategy_grid in tasks)
+    assert len(optimize.build_tasks(["ETHUSD"], grid, samples=3)[0][2]) <= 3
+
+
+def test_default_grid_uses_each_symbols_settings(monkeypatch):
+    monkeypatch.setitem(config.SYMBOL_CONFIG, "ETHUSD", {"slope_scaling": 7900.0, "slope_threshold": 26, "take_profit": 40})
+    parser = argparse.ArgumentParser()
+    optimize.add_grid_arguments(parser)
+    grid = optimize.grid_from_args(parser.parse_args([]))
+    (_, ind, strategy_grid), = optimize.build_tasks(["ETHUSD"], grid)
+    assert ind["slope_scaling"] == 7900.0 and strategy_grid == [(26, 40)]
+
+    grid = optimize.grid_from_args(parser.parse_args(["--slope-scale", "0.5", "1"]))
+    assert [ind["slope_scaling"] for _, ind, _ in optimize.build_tasks(["ETHUSD", "SOLUSD"], grid)] == [
+        3950.0, 7900.0, config.SYMBOL_CONFIG["SOLUSD"]["slope_scaling"] * 0.5, config.SYMBOL_CONFIG["SOLUSD"]["slope_scaling"]]
+
+
+def test_sweep_matches_single_backtest():
+    df = _candles()
+    grid = {"st_period": [2, 5], "st_multiplier": [2.0], "hma_period": [21], "slope_scaling": [3000.0, 7900.0],
+            "slope_threshold": [20], "take_profit": [0, 25]}
+    rows = optimize.run_sweep({"ETHUSD": (df, 100)}, grid, workers=2)
+    assert len(rows) == 8
+    assert rows == sorted(rows, key=lambda r: r['total_pnl'], reverse=True)
+
+    row = rows[0]
+    expected = indicators.calculate_supertrend(df[['time', 'high', 'low', 'close']].copy(), period=row['st_period'],
+                                               multiplier=row['st_multiplier'])
+    hma = indicators.calculate_hma(expected['close'], period=row['hma_period'])
+    expected['HMA_Slope'] = indicators.calculate_slope_degrees(hma, scaling_factor=row['slope_scaling'])
+    trades = strategy_utils.run_strategy(expected, "ETHUSD", take_profit=row['take_profit'],
+                                         slope_threshold=row['slope_threshold'], start=100)
+    assert backtest.summarize(trades)['total_pnl'] == row['total_pnl']
+
+
+def test_walkforward_trades_only_test_windows():
+    df = _candles(n=24 * 96)
+    start = df['time'].iloc[96].to_pydatetime()
+    windows = walkforward.make_windows(start, df['time'].iloc[-1].to_pydatetime(), train_days=5, test_days=3)
+    assert len(windows) == 6
+    grid = {"st_period": [2, 3], "st_multiplier": [2.0], "hma_period": [21], "slope_scaling": [3000.0],
+            "slope_threshold": [20], "take_profit": [0, 25]}
+    results = walkforward.run_walkforward({"ETHUSD": (df, 96)}, windows, grid, workers=2)
+
+    for window, r in zip(windows, results["windows"]):
+        test_start, test_end = (pd.Timestamp(ts, unit='s') for ts in window[1:])
+        for t in r["symbols"]["ETHUSD"]["trades"]:
+            assert t['status'] == 'CLOSED'
+            assert test_start <= t['entry_time'] <= t['exit_time'] < test_end
+    assert results["portfolio"]["max_open_positions"] <= 1
@@ -0,0 +1,30 @@
+import pstats
+
+import profiling
+
+
+def busy_loop(seconds=0.05):
+    import time
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_sampler_writes_collapsed_stacks(tmp_path):
+    calls = []
+    output = profiling.run_profiled(lambda i: (calls.append(i), busy_loop()), 3, "test",
+                                    output=str(tmp_path / "test.folded"), interval=0.002)
+
+    assert calls == [0, 0, 1, 2] # one warm-up, then the profiled iterations
+    lines = (tmp_path / "test.folded").read_text().splitlines()
+    assert output.endswith("test.folded") and lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and int(count) > 0
+    assert any("busy_loop (test_profiling.py:" in line for line in lines)
+
+
+def test_cprofile_mode_writes_pstats(tmp_path):
+    output = profiling.run_profiled(lambda i: busy_loop(0.01), 2, "test", mode="cprofile",
+                                    output=str(tmp_path / "test.prof"), warmup=0)
+    stats = pstats.Stats(output)
+    assert any(func[2] == "busy_loop" and stat[0] == 2 for func, stat in stats.stats.items())
@@ -0,0 +1,37 @@
+import numpy as np
+
+import clock
+import config
+from replay import run_replay
+
+BAR = 15 * 60
+T0 = 1765929600
+
+
+def make_recording(n=1200, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * 1.001
+    low = np.minimum(open_, close) * 0.999
+    candles = [{"time": T0 + i * BAR, "open": o, "high": h, "low": l, "close": c, "volume": 100.0}
+               for i, (o, h, l, c) in enumerate(zip(open_.tolist(), high.tolist(), low.tolist(), close.tolist()))]
+    return {
+        "products": [{"id": 3136, "symbol": "ETHUSD", "tick_size": "0.05", "contract_value": "0.01"}],
+        "candles": {"ETHUSD": {"15m": candles}},
+        "positions": [],
+        "orders": []
+    }
+
+
+def test_replay_matches_backtest():
+    start = T0 + (config.MARKET_HISTORY_BARS + 10) * BAR
+    end = T0 + 1100 * BAR
+    dry_run = config.DRY_RUN
+    results = run_replay(make_recording(), ["ETHUSD"], start, end)
+    assert isinstance(clock._clock, clock.SystemClock) and config.DRY_RUN == dry_run
+
+    res = results["symbols"]["ETHUSD"]
+    assert res["backtest"]["summary"]["trades"] > 0
+    assert res["differences"] == {"live_only": [], "backtest_only": []}
+    assert res["live"]["summary"]["total_pnl"] == res["backtest"]["summary"]["total_pnl"]
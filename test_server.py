@@ -0,0 +1,162 @@
+import json
+
+import pandas as pd
+
+import server
+from server import DashboardFeed
+
+
+def events(stream, n):
+    """Parses the next n SSE events into (id, event, data) tuples."""
+    out = []
+    for chunk in stream:
+        if chunk.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        out.append((fields['id'], fields['event'], json.loads(fields['data'])))
+        if len(out) == n:
+            return out
+    return out
+
+
+def trade(entry_time, pnl, status='OPEN'):
+    return {'symbol': 'ETHUSD', 'type': 'LONG', 'entry_time': entry_time, 'exit_time': '-', 'pnl': pnl, 'status': status}
+
+
+def test_updates_carry_only_changes():
+    feed = DashboardFeed()
+    feed.publish({'BTCUSD': {'price': 1}, 'ETHUSD': {'price': 2}}, [trade('2026-01-01 10:00', 5)], 'now')
+    stream = feed.stream()
+    (_, kind, snapshot), = events(stream, 1)
+    assert kind == 'snapshot' and len(snapshot['history']) == 1
+    start = snapshot['version']
+
+    feed.publish({'BTCUSD': {'price': 1}, 'ETHUSD': {'price': 3}},
+                 [trade('2026-01-01 10:30', 0), trade('2026-01-01 10:00', 5)], 'later')
+    feed.publish({'BTCUSD': {'price': 1}, 'ETHUSD': {'price': 3}}, [trade('2026-01-01 10:30', 7)], 'latest')
+    (_, kind, first), (last_id, _, second) = events(stream, 2)
+    assert kind == 'update'
+    assert first['signals'] == {'ETHUSD': {'price': 3}}
+    assert [t['entry_time'] for t in first['trades']] == ['2026-01-01 10:30'] and first['removed'] == []
+    assert second['signals'] == {} and second['trades'][0]['pnl'] == 7
+    assert second['removed'] == ['ETHUSD|2026-01-01 10:00|LONG']
+    assert int(last_id) == second['version'] == start + 2
+
+
+def test_unchanged_refresh_sends_no_symbols(monkeypatch):
+    df = pd.DataFrame({'time': pd.date_range('2026-01-01', periods=3, freq='15min'), 'close': [1.0, 2.0, 3.0],
+                       'SupertrendTrend': [1, 1, 1], 'HMA_Slope': [0.0, 5.0, 50.0], 'Supertrend': [0.5, 1.0, 1.5]})
+    monkeypatch.setattr(server, "SYMBOLS", ['ETHUSD'])
+    monkeypatch.setattr(server, "FEED", DashboardFeed())
+    monkeypatch.setattr(server, "load_symbol", lambda symbol: (df, []))
+    server.update_cache()
+    server.update_cache()
+    first, second = [update for _, update, _ in server.FEED.events]
+    assert list(first['signals']) == ['ETHUSD'] and second['signals'] == {}
+
+
+def test_reconnect_resumes_or_resyncs():
+    feed = DashboardFeed(maxlen=2)
+    start = feed.version
+    for price in range(3):
+        feed.publish({'ETHUSD': {'price': price}}, [], 'now')
+
+    # Resumes from a retained version without a snapshot
+    (event_id, kind, data), = events(feed.stream(str(start + 2)), 1)
+    assert kind == 'update' and data['version'] == start + 3
+    # Too old, or from a later (restarted) process: full snapshot
+    assert events(feed.stream(str(start)), 1)[0][1] == 'snapshot'
+    assert events(feed.stream(str(start + 10)), 1)[0][1] == 'snapshot'
+
+
+def test_changes_since_merges_retained_updates():
+    feed = DashboardFeed(maxlen=3)
+    start = feed.version
+    feed.publish({'ETHUSD': {'price': 1}}, [trade('2026-01-01 10:00', 1)], 'a')
+    feed.publish({'ETHUSD': {'price': 2}}, [trade('2026-01-01 10:00', 2), trade('2026-01-01 11:00', 0)], 'b')
+    feed.publish({'ETHUSD': {'price': 2}}, [trade('2026-01-01 11:00', 3)], 'c')
+
+    version, body = feed.changes_since(start + 1)
+    changes = json.loads(body)
+    assert version == start + 3 and changes['version'] == version
+    assert changes['signals'] == {'ETHUSD': {'price': 2}}
+    assert [(t['entry_time'], t['pnl']) for t in changes['trades']] == [('2026-01-01 11:00', 3)]
+    assert changes['removed'] == ['ETHUSD|2026-01-01 10:00|LONG']
+
+    assert json.loads(feed.changes_since(start + 2)[1])['version'] == start + 3
+    assert json.loads(feed.changes_since(version)[1])['trades'] == []
+    assert 'history' in json.loads(feed.changes_since(start - 5)[1]) # not retained: snapshot
+
+
+def test_api_data_etag_and_since(monkeypatch):
+    feed = DashboardFeed()
+    monkeypatch.setattr(server, 'FEED', feed)
+    feed.publish({'ETHUSD': {'price': 1}}, [trade('2026-01-01 10:00', 1)], 'a')
+    client = server.app.test_client()
+
+    first = client.get('/api/data')
+    assert first.status_code == 200 and first.json['history'][0]['pnl'] == 1
+    assert client.get('/api/data', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    feed.publish({'ETHUSD': {'price': 2}}, [trade('2026-01-01 10:00', 1)], 'b')
+    assert client.get('/api/data', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    delta = client.get(f"/api/data?since={first.json['version']}")
+    assert delta.json['signals'] == {'ETHUSD': {'price': 2}} and delta.json['trades'] == []
+
+
+def test_stream_endpoint():
+    response = server.app.test_client().get('/api/stream')
+    assert response.mimetype == 'text/event-stream'
+    first = next(response.response)
+    assert (first.decode() if isinstance(first, bytes) else first).split('\n')[1] == 'event: snapshot'
+    response.close()
+
+
+def scanned(entry, status='CLOSED', symbol='ETHUSD', pnl=1.0):
+    entry = pd.Timestamp(entry)
+    return {'symbol': symbol, 'type': 'LONG', 'entry_time': entry, 'entry_price': 10.0,
+            'exit_time': entry + pd.Timedelta(minutes=30) if status == 'CLOSED' else '-',
+            'exit_price': 11.0 if status == 'CLOSED' else None, 'pnl': pnl, 'status': status}
+
+
+def test_format_trades_converts_to_ist():
+    trades = [scanned('2026-01-01 20:00'), scanned('2026-01-01 21:00', status='OPEN')]
+    trades[0]['entry_time'] = trades[0]['entry_time'].tz_localize('UTC')
+    formatted = server.format_trades(trades)
+    assert formatted[0]['entry_time'] == '2026-01-02 01:30' and formatted[0]['exit_time'] == '2026-01-02 02:00'
+    assert formatted[1]['entry_time'] == '2026-01-02 02:30' and formatted[1]['exit_time'] == '-'
+    assert formatted[1]['exit_price'] is None
+    assert isinstance(trades[1]['entry_time'], pd.Timestamp) # inputs untouched
+
+
+def test_trade_log_memoizes_closed_trades():
+    log = server.TradeLog()
+    first = log.update([scanned('2026-01-01 10:00'), scanned('2026-01-01 11:00', symbol='BTCUSD'),
+                        scanned('2026-01-01 12:00', status='OPEN', pnl=1.0)])
+    assert [t['entry_time'] for t in first] == ['2026-01-01 17:30', '2026-01-01 16:30', '2026-01-01 15:30']
+
+    second = log.update([scanned('2026-01-01 11:00', symbol='BTCUSD'), scanned('2026-01-01 12:00', pnl=5.0),
+                         scanned('2026-01-01 13:00', status='OPEN', pnl=2.0)])
+    assert [(t['entry_time'], t['status'], t['pnl']) for t in second] == [
+        ('2026-01-01 18:30', 'OPEN', 2.0), ('2026-01-01 17:30', 'CLOSED', 5.0), ('2026-01-01 16:30', 'CLOSED', 1.0)]
+    assert second[2] is first[1] # closed record reused, not reformatted
+    assert log.update([]) == []
+
+
+def test_trade_log_reformats_exit_on_forming_candle():
+    log = server.TradeLog()
+    forming = pd.Timestamp('2026-01-01 10:30')
+    trades = [scanned('2026-01-01 09:00'), scanned('2026-01-01 10:00', pnl=1.0)] # exits 09:30 and 10:30
+    first = log.update(trades, settled_before=forming)
+    assert [t['pnl'] for t in first] == [1.0, 1.0]
+
+    # The forming candle moved: the provisional exit has another price and PnL
+    trades[1] = dict(trades[1], exit_price=7.0, pnl=-3.0)
+    second = log.update(trades, settled_before=forming)
+    assert (second[0]['exit_price'], second[0]['pnl']) == (7.0, -3.0)
+    assert second[1] is first[1] # settled exit memoized
+
+    # Once its candle has closed the exit is memoized as well
+    third = log.update(trades, settled_before=forming + pd.Timedelta(minutes=15))
+    fourth = log.update(trades, settled_before=forming + pd.Timedelta(minutes=15))
+    assert third[0]['pnl'] == -3.0 and fourth[0] is third[0]
@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+import bot
+import clock
+import config
+from state_store import BotStateStore
+
+BAR = 900
+FORMING = 1_767_225_600 # 2026-01-01 00:00 UTC, start of the forming candle
+
+
+class FakeExchange:
+    def __init__(self):
+        self.orders = []
+
+    def get_product_id(self, symbol):
+        return 27
+
+    def get_position(self, product_id):
+        return {}
+
+    def place_order(self, product_id, size, side, order_type="market_order"):
+        self.orders.append((product_id, size, side))
+
+
+def fresh_long_frame():
+    # Trend turns up on the last closed candle with a steep slope: a BUY signal
+    times = pd.to_datetime([FORMING - BAR * i for i in range(6, -1, -1)], unit='s')
+    return pd.DataFrame({
+        'time': times,
+        'close': [3000.0] * 7,
+        'SupertrendTrend': [-1, -1, -1, -1, -1, 1, 1],
+        'HMA_Slope': [0.0] * 5 + [80.0, 80.0],
+    })
+
+
+@pytest.fixture
+def live_bot(monkeypatch):
+    monkeypatch.setattr(config, "DRY_RUN", False)
+    monkeypatch.setattr(config, "TELEGRAM_ENABLED", False)
+    monkeypatch.setattr(bot, "BAR_SECONDS", BAR)
+    fetches = []
+    def latest_data(exchange, symbol, state=None):
+        fetches.append(symbol)
+        return fresh_long_frame()
+    monkeypatch.setattr(bot, "get_latest_data", latest_data)
+    previous = clock.set_clock(clock.VirtualClock(FORMING + 60))
+    yield fetches
+    clock.set_clock(previous)
+
+
+def test_state_round_trips(tmp_path):
+    path = str(tmp_path / 'state.db')
+    position = {'side': 'SHORT', 'size': 10, 'entry_price': 3000.5}
+    BotStateStore(path).save('ETHUSD', {'product_id': 27, 'last_traded_trend': -1, 'last_bar': 123,
+                                        'position': position, 'indicators': object()})
+
+    saved = BotStateStore(path).load()['ETHUSD']
+    assert saved['product_id'] == 27 and saved['last_traded_trend'] == -1 and saved['last_bar'] == 123
+    assert saved['position'] == position
+
+
+def test_order_is_claimed_once(tmp_path):
+    store = BotStateStore(str(tmp_path / 'state.db'))
+    assert store.claim_order('ETHUSD', 100, 'exit', 'sell', 10)
+    assert store.claim_order('ETHUSD', 100, 'entry', 'sell', 10)
+    assert not BotStateStore(store.path).claim_order('ETHUSD', 100, 'entry', 'sell', 10)
+    assert store.claim_order('ETHUSD', 1000, 'entry', 'buy', 10)
+    assert [row[:2] for row in store.orders('ETHUSD')] == [(100, 'exit'), (100, 'entry'), (1000, 'entry')]
+
+
+def test_restart_within_candle_does_not_reenter(tmp_path, monkeypatch, live_bot):
+    path = str(tmp_path / 'state.db')
+    monkeypatch.setattr(config, "BOT_STATE_PATH", path)
+    monkeypatch.setattr(bot, "state_store", BotStateStore(path))
+    exchange = FakeExchange()
+    bot.process_symbol(exchange, 'ETHUSD', {})
+    assert exchange.orders == [(27, config.QUANTITIES['ETHUSD'], 'buy')]
+
+    # Restarted process: state comes from the file, nothing is downloaded or sent again
+    monkeypatch.setattr(bot, "state_store", BotStateStore(path))
+    bot_state, warm = bot.restore_state(['ETHUSD'])
+    assert warm
+    state = bot_state['ETHUSD']
+    assert state['last_bar'] == FORMING - BAR and state['last_traded_trend'] == 1
+    assert state['position']['side'] == 'LONG'
+    bot.process_symbol(exchange, 'ETHUSD', state)
+    assert len(exchange.orders) == 1
+    assert live_bot == ['ETHUSD']
+
+
+def test_claimed_entry_is_not_resent_after_crash(tmp_path, monkeypatch, live_bot):
+    # The previous run journaled the entry, then died before saving the state
+    store = BotStateStore(str(tmp_path / 'state.db'))
+    store.claim_order('ETHUSD', FORMING - BAR, 'entry', 'buy', config.QUANTITIES['ETHUSD'])
+    monkeypatch.setattr(bot, "state_store", store)
+    exchange = FakeExchange()
+    state = {}
+    bot.process_symbol(exchange, 'ETHUSD', state)
+    assert exchange.orders == []
+    assert state['last_traded_trend'] == 1 and state['last_bar'] == FORMING - BAR
+    # The entry was sent, so the saved state holds the position
+    assert store.load()['ETHUSD']['position'] == {'side': 'LONG', 'size': config.QUANTITIES['ETHUSD'], 'entry_price': 3000.0}
+
+
+def test_dry_run_signals_are_not_journaled(tmp_path, monkeypatch, live_bot):
+    monkeypatch.setattr(config, "DRY_RUN", True)
+    monkeypatch.setattr(config, "TRADE_LEDGER_PATH", None)
+    monkeypatch.setattr(bot, "ledger", None)
+    store = BotStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(bot, "state_store", store)
+    sent = []
+    monkeypatch.setattr(bot.notifier, "send_telegram_message", sent.append)
+    bot.process_symbol(FakeExchange(), 'ETHUSD', {})
+    assert len(sent) == 1 and 'BUY SIGNAL' in sent[0]
+    assert store.orders('ETHUSD') == []
+
+
+def test_stale_or_missing_state_is_cold(tmp_path, monkeypatch):
+    store = BotStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(bot, "state_store", store)
+    previous = clock.set_clock(clock.VirtualClock(FORMING))
+    try:
+        store.save('ETHUSD', {'product_id': 27, 'last_bar': FORMING - BAR})
+        assert bot.restore_state(['ETHUSD']) == ({'ETHUSD': {'product_id': 27, 'last_bar': FORMING - BAR}}, True)
+        assert bot.restore_state(['ETHUSD', 'BTCUSD'])[1] is False
+        clock.sleep(config.WARM_RESTART_MAX_AGE + 1)
+        assert bot.restore_state(['ETHUSD'])[1] is False
+    finally:
+        clock.set_clock(previous)
+
+
+def test_profile_cycles_evaluates_every_iteration(tmp_path, monkeypatch, live_bot):
+    for name in ("DRY_RUN", "TELEGRAM_ENABLED", "TRADE_LEDGER_PATH"):
+        monkeypatch.setattr(config, name, getattr(config, name))
+    monkeypatch.setattr(config, "QUANTITIES", {'ETHUSD': 1, 'SOLUSD': 10})
+    monkeypatch.setattr(bot, "ledger", None)
+    bot.profile_cycles(FakeExchange(), 3, mode="sample", output=str(tmp_path / 'profile.folded'))
+    assert len(live_bot) == (1 + 3) * 2 # warm-up plus every profiled iteration fetched both symbols
+    assert config.TRADE_LEDGER_PATH is None and bot.ledger.path is None
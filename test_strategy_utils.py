@@ -0,0 +1,69 @@
+import numpy as np
+
+import strategy_utils
+from bench_scan_trades import make_signal_frame, scan_trades_iloc
+
+
+def test_trend_start_indices():
+    trend = np.array([1, 1, -1, -1, -1, 1, -1, -1])
+    assert strategy_utils.trend_start_indices(trend).tolist() == [0, 0, 2, 2, 2, 5, 6, 6]
+    assert strategy_utils.trend_start_indices(np.array([], dtype=int)).tolist() == []
+
+
+def test_scan_matches_iloc_reference():
+    for seed in range(3):
+        df = make_signal_frame(1000, seed=seed)
+        for symbol in ('ETHUSD', 'SOLUSD'):
+            assert strategy_utils.scan_trades_for_df(df, symbol) == scan_trades_iloc(df, symbol)
+            assert strategy_utils.run_strategy(df, symbol, take_profit=20) == scan_trades_iloc(df, symbol, take_profit=20)
+
+
+def test_open_position_is_reported():
+    df = make_signal_frame(50, seed=3)
+    # Short on a fresh down trend first: longs never re-enter after a long
+    df.loc[37, 'SupertrendTrend'] = 1
+    df.loc[38:39, 'SupertrendTrend'] = -1
+    df.loc[38, 'HMA_Slope'] = -80.0
+    df.loc[40:, 'SupertrendTrend'] = 1
+    df.loc[40, 'HMA_Slope'] = 80.0
+    trades = strategy_utils.scan_trades_for_df(df, 'ETHUSD')
+    assert trades[-1]['status'] == 'OPEN'
+    assert trades[-1]['type'] == 'LONG'
+    assert trades[-1]['exit_price'] == df['close'].iloc[-1]
+
+
+def _fresh_long_frame():
+    df = make_signal_frame(30, seed=5)
+    df['close'] = 3000.0
+    df['SupertrendTrend'] = -1
+    df['HMA_Slope'] = 0.0
+    df.loc[10:, 'SupertrendTrend'] = 1
+    df.loc[10, 'HMA_Slope'] = 80.0
+    return df
+
+
+def test_take_profit_exit_on_close():
+    df = _fresh_long_frame()
+    df.loc[15:, 'close'] = 3050.0
+    trades = strategy_utils.run_strategy(df, 'ETHUSD', take_profit=40)
+    assert trades[0]['exit_reason'] == 'TP'
+    assert trades[0]['exit_time'] == df['time'].iloc[15]
+    assert trades[0]['pnl'] == 50.0
+    # Same trend after the take profit: no re-entry
+    assert len(trades) == 1
+
+
+def test_start_skips_warmup_bars():
+    df = _fresh_long_frame()
+    assert strategy_utils.run_strategy(df, 'ETHUSD', start=11) == []
+    assert strategy_utils.run_strategy(df, 'ETHUSD', start=10)[0]['status'] == 'OPEN'
+
+
+def test_signals():
+    assert strategy_utils.entry_signal(1, 30, 1, 26) == 1
+    assert strategy_utils.entry_signal(1, 30, 2, 26) == 0
+    assert strategy_utils.entry_signal(1, 30, 0, 26, last_traded_trend=1) == 0
+    assert strategy_utils.entry_signal(-1, -30, 0, 26, last_traded_trend=1) == -1
+    assert strategy_utils.exit_signal(1, 100, 140, 1, take_profit=40) == 'TP'
+    assert strategy_utils.exit_signal(-1, 100, 90, 1, take_profit=40) == 'REVERSAL'
+    assert strategy_utils.exit_signal(-1, 100, 90, -1) is None
@@ -0,0 +1,67 @@
+import pandas as pd
+
+import strategy_utils
+from bench_scan_trades import make_signal_frame
+from trade_ledger import TradeLedger, closed_rows
+
+
+def test_incremental_updates_match_full_scan():
+    df = make_signal_frame(600, seed=2)
+    ledger = TradeLedger(None)
+    processed = 0
+    for end in (100, 101, 250, 250, 433, 600):
+        processed += ledger.update('ETHUSD', df.iloc[:end])
+    assert processed == len(df) - 1
+
+    expected = strategy_utils.run_strategy(df, 'ETHUSD')
+    assert ledger.trades('ETHUSD', df) == expected
+    assert len(ledger.closed_trades('ETHUSD')) == sum(t['status'] == 'CLOSED' for t in expected)
+
+
+def test_forming_candle_is_previewed_not_stored():
+    df = make_signal_frame(300, seed=4)
+    ledger = TradeLedger(None)
+    ledger.update('ETHUSD', df, closed=len(df) - 1)
+    assert ledger.state('ETHUSD')[0] == df['time'].iloc[-2]
+    assert ledger.trades('ETHUSD', df) == strategy_utils.run_strategy(df, 'ETHUSD')
+
+    # A later refresh of the forming candle with another close is not a second candle
+    df.loc[len(df) - 1, 'close'] += 50
+    assert ledger.update('ETHUSD', df, closed=len(df) - 1) == 0
+    assert ledger.trades('ETHUSD', df) == strategy_utils.run_strategy(df, 'ETHUSD')
+
+
+def test_history_survives_restart_and_window(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    df = make_signal_frame(800, seed=7)
+    TradeLedger(path, book='bot').update('ETHUSD', df.iloc[:500])
+
+    # Restarted process, the window now covers candles 400-799
+    ledger = TradeLedger(path, book='bot')
+    assert ledger.update('ETHUSD', df.iloc[400:]) == 300
+    expected = [t for t in strategy_utils.run_strategy(df, 'ETHUSD') if t['status'] == 'CLOSED']
+    closed = ledger.closed_trades('ETHUSD')
+    assert closed == expected
+    assert closed[0]['entry_time'] < df['time'].iloc[500]
+
+    since = df['time'].iloc[700]
+    assert all(t['entry_time'] >= since for t in ledger.closed_trades('ETHUSD', since=since))
+    # Books are independent
+    assert TradeLedger(path, book='dashboard').state('ETHUSD') == (None, None)
+
+
+def test_gap_restarts_flat():
+    df = make_signal_frame(400, seed=9)
+    ledger = TradeLedger(None)
+    ledger.update('ETHUSD', df.iloc[:100])
+    later = df.iloc[200:].reset_index(drop=True)
+    assert ledger.update('ETHUSD', later) == len(later) - 1
+    assert ledger.state('ETHUSD')[0] == df['time'].iloc[-1]
+
+
+def test_closed_rows():
+    df = make_signal_frame(3)
+    last_open = df['time'].iloc[-1].timestamp()
+    assert closed_rows(df, 900, last_open + 899) == 2
+    assert closed_rows(df, 900, last_open + 900) == 3
+    assert pd.Timestamp(last_open, unit='s') == df['time'].iloc[-1]
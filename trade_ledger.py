@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import strategy_utils
+
+def _to_epoch(value):
+    return int(pd.Timestamp(value).value // 10**9) if value is not None else None
+
+def _from_epoch(value):
+    return pd.Timestamp(value, unit='s') if value is not None else None
+
+def _epochs(df):
+    return df['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+
+def closed_rows(df, bar_seconds, now):
+    """
+    Number of leading rows of a candle frame whose candle has closed at `now` (epoch seconds).
+    """
+    return len(df) - 1 if df['time'].iloc[-1].timestamp() + bar_seconds > now else len(df)
+
+class TradeLedger:
+    """
+    Persistent strategy trade history (SQLite) per book and symbol. A cursor stores the
+    last processed closed candle and the position state, so update() only runs the
+    strategy over candles it has not seen; closed trades are written once and outlive
+    the indicator window and restarts. Books keep independent cursors in one file
+    (the bot's DRY_RUN positions lag the dashboard's by the candle being evaluated).
+    """
+    def __init__(self, path="trade_ledger.db", book="default"):
+        self.path = path
+        self.book = book
+        self._lock = threading.Lock()
+        # Autocommit mode: update() runs its read-modify-write in an explicit IMMEDIATE transaction
+        self._conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS trades (
+                book TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                entry_time INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                entry_price REAL NOT NULL,
+                exit_time INTEGER NOT NULL,
+                exit_price REAL NOT NULL,
+                pnl REAL NOT NULL,
+                exit_reason TEXT,
+                PRIMARY KEY (book, symbol, entry_time, type)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                book TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                last_bar INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                entry_price REAL NOT NULL,
+                entry_time INTEGER,
+                last_traded_trend INTEGER NOT NULL,
+                PRIMARY KEY (book, symbol)
+            ) WITHOUT ROWID
+        """)
+
+    def _read_cursor(self, symbol):
+        row = self._conn.execute(
+            "SELECT last_bar, position, entry_price, entry_time, last_traded_trend FROM cursors WHERE book = ? AND symbol = ?",
+            (self.book, symbol)
+        ).fetchone()
+        if row is None:
+            return None, None
+        last_bar, position, entry_price, entry_time, last_traded_trend = row
+        return last_bar, {"position": position, "entry_price": entry_price,
+                          "entry_time": _from_epoch(entry_time), "last_traded_trend": last_traded_trend}
+
+    def state(self, symbol):
+        """
+        (last processed candle time, strategy state), (None, None) before the first update.
+        """
+        with self._lock:
+            last_bar, state = self._read_cursor(symbol)
+        return (_from_epoch(last_bar), state)
+
+    @staticmethod
+    def _resume_at(times, last_bar):
+        """
+        First row of the frame after the cursor. Without a cursor, or when the frame starts
+        after it (candles were missed), trading restarts flat at the second row.
+        """
+        if last_bar is None or len(times) == 0 or times[0] > last_bar:
+            return 1, False
+        return int(np.searchsorted(times, last_bar, side='right')), True
+
+    def update(self, symbol, df, closed=None):
+        """
+        Runs the strategy over the first `closed` rows of an indicator frame (default: all;
+        leave out the forming candle) that are newer than the cursor, stores the trades
+        closed on them and moves the cursor. Returns the number of candles processed.
+        """
+        closed = len(df) if closed is None else min(closed, len(df))
+        if closed < 2:
+            return 0
+        times = _epochs(df)[:closed]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                last_bar, state = self._read_cursor(symbol)
+                start, resumed = self._resume_at(times, last_bar)
+                if not resumed:
+                    state = None
+                if start >= closed:
+                    self._conn.execute("COMMIT")
+                    return 0
+
+                trades, state = strategy_utils.advance_strategy(df.iloc[:closed], symbol, state, start=start)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(self.book, symbol, _to_epoch(t['entry_time']), t['type'], t['entry_price'], _to_epoch(t['exit_time']),
+                      t['exit_price'], t['pnl'], t['exit_reason']) for t in trades]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.book, symbol, int(times[closed - 1]), state['position'], state['entry_price'],
+                     _to_epoch(state['entry_time']), state['last_traded_trend'])
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return closed - start
+
+    def closed_trades(self, symbol, since=None):
+        """
+        Closed trade dicts (as run_strategy returns them) entered at or after `since`, oldest first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry_time, type, entry_price, exit_time, exit_price, pnl, exit_reason FROM trades "
+                "WHERE book = ? AND symbol = ? AND entry_time >= ? ORDER BY entry_time",
+                (self.book, symbol, _to_epoch(since) if since is not None else 0)
+            ).fetchall()
+        return [{
+            "symbol": symbol,
+            "type": trade_type,
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "entry_time": _from_epoch(entry_time),
+            "exit_time": _from_epoch(exit_time),
+            "pnl": pnl,
+            "status": "CLOSED",
+            "exit_reason": exit_reason
+        } for entry_time, trade_type, entry_price, exit_time, exit_price, pnl, exit_reason in rows]
+
+    def open_trade(self, symbol, price):
+        """
+        The position at the cursor as an OPEN trade dict marked at `price`, or None when flat.
+        """
+        _, state = self.state(symbol)
+        return strategy_utils.open_trade(symbol, state, price) if state else None
+
+    def trades(self, symbol, df, since=None):
+        """
+        Trade list in run_strategy's format for an indicator frame the ledger has been
+        updated with: stored closed trades entered since `since`, then the candles after
+        the cursor (the forming one) run from the cursor state without being stored, and
+        the position still open marked at the last close.
+        """
+        trades = self.closed_trades(symbol, since)
+        last_bar, state = self.state(symbol)
+        times = _epochs(df)
+        start, resumed = self._resume_at(times, None if last_bar is None else _to_epoch(last_bar))
+        if not resumed:
+            state = None
+        if start < len(df):
+            pending, state = strategy_utils.advance_strategy(df, symbol, state, start=start)
+            trades.extend(pending)
+        trade = strategy_utils.open_trade(symbol, state, float(df['close'].iloc[-1])) if state else None
+        if trade is not None:
+            trades.append(trade)
+        return trades
@@ -0,0 +1,144 @@
+import argparse
+import json
+import logging
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta, timezone
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import config
+from backtest import describe_margin, parse_ist_date, portfolio_summary, summarize
+from delta_exchange import DeltaExchange
+import optimize
+
+# Setup Logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def make_windows(start_utc, end_utc, train_days, test_days):
+    """
+    Rolling (train_start, test_start, test_end) epoch-second windows: every test period
+    follows its training period and windows advance by test_days.
+    """
+    to_ts = lambda dt: int(dt.replace(tzinfo=timezone.utc).timestamp())
+    windows = []
+    train_start = start_utc
+    while train_start + timedelta(days=train_days) <= end_utc:
+        test_start = train_start + timedelta(days=train_days)
+        test_end = min(test_start + timedelta(days=test_days), end_utc)
+        windows.append((to_ts(train_start), to_ts(test_start), to_ts(test_end)))
+        train_start += timedelta(days=test_days)
+    return windows
+
+def run_window(window, grid, samples=None, seed=0):
+    """
+    Picks the best parameters per symbol on the training period and trades them on
+    the following test period (starting flat, a position still open at its end is
+    closed on the last candle). Runs inside a worker process.
+    """
+    train_start, test_start, test_end = window
+    result = {"window": window, "symbols": {}}
+    test_trades = []
+    for symbol in optimize._candles:
+        times = optimize._candles[symbol]['time']
+        i_train, i_test, i_end = np.searchsorted(times, [train_start, test_start, test_end]).tolist()
+        if i_test - i_train < 2 or i_end <= i_test:
+            continue
+
+        rows = []
+        for task in optimize.build_tasks([symbol], grid, samples, seed):
+            rows.extend(optimize.run_task(task, window=(i_train, i_test)))
+        best = max(rows, key=lambda r: r['total_pnl'])
+        trades = optimize.run_params(symbol, best, (i_test, i_end))
+        if trades and trades[-1]['status'] == 'OPEN':
+            # Parameters change with the next window: close at the last test candle
+            trades[-1].update(status='CLOSED', exit_reason='WINDOW_END',
+                              exit_time=pd.Timestamp(int(times[i_end - 1]), unit='s'))
+        test_trades.extend(trades)
+        param_names = optimize.INDICATOR_PARAMS + optimize.STRATEGY_PARAMS
+        result["symbols"][symbol] = {
+            "params": {p: best[p] for p in param_names},
+            "in_sample": {k: v for k, v in best.items() if k != "symbol" and k not in param_names},
+            "out_of_sample": summarize(trades),
+            "trades": trades
+        }
+    result["portfolio"] = portfolio_summary(test_trades)
+    return result
+
+def run_walkforward(candles, windows, grid, samples=None, seed=0, workers=None):
+    """
+    Runs every window in parallel, one per worker process, over memory-mapped candles.
+    Returns the per-window results and the out-of-sample summaries stitched together.
+    """
+    symbols = list(candles)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for symbol, (df, start_idx) in candles.items():
+            optimize.save_candles(data_dir, symbol, df, start_idx)
+        with ProcessPoolExecutor(max_workers=workers, initializer=optimize._init_worker, initargs=(data_dir, symbols)) as pool:
+            results = list(pool.map(partial(run_window, grid=grid, samples=samples, seed=seed), windows))
+
+    all_trades = [t for r in results for res in r["symbols"].values() for t in res["trades"]]
+    return {
+        "windows": results,
+        "out_of_sample": {
+            symbol: summarize([t for t in all_trades if t['symbol'] == symbol]) for symbol in symbols
+        },
+        "portfolio": portfolio_summary(all_trades)
+    }
+
+def print_walkforward(results):
+    print(f"{'TEST START (UTC)':<20} {'SYMBOL':<8} {'PARAMS (st/mult/hma/scale/thresh/tp)':<40} {'IS PNL':>10} {'OOS PNL':>10} {'OOS TRADES':>10}")
+    print("-" * 102)
+    for r in results["windows"]:
+        test_start = str(pd.Timestamp(r["window"][1], unit='s'))
+        for symbol, res in r["symbols"].items():
+            params = "/".join(str(v) for v in res["params"].values())
+            print(f"{test_start:<20} {symbol:<8} {params:<40} {res['in_sample']['total_pnl']:>10.2f} "
+                  f"{res['out_of_sample']['total_pnl']:>10.2f} {res['out_of_sample']['trades']:>10}")
+    print("-" * 102)
+    for name, summary in list(results["out_of_sample"].items()) + [("PORTF.", results["portfolio"])]:
+        print(f"{name:<8} OOS PnL: {summary['total_pnl']:.2f} | Trades: {summary['trades']} | "
+              f"Win Rate: {summary['win_rate']:.1f}% | Max DD: {summary['max_drawdown']:.2f}")
+    print(f"{'':<8} {describe_margin(results['portfolio'], config.LEVERAGE)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward test: optimize in-sample, trade out-of-sample.")
+    parser.add_argument("--symbols", nargs="+", default=list(config.QUANTITIES.keys()))
+    parser.add_argument("--start", required=True, help="First day (IST), dd/mm/yyyy")
+    parser.add_argument("--end", required=True, help="Last day (IST), dd/mm/yyyy")
+    parser.add_argument("--train-days", type=int, default=30)
+    parser.add_argument("--test-days", type=int, default=7)
+    optimize.add_grid_arguments(parser)
+    parser.add_argument("--samples", type=int, help="Random search: combinations to try per window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output", default="walkforward_results.json")
+    args = parser.parse_args()
+
+    start_utc = parse_ist_date(args.start)
+    end_utc = parse_ist_date(args.end, end_of_day=True)
+    windows = make_windows(start_utc, end_utc, args.train_days, args.test_days)
+    if not windows:
+        logger.error("Period is shorter than one training window.")
+        return
+
+    exchange = DeltaExchange(config.API_KEY, config.API_SECRET, config.BASE_URL, candle_cache=config.CANDLE_CACHE_PATH)
+    candles = optimize.load_candles(exchange, args.symbols, start_utc, end_utc)
+    if not candles:
+        return
+
+    started = time.perf_counter()
+    results = run_walkforward(candles, windows, optimize.grid_from_args(args), args.samples, args.seed, args.workers)
+    logger.info(f"{len(windows)} windows in {time.perf_counter() - started:.1f}s")
+
+    print_walkforward(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    logger.info(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()